@@ -1,6 +1,12 @@
 import pytest
 import numpy as np
-from vital_sqi.common.band_filter import BandpassFilter
+import pandas as pd
+from scipy.signal import filtfilt, lfilter
+from vital_sqi.common.band_filter import (
+    BandpassFilter,
+    StreamingFilter,
+    _design_coefficients,
+)
 
 
 @pytest.fixture
@@ -101,3 +107,100 @@ def test_lowpass_filter_zero_order(mock_signal, caplog):
     assert "Filter order must be a positive integer" in caplog.text
     # Verify the returned signal is an empty array
     assert filtered_signal.size == 0
+
+
+def test_filters_match_transfer_function_form(mock_signal):
+    filter = BandpassFilter(band_type="butter", fs=500)
+    b, a = filter._design_filter(5, 3, btype="high")
+    np.testing.assert_allclose(
+        filter.signal_highpass_filter(mock_signal, cutoff=5, order=3),
+        filtfilt(b, a, mock_signal),
+        atol=1e-10,
+    )
+    b, a = filter._design_filter(20, 3, btype="low")
+    np.testing.assert_allclose(
+        filter.signal_lowpass_filter(mock_signal, cutoff=20, order=3),
+        lfilter(b, a, mock_signal),
+        atol=1e-10,
+    )
+
+
+def test_filter_design_cache():
+    filter = BandpassFilter(band_type="cheby1", fs=500)
+    _design_coefficients.cache_clear()
+    sos = filter._design_filter(20, 4, btype="low", output="sos")
+    assert sos.shape == (2, 6)
+    assert np.array_equal(filter._design_filter(20, 4, btype="low", output="sos"), sos)
+    assert _design_coefficients.cache_info().hits == 1
+    sos[0, 0] = 0  # Designs handed out are copies
+    assert filter._design_filter(20, 4, btype="low", output="sos")[0, 0] != 0
+
+
+def test_bandpass_filter(mock_signal):
+    filter = BandpassFilter(band_type="butter", fs=500)
+    filtered_signal = filter.signal_bandpass_filter(mock_signal, 30, 70, order=4)
+    spectrum = np.abs(np.fft.rfft(filtered_signal))
+    assert spectrum[50] > 100 * spectrum[10], "Band-pass filter ineffective."
+
+    block = np.stack((mock_signal, 2 * mock_signal))
+    filtered_block = filter.signal_bandpass_filter(block, 30, 70, order=4)
+    np.testing.assert_allclose(filtered_block[0], filtered_signal)
+    np.testing.assert_allclose(filtered_block[1], 2 * filtered_signal)
+
+
+def test_bandpass_filter_invalid_band(mock_signal, caplog):
+    filter = BandpassFilter(band_type="butter", fs=500)
+    filtered_signal = filter.signal_bandpass_filter(mock_signal, 70, 30)
+    assert "Lower cutoff must be below the upper cutoff" in caplog.text
+    assert filtered_signal.size == 0
+
+
+def push_chunks(stream, signal, seed=0):
+    rng = np.random.default_rng(seed)
+    chunks, i = [], 0
+    while i < len(signal):
+        size = rng.integers(1, 500)
+        chunks.append(stream.push(signal[i : i + size]))
+        i += size
+    chunks.append(stream.flush())
+    return np.concatenate(chunks)
+
+
+def test_streaming_filter_causal():
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    stream = StreamingFilter(cutoff=12, btype="low", order=2, fs=100)
+    expected = BandpassFilter(fs=100).signal_lowpass_filter(ppg, cutoff=12, order=2)
+    np.testing.assert_allclose(push_chunks(stream, ppg), expected, atol=1e-9)
+
+    # The state is reset for a new signal, and channels are filtered apart
+    block = np.stack((ppg[:1000], -ppg[:1000]))
+    filtered = np.concatenate(
+        [stream.push(block[:, i : i + 300]) for i in range(0, 1000, 300)], axis=-1
+    )
+    np.testing.assert_allclose(filtered[0], expected[:1000], atol=1e-9)
+    np.testing.assert_allclose(filtered[1], -expected[:1000], atol=1e-9)
+
+
+@pytest.mark.parametrize("btype, cutoff", [("high", 1), ("band", (1, 12))])
+def test_streaming_filter_zero_phase(btype, cutoff):
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    stream = StreamingFilter(cutoff=cutoff, btype=btype, order=2, fs=100, lookahead=5)
+    assert len(stream.push(ppg[:400])) == 0  # Held back for the lookahead
+    stream.reset()
+    filtered = push_chunks(stream, ppg)
+
+    filter = BandpassFilter(fs=100)
+    if btype == "high":
+        expected = filter.signal_highpass_filter(ppg, cutoff=1, order=2)
+    else:
+        expected = filter.signal_bandpass_filter(ppg, 1, 12, order=2)
+    assert len(filtered) == len(ppg)
+    atol = 1e-8 * np.max(np.abs(expected))
+    np.testing.assert_allclose(filtered[500:-500], expected[500:-500], atol=atol)
+
+
+def test_streaming_filter_invalid_input():
+    with pytest.raises(ValueError, match="lookahead"):
+        StreamingFilter(cutoff=10, lookahead=-1)
+    with pytest.raises(ValueError, match="btype"):
+        StreamingFilter(cutoff=10, btype="notch")
@@ -1,4 +1,11 @@
+import pytest
+import numpy as np
 from scipy.special import erf
+from vital_sqi.common.generate_template import (
+    ppg_dual_double_frequency_template,
+    TemplateCache,
+    get_template,
+)
 
 
 class TestPPGDualDoubleFrequencyTemplate(object):
@@ -39,3 +46,54 @@ class TestOrdinaryDifferentialEquation(object):
 class TestRRProcess(object):
     def test_on_rr_process(self):
         pass
+
+
+class TestTemplateCache(object):
+    def test_on_get(self):
+        cache = TemplateCache(maxsize=2)
+        template = cache.get("ppg_dual_double_frequency", 50)
+        assert template is cache.get(ppg_dual_double_frequency_template, 50)
+        assert template.min() == 0 and template.max() == 1
+        assert not template.flags.writeable
+        with pytest.raises(ValueError):
+            template[0] = 1
+        np.testing.assert_allclose(template, ppg_dual_double_frequency_template(50))
+
+    def test_on_params(self):
+        cache = TemplateCache()
+        default = cache.get("ppg_absolute_dual_skewness", 40)
+        assert default is cache.get("ppg_absolute_dual_skewness", 40, a=4)
+        assert default is not cache.get("ppg_absolute_dual_skewness", 40, a=2)
+
+    def test_on_eviction(self):
+        cache = TemplateCache(maxsize=2)
+        first = cache.get("ppg_dual_double_frequency", 10)
+        cache.get("ppg_dual_double_frequency", 20)
+        cache.get("ppg_dual_double_frequency", 30)
+        assert len(cache) == 2
+        assert first is not cache.get("ppg_dual_double_frequency", 10)
+
+    def test_on_cache_dir(self, tmp_path):
+        cache = TemplateCache(cache_dir=str(tmp_path))
+        template = cache.get("ppg_dual_double_frequency", 25)
+        assert len(list(tmp_path.glob("*.npy"))) == 1
+        other = TemplateCache(cache_dir=str(tmp_path))
+        np.testing.assert_array_equal(
+            template, other.get("ppg_dual_double_frequency", 25)
+        )
+
+    def test_on_corrupt_cache_file(self, tmp_path):
+        cache = TemplateCache(cache_dir=str(tmp_path))
+        template = cache.get("ppg_dual_double_frequency", 25)
+        (file_path,) = tmp_path.glob("*.npy")
+        file_path.write_bytes(file_path.read_bytes()[:20])
+        other = TemplateCache(cache_dir=str(tmp_path))
+        np.testing.assert_array_equal(
+            template, other.get("ppg_dual_double_frequency", 25)
+        )
+        assert [p.name for p in tmp_path.iterdir()] == [file_path.name]
+        np.testing.assert_array_equal(template, np.load(file_path))
+
+    def test_on_unknown_generator(self):
+        with pytest.raises(ValueError, match="Unknown template generator"):
+            get_template("unknown", 10)
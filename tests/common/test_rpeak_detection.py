@@ -1,7 +1,13 @@
 import numpy as np
+import pandas as pd
 import pytest
+from scipy.signal import resample_poly
+from unittest.mock import Mock, patch
 from vital_sqi.common.rpeak_detection import (
     PeakDetector,
+    FiducialCache,
+    FiducialIndex,
+    SegmentFiducials,
     ADAPTIVE_THRESHOLD,
     CLUSTERER_METHOD,
     SLOPE_SUM_METHOD,
@@ -9,6 +15,8 @@ from vital_sqi.common.rpeak_detection import (
     COUNT_ORIG_METHOD,
     DEFAULT,
     BILLAUER_METHOD,
+    _billauer_loop,
+    _two_means,
 )
 
 # Mock a test signal
@@ -54,6 +62,130 @@ def test_ppg_detector_methods(detector_type):
         ), f"No error during troughs detection for detector_type {detector_type}"
 
 
+def naive_slope_sum(s, fs=100):
+    """Per-sample slope sum detector used as reference."""
+    window_size, half_width = round(0.12 * fs), round(0.15 * fs)
+    slope_sum = np.array(
+        [
+            sum(max(0, s[k] - s[k - 1]) for k in range(n - window_size, n))
+            for n in range(window_size + 1, len(s))
+        ]
+    )
+    local_max = np.array(
+        [
+            np.max(slope_sum[max(0, n - half_width) : n + half_width])
+            for n in range(len(slope_sum))
+        ]
+    )
+    threshold_base = 3 * np.mean(slope_sum[: 10 * fs])
+    onsets = []
+    for n, Z_value in enumerate(slope_sum):
+        if Z_value > threshold_base * 0.6:
+            left, right = max(0, n - half_width), n + half_width
+            local_min = np.min(slope_sum[left:right])
+            if (local_max[n] - local_min) > local_min * 2:
+                onset = n
+                while onset > 0 and slope_sum[onset] >= 0.01 * local_max[onset]:
+                    onset -= 1
+                onsets.append(onset)
+                threshold_base = local_max[n]
+    onsets = np.unique(onsets) + window_size
+    peaks = [np.argmax(s[a:b]) + a for a, b in zip(onsets[:-1], onsets[1:])]
+    troughs = [np.argmin(s[a:b]) + a for a, b in zip(onsets[:-1], onsets[1:])]
+    return np.array(peaks), np.array(troughs)
+
+
+def test_detect_peak_trough_slope_sum():
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    ppg = ppg[:3000]
+    peaks, troughs = detector_ppg.detect_peak_trough_slope_sum(ppg)
+    expected_peaks, expected_troughs = naive_slope_sum(ppg)
+    assert len(peaks) > 20
+    np.testing.assert_array_equal(peaks, expected_peaks)
+    np.testing.assert_array_equal(troughs, expected_troughs)
+
+    # Windows scale with the sampling rate
+    peaks_200, _ = PeakDetector(fs=200).detect_peak_trough_slope_sum(
+        resample_poly(ppg, 2, 1)
+    )
+    assert len(peaks_200) == len(peaks)
+    assert np.mean(np.abs(peaks_200 / 2 - peaks) <= 2) > 0.9
+
+    # Sampling rates given as floats
+    peaks_float, troughs_float = PeakDetector(fs=100.0).detect_peak_trough_slope_sum(
+        ppg
+    )
+    np.testing.assert_array_equal(peaks_float, peaks)
+    np.testing.assert_array_equal(troughs_float, troughs)
+    assert len(PeakDetector(fs=125.0).ppg_detector(ppg, SLOPE_SUM_METHOD)[0]) > 20
+
+    # Signals shorter than the slope sum window
+    peaks, troughs = detector_ppg.detect_peak_trough_slope_sum(ppg[:10])
+    assert len(peaks) == len(troughs) == 0
+
+
+@pytest.mark.parametrize(
+    "detector_type, preprocess",
+    [
+        (SLOPE_SUM_METHOD, False),
+        (COUNT_ORIG_METHOD, True),
+        (CLUSTERER_METHOD, False),
+        (DEFAULT, False),
+    ],
+)
+def test_ppg_detector_batch(detector_type, preprocess):
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    offsets = [0, 3000, 6000, 9000, 10500]
+    fiducials = detector_ppg.ppg_detector_batch(
+        ppg, detector_type, offsets=offsets, preprocess=preprocess
+    )
+    assert isinstance(fiducials, SegmentFiducials)
+    assert fiducials.n_segments == 4
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        peaks, troughs = detector_ppg.ppg_detector(
+            ppg[start:end], detector_type, preprocess=preprocess
+        )
+        np.testing.assert_array_equal(fiducials.get_segment(i)[0], peaks)
+        np.testing.assert_array_equal(fiducials.get_segment(i)[1], troughs)
+
+    # Same fiducials from a 2-D array and from a list of segments
+    block = ppg[:9000].reshape(3, 3000)
+    from_block = detector_ppg.ppg_detector_batch(
+        block, detector_type, preprocess=preprocess
+    )
+    from_list = detector_ppg.ppg_detector_batch(
+        list(block), detector_type, preprocess=preprocess
+    )
+    for batch in [from_block, from_list]:
+        np.testing.assert_array_equal(batch.peak_ptr, fiducials.peak_ptr[:4])
+        np.testing.assert_array_equal(
+            batch.peaks, fiducials.peaks[: fiducials.peak_ptr[3]]
+        )
+        np.testing.assert_array_equal(batch.segment_offsets, offsets[:4])
+
+
+def test_segment_fiducials_to_absolute():
+    fiducials = SegmentFiducials.from_list(
+        [([5, 20], [1]), ([], []), ([3], [0, 8])], [0, 30, 40, 50]
+    )
+    np.testing.assert_array_equal(fiducials.peak_ptr, [0, 2, 2, 3])
+    peaks, troughs = fiducials.to_absolute()
+    np.testing.assert_array_equal(peaks, [5, 20, 43])
+    np.testing.assert_array_equal(troughs, [1, 40, 48])
+    assert len(fiducials.get_segment(1)[0]) == 0
+
+
+def test_ecg_detector_batch():
+    ecg = np.sin(np.linspace(0, 40 * np.pi, 4000))
+    fiducials = detector_ecg.ecg_detector_batch(ecg.reshape(2, 2000))
+    assert fiducials.n_segments == 2
+    np.testing.assert_array_equal(
+        fiducials.get_segment(0)[0], detector_ecg.ecg_detector(ecg[:2000])[0]
+    )
+    with pytest.raises(ValueError):
+        detector_ecg.ecg_detector_batch(ecg, offsets=[0, 5000])
+
+
 def test_ecg_detector():
     realistic_ecg_signal = np.sin(
         np.linspace(0, 10 * np.pi, 100)
@@ -91,6 +223,18 @@ def test_detect_peak_trough_clusterer():
     assert len(troughs) > 0, "No troughs detected with clustering"
 
 
+def test_two_means():
+    rng = np.random.default_rng(0)
+    features = np.concatenate(
+        (rng.normal(0, 1, (40, 2)), rng.normal((10, -5), 1, (20, 2)))
+    )
+    labels = _two_means(features)
+    assert np.all(labels[:40] == labels[0]) and np.all(labels[40:] != labels[0])
+    np.testing.assert_array_equal(_two_means(features), labels)
+    with pytest.raises(ValueError):
+        _two_means(features[:1])
+
+
 def test_detect_peak_trough_DEFAULT():
     peaks, troughs = detector_ppg.detect_peak_trough_DEFAULT(mock_signal)
     assert len(peaks) > 0, "No peaks detected with default scipy"
@@ -106,12 +250,59 @@ def test_detect_peak_trough_moving_average_threshold():
     ), "No error during peaks detection with moving average threshold"
 
 
+def test_get_ROI():
+    s = np.array([5, 6, 0, 1, 3, 7, 5, 2, 0, 6, 9, 8])
+    starts, ends = detector_ppg.get_ROI(s, np.full(len(s), 4), margin=0)
+    np.testing.assert_array_equal(starts, [0, 5, 9])
+    np.testing.assert_array_equal(ends, [1, 6, 11])
+    starts, ends = detector_ppg.get_ROI(s, np.full(len(s), 4), margin=0.1)
+    np.testing.assert_array_equal(starts, [0, 3, 7])
+    np.testing.assert_array_equal(ends, [2, 7, 11])
+
+
+def test_detect_peak_trough_adaptive_threshold():
+    s = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    s = s[:3000]
+    peaks, troughs = detector_ppg.detect_peak_trough_adaptive_threshold(s)
+    assert len(peaks) > 0 and len(troughs) == len(peaks) - 1
+    assert np.all(np.diff(peaks) > 0)
+
+    # Brute force over the widened regions above the threshold
+    starts, ends = detector_ppg.get_ROI(
+        s, detector_ppg.get_moving_average(s, int(detector_ppg.fs * 0.75) * 2 + 1)
+    )
+    expected = np.unique(
+        [np.argmax(s[start : end + 1]) + start for start, end in zip(starts, ends)]
+    )
+    np.testing.assert_array_equal(peaks, expected)
+    for trough, left, right in zip(troughs, peaks[:-1], peaks[1:]):
+        assert trough == np.argmin(s[left:right]) + left
+
+
 def test_detect_peak_trough_billauer():
     peaks, troughs = detector_ppg.detect_peak_trough_billauer(mock_signal, delta=0.2)
     assert len(peaks) > 0, "No peaks detected with Billauer method"
     assert len(troughs) > 0, "No troughs detected with Billauer method"
 
 
+@pytest.mark.parametrize("delta", [0, 0.2, 0.8, 3])
+def test_detect_peak_trough_billauer_matches_loop(delta):
+    rng = np.random.default_rng(0)
+    signals = [
+        mock_signal,
+        np.round(np.cumsum(rng.normal(size=500)), 1),  # with plateaus
+        rng.integers(0, 5, size=200),
+        np.ones(50),
+        np.array([1.0]),
+        np.array([0, np.nan, 2, -1, 3]),
+    ]
+    for s in signals:
+        peaks, troughs = detector_ppg.detect_peak_trough_billauer(s, delta=delta)
+        expected_peaks, expected_troughs = _billauer_loop(s, delta)
+        np.testing.assert_array_equal(peaks, expected_peaks)
+        np.testing.assert_array_equal(troughs, expected_troughs)
+
+
 # def test_edge_case_empty_signal():
 #     empty_signal = np.array([])
 #     with pytest.raises(ValueError, match="Input signal is empty."):
@@ -147,3 +338,75 @@ def test_missing_required_methods():
         _ = detector_ecg.ecg_detector(mock_signal)
     except AttributeError as e:
         pytest.fail(f"Missing required method in WaveformMorphology: {e}")
+
+
+def test_fiducial_cache_detects_once():
+    ppg_signal = np.sin(np.linspace(0, 20 * np.pi, 3000))
+    cache = FiducialCache()
+    with patch.object(
+        PeakDetector, "ppg_detector", wraps=detector_ppg.ppg_detector
+    ) as mock_detector:
+        first = cache.ppg_detector(ppg_signal, detector_type=BILLAUER_METHOD)
+        second = cache.ppg_detector(ppg_signal, detector_type=BILLAUER_METHOD)
+        cache.ppg_detector(ppg_signal, detector_type=DEFAULT)
+    assert first is second
+    assert mock_detector.call_count == 2
+    expected = detector_ppg.ppg_detector(ppg_signal, detector_type=BILLAUER_METHOD)
+    np.testing.assert_array_equal(first[0], expected[0])
+    np.testing.assert_array_equal(first[1], expected[1])
+
+
+def test_fiducial_cache_keys_on_segment_identity():
+    cache = FiducialCache()
+    peaks_1, _ = cache.ppg_detector(mock_signal, detector_type=BILLAUER_METHOD)
+    peaks_2, _ = cache.ppg_detector(mock_signal.copy(), detector_type=BILLAUER_METHOD)
+    assert peaks_1 is not peaks_2
+    np.testing.assert_array_equal(peaks_1, peaks_2)
+
+
+def test_fiducial_cache_derived_quantities():
+    cache = FiducialCache()
+    nn_intervals = np.array([800.0, 810.0, 790.0])
+    compute = Mock(side_effect=lambda: nn_intervals.mean())
+    assert cache.derived(("mean",), nn_intervals, compute) == 800
+    assert cache.derived(("mean",), nn_intervals, compute) == 800
+    cache.derived(("mean",), nn_intervals.copy(), compute)
+    assert compute.call_count == 2
+
+
+def test_fiducial_index():
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    index = FiducialIndex.detect(ppg, detector_type=SLOPE_SUM_METHOD)
+    peaks, troughs = detector_ppg.ppg_detector(ppg, detector_type=SLOPE_SUM_METHOD)
+    np.testing.assert_array_equal(index.peaks, peaks)
+    np.testing.assert_array_equal(index.troughs, troughs)
+
+    segment = index.get_segment(3000, 6000)
+    expected = peaks[(peaks >= 3000) & (peaks < 6000)] - 3000
+    np.testing.assert_array_equal(segment.peaks, expected)
+    assert segment.detector_type == SLOPE_SUM_METHOD
+
+    # Overlapping segments sliced at once
+    milestones = pd.DataFrame({"start": [0, 1500, 3000], "end": [3000, 4500, 6000]})
+    fiducials = index.segment_fiducials(milestones)
+    assert fiducials.n_segments == 3
+    for i, (start, end) in enumerate(milestones.values):
+        segment = index.get_segment(start, end)
+        np.testing.assert_array_equal(fiducials.get_segment(i)[0], segment.peaks)
+        np.testing.assert_array_equal(fiducials.get_segment(i)[1], segment.troughs)
+
+    sessions = index.sessions()
+    assert sessions[0] == [troughs[0], troughs[1]]
+    assert len(sessions) == len(troughs) - 1
+
+
+def test_fiducial_cache_seeded_with_index():
+    index = FiducialIndex([10, 50], [0, 30, 70], detector_type=DEFAULT)
+    cache = FiducialCache(index)
+    with patch.object(PeakDetector, "ppg_detector") as mock_detector:
+        peaks, troughs = cache.ppg_detector(mock_signal, detector_type=DEFAULT)
+        cache.ppg_detector(mock_signal, detector_type=BILLAUER_METHOD)
+    # Only the other detector type is run
+    assert mock_detector.call_count == 1
+    np.testing.assert_array_equal(peaks, [10, 50])
+    np.testing.assert_array_equal(troughs, [0, 30, 70])
@@ -7,6 +7,7 @@ from vital_sqi.common.utils import (
     check_valid_signal,
     calculate_sampling_rate,
     generate_timestamp,
+    TimeAxis,
     parse_datetime,
     parse_rule,
     generate_labels,
@@ -22,6 +23,7 @@ from vital_sqi.common.utils import (
     check_signal_format,
     create_rule_def,
 )
+from vital_sqi.common.rpeak_detection import FiducialCache
 
 # Mock constants
 OPERAND_MAPPING_DICT = {">": 5, ">=": 4, "=": 3, "<=": 2, "<": 1}
@@ -84,6 +86,14 @@ def test_get_nn(mock_signal):
     assert nn_intervals.size >= 0
 
 
+def test_get_nn_with_fiducial_cache():
+    ppg_signal = np.sin(2 * np.pi * 1.2 * np.arange(0, 30, 0.01))
+    cache = FiducialCache()
+    nn_intervals = get_nn(ppg_signal, fiducial_cache=cache)
+    np.testing.assert_array_equal(nn_intervals, get_nn(ppg_signal))
+    np.testing.assert_array_equal(nn_intervals, get_nn(ppg_signal, fiducial_cache=cache))
+
+
 def test_check_valid_signal(mock_signal):
     assert check_valid_signal(mock_signal) is True
     with pytest.raises(ValueError):
@@ -101,6 +111,49 @@ def test_generate_timestamp():
     assert isinstance(timestamps[0], pd.Timestamp)
 
 
+class TestTimeAxis:
+    def test_on_index_to_time(self):
+        axis = TimeAxis("2024-01-01", 100, 1000)
+        assert len(axis) == 1000
+        assert axis[150] == pd.Timestamp("2024-01-01 00:00:01.5")
+        assert axis[-1] == axis.end_datetime == pd.Timestamp("2024-01-01 00:00:09.99")
+        assert axis.duration == 10
+        timestamps = axis.index_to_time([0, 10])
+        assert isinstance(timestamps, pd.DatetimeIndex)
+        assert list(timestamps) == [
+            pd.Timestamp("2024-01-01"),
+            pd.Timestamp("2024-01-01 00:00:00.1"),
+        ]
+        with pytest.raises(IndexError):
+            axis[1000]
+
+    def test_on_time_to_index(self):
+        axis = TimeAxis("2024-01-01", 100, 1000)
+        assert axis.time_to_index("2024-01-01 00:00:02") == 200
+        assert axis.time_to_index("2024-01-01 00:00:00.004") == 0
+        assert axis.time_to_index("2024-01-01 00:00:00.004", rounding="ceil") == 1
+        np.testing.assert_array_equal(
+            axis.time_to_index(axis.to_datetime_index()), np.arange(1000)
+        )
+        with pytest.raises(ValueError):
+            axis.time_to_index("2024-01-01", rounding="up")
+
+    def test_on_slice(self):
+        axis = TimeAxis("2024-01-01", 256, 10000)
+        sub_axis = axis[1000:2000]
+        assert isinstance(sub_axis, TimeAxis)
+        assert sub_axis == TimeAxis(axis[1000], 256, 1000)
+        timestamps = axis.to_datetime_index()
+        assert (sub_axis.to_datetime_index() == timestamps[1000:2000]).all()
+        assert (
+            generate_timestamp("2024-01-01", 256, 10000) == axis.to_datetime_index()
+        ).all()
+
+    def test_on_invalid_sampling_rate(self):
+        with pytest.raises(ValueError):
+            TimeAxis(None, 0, 10)
+
+
 def test_parse_datetime():
     parsed_date = parse_datetime("2023-01-01", type="date")
     assert parsed_date == pd.Timestamp("2023-01-01")
@@ -184,6 +237,28 @@ def test_cut_segment(mock_df):
     assert len(segments) == len(milestones)
 
 
+def test_cut_segment_array():
+    s = np.arange(10.0).reshape(-1, 2)
+    milestones = pd.DataFrame({"start": [0, 2], "end": [2, 5]})
+    segments = cut_segment(s, milestones)
+    assert [len(segment) for segment in segments] == [2, 3]
+    assert all(np.shares_memory(segment, s) for segment in segments)
+
+
+def test_cut_segment_by_time():
+    s = np.arange(100.0)
+    axis = TimeAxis("2024-01-01", 10, len(s))
+    milestones = pd.DataFrame(
+        {
+            "start": pd.to_datetime(["2024-01-01 00:00:00", "2024-01-01 00:00:05"]),
+            "end": pd.to_datetime(["2024-01-01 00:00:05.00", "2024-01-01 00:00:09.95"]),
+        }
+    )
+    segments = cut_segment(s, milestones, time_axis=axis)
+    np.testing.assert_array_equal(segments[0], s[:50])
+    np.testing.assert_array_equal(segments[1], s[50:100])
+
+
 def test_format_milestone():
     start = [0, 1, 2]
     end = [2, 3]
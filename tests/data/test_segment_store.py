@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from vital_sqi.common.utils import cut_segment
+from vital_sqi.data.segment_store import SegmentStore
+
+
+@pytest.fixture
+def segments():
+    rng = np.random.default_rng(0)
+    return [
+        pd.DataFrame({"PLETH": rng.normal(size=length)}, index=range(start, start + length))
+        for start, length in [(0, 100), (100, 100), (200, 50)]
+    ]
+
+
+class TestSegmentStore(object):
+    def test_on_round_trip(self, tmp_path, segments):
+        path = str(tmp_path / "store")
+        with SegmentStore(path, mode="w", sampling_rate=100) as store:
+            for i, segment in enumerate(segments):
+                store.append(
+                    segment,
+                    decision="accept" if i % 2 == 0 else "reject",
+                    sqis={"skewness": i * 0.5},
+                )
+
+        store = SegmentStore(path)
+        assert len(store) == 3
+        assert store.columns == ["PLETH"]
+        assert store.sampling_rate == 100
+        for segment, values in zip(segments, store):
+            np.testing.assert_array_equal(values[:, 0], segment["PLETH"])
+        pd.testing.assert_frame_equal(store.get_frame(1), segments[1])
+        assert store.index["decision"].to_list() == ["accept", "reject", "accept"]
+        assert store.sqis["skewness"].to_list() == [0, 0.5, 1]
+        assert store.milestones.values.tolist() == [[0, 100], [100, 200], [200, 250]]
+
+    def test_on_random_access(self, tmp_path, segments):
+        path = str(tmp_path / "store")
+        with SegmentStore(path, mode="w") as store:
+            for segment in segments:
+                store.append(segment.to_numpy(), start=segment.index[0])
+        store = SegmentStore(path)
+        assert isinstance(store.signals, np.memmap)
+        assert store[2].shape == (50, 1)
+        assert not store[2].flags.writeable
+        np.testing.assert_array_equal(np.load(f"{path}/signals.npy").shape, (250, 1))
+
+    def test_on_cut_segment(self, tmp_path, segments):
+        path = str(tmp_path / "store")
+        with SegmentStore(path, mode="w") as store:
+            for segment in segments:
+                store.append(segment)
+        store = SegmentStore(path)
+        for segment, cut in zip(segments, cut_segment(store.to_frame(), store.offsets)):
+            np.testing.assert_array_equal(cut["PLETH"], segment["PLETH"])
+
+    def test_on_empty(self, tmp_path):
+        path = str(tmp_path / "store")
+        SegmentStore(path, mode="w").close()
+        store = SegmentStore(path)
+        assert len(store) == 0
+        with open(f"{path}/meta.json") as meta_file:
+            assert json.load(meta_file)["columns"] == []
+
+    def test_on_invalid(self, tmp_path, segments):
+        with pytest.raises(ValueError):
+            SegmentStore(str(tmp_path), mode="a")
+        store = SegmentStore(str(tmp_path / "store"), mode="w")
+        store.append(segments[0])
+        with pytest.raises(ValueError):
+            store.append(np.zeros((10, 2)))
+        with pytest.raises(ValueError):
+            store.get_segment(0)
+        store.close()
+        with pytest.raises(ValueError):
+            SegmentStore(str(tmp_path / "store")).append(segments[0])
+
+    def test_on_mixed_dtype(self, tmp_path):
+        path = str(tmp_path / "store")
+        with SegmentStore(path, mode="w") as store:
+            store.append(np.array([1, 2, 3]))
+            with pytest.raises(ValueError, match="Cannot store float64"):
+                store.append(np.array([1.7, np.nan, 2.5]))
+        with SegmentStore(str(tmp_path / "float"), mode="w", dtype=float) as store:
+            store.append(np.array([1, 2, 3]))
+            store.append(np.array([1.7, np.nan, 2.5]))
+        store = SegmentStore(str(tmp_path / "float"))
+        np.testing.assert_array_equal(store[1][:, 0], [1.7, np.nan, 2.5])
+        np.testing.assert_array_equal(store[0][:, 0], [1, 2, 3])
@@ -32,6 +32,19 @@ class TestECGReader(object):
         )
         assert isinstance(out.start_datetime, dt.datetime) is True
 
+    def test_on_lazy_timestamps(self):
+        file_name = os.path.abspath("tests/test_data/example.edf")
+        out = ECG_reader(file_name, "edf")
+        lazy = ECG_reader(file_name, "edf", lazy_timestamps=True)
+        assert isinstance(lazy.signals, np.ndarray)
+        assert len(lazy.channels) == lazy.signals.shape[1]
+        assert len(lazy.time_axis) == len(out.signals)
+        assert (lazy.get_timestamps() == out.signals["timestamps"]).all()
+        pd.testing.assert_frame_equal(
+            lazy.to_frame().iloc[:, 1:],
+            out.signals.iloc[:, 1:].set_axis(lazy.channels, axis=1),
+        )
+
     def test_on_KeyError(self):
         # lines 70-74, 78-83, 101-105
         pass
@@ -79,6 +92,14 @@ class TestECGWriter(object):
             ECG_writer(out, file_out, file_type="mit", info=None)
         assert exc_info.match("Header dict needed")
 
+    def test_on_timestamps_csv(self, tmp_path):
+        file_in = os.path.abspath("tests/test_data/example.edf")
+        out = ECG_reader(file_in, "edf", lazy_timestamps=True)
+        file_out = str(tmp_path / "out.csv")
+        assert ECG_writer(out, file_out, file_type="csv") is True
+        written = pd.read_csv(file_out, parse_dates=["timestamps"])
+        assert (written["timestamps"] == out.get_timestamps()).all()
+
     def test_on_valid_csv(self, caplog):
         file_name = os.path.abspath("tests/test_data/ecg_test1.csv")
         try:
@@ -90,6 +111,29 @@ class TestECGWriter(object):
             assert "Sampling rate could not be inferred" in caplog.text
 
 
+    def test_on_valid_npy(self, tmp_path):
+        file_in = os.path.abspath("tests/test_data/example.edf")
+        out = ECG_reader(file_in, "edf")
+        file_out = str(tmp_path / "out.npy")
+        assert ECG_writer(out, file_out, file_type="npy") is True
+        assert os.path.isfile(str(tmp_path / "out.json"))
+
+        signal_obj = ECG_reader(file_out, "npy")
+        assert isinstance(signal_obj.signals, np.memmap)
+        assert signal_obj.sampling_rate == out.sampling_rate
+        assert signal_obj.start_datetime == pd.Timestamp(out.start_datetime)
+        np.testing.assert_array_equal(
+            signal_obj.signals, out.signals.drop(columns="timestamps").to_numpy()
+        )
+        assert (
+            signal_obj.get_timestamps(0, 10) == out.signals["timestamps"][:10]
+        ).all()
+
+        channel = ECG_reader(file_out, "npy", channel_num=[1])
+        assert isinstance(channel.signals, np.memmap)
+        assert channel.channels == [signal_obj.channels[1]]
+        np.testing.assert_array_equal(channel.get_channel(0), signal_obj.get_channel(1))
+
 class TestPPGReader(object):
     file_name = os.path.abspath("tests/test_data/ppg_smartcare.csv")
 
@@ -134,6 +178,62 @@ class TestPPGReader(object):
             )
 
 
+class TestPPGStreamReader(object):
+    file_name = os.path.abspath("tests/test_data/ppg_smartcare.csv")
+
+    @pytest.mark.parametrize("overlapping, block_size", [(0, 1000), (10, 777)])
+    def test_on_chunks(self, overlapping, block_size):
+        signal_obj = PPG_reader(
+            self.file_name,
+            signal_idx=["PLETH"],
+            timestamp_idx=["TIMESTAMP_MS"],
+            start_datetime="2020/12/30 10:00:00",
+        )
+        signals = signal_obj.signals
+        chunks = list(
+            PPG_stream_reader(
+                self.file_name,
+                signal_idx=["PLETH"],
+                timestamp_idx=["TIMESTAMP_MS"],
+                start_datetime="2020/12/30 10:00:00",
+                duration=30,
+                overlapping=overlapping,
+                block_size=block_size,
+            )
+        )
+        step = int((30 - overlapping) * signal_obj.sampling_rate)
+        assert len(chunks) == int(np.ceil(len(signals) / step))
+        for idx, chunk in enumerate(chunks):
+            assert isinstance(chunk, SignalChunk)
+            assert chunk.start_idx == idx * step
+            assert chunk.end_idx == min(chunk.start_idx + 3000, len(signals))
+            assert chunk.sampling_rate == signal_obj.sampling_rate
+            assert chunk.signals.dtype == np.float32
+            assert chunk.timestamps.dtype == np.int64
+            expected = signals.iloc[chunk.start_idx : chunk.end_idx]
+            np.testing.assert_array_equal(chunk.signals[:, 0], expected["PLETH"])
+            np.testing.assert_array_equal(
+                chunk.to_frame()["timestamps"], expected["TIMESTAMP_MS"]
+            )
+            assert chunk.start_datetime == expected["TIMESTAMP_MS"].iloc[0]
+
+    def test_on_column_index(self):
+        chunk = next(PPG_stream_reader(self.file_name, signal_idx=6, timestamp_idx=0))
+        assert chunk.columns == ("PLETH",)
+        assert chunk.start_datetime == pd.Timestamp(0)
+
+    def test_on_timeunit_error(self):
+        with pytest.raises(ValueError, match="Timestamp unit must be either 'ms'"):
+            next(
+                PPG_stream_reader(
+                    self.file_name,
+                    signal_idx=["PLETH"],
+                    timestamp_idx=["TIMESTAMP_MS"],
+                    timestamp_unit=None,
+                )
+            )
+
+
 class TestPPGWriter(object):
 
     def test_on_valid_ppg(self):
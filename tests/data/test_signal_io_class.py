@@ -203,6 +203,53 @@ class TestSignalSQI:
         sqi.update_start_datetime(new_datetime)
         assert sqi.start_datetime == new_datetime
 
+    def test_array_signals(self, tmp_path):
+        """Test signals backed by a memory-mapped array."""
+        values = np.random.randn(1000, 2)
+        np.save(tmp_path / "signals.npy", values)
+        signals = np.load(tmp_path / "signals.npy", mmap_mode="r")
+        sqi = SignalSQI(
+            signals=signals,
+            sampling_rate=100,
+            start_datetime=pd.Timestamp("2024-01-01"),
+            channels=["I", "II"],
+        )
+        assert sqi.signals is signals
+        assert np.shares_memory(sqi.get_channel("II"), signals)
+        np.testing.assert_array_equal(sqi.get_channel(1), values[:, 1])
+
+        timestamps = sqi.get_timestamps(100, 102)
+        assert list(timestamps) == [
+            pd.Timestamp("2024-01-01 00:00:01"),
+            pd.Timestamp("2024-01-01 00:00:01.010"),
+        ]
+        frame = sqi.to_frame()
+        assert frame.columns.tolist() == ["timestamps", "I", "II"]
+        assert frame["timestamps"].iloc[-1] == pd.Timestamp("2024-01-01 00:00:09.990")
+
+        sqi.update_signals(values[:, 0])
+        assert sqi.signals.shape == (1000, 1)
+        with pytest.raises(ValueError, match="Expected signals array"):
+            sqi.update_signals(np.zeros((2, 2, 2)))
+
+    def test_detect_fiducials(self):
+        """Test fiducials detected once over the whole recording."""
+        ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")
+        ppg["TIMESTAMP_MS"] = pd.to_datetime(ppg["TIMESTAMP_MS"], unit="ms")
+        sqi = SignalSQI(
+            wave_type="PPG",
+            signals=ppg[["TIMESTAMP_MS", "PLETH"]],
+            sampling_rate=100,
+        )
+        assert sqi.fiducials is None
+        fiducials = sqi.detect_fiducials(detector_type=4)
+        assert sqi.fiducials is fiducials
+        assert fiducials.detector_type == 4
+        assert len(fiducials.peaks) > 100
+        assert np.all(np.diff(fiducials.peaks) > 0)
+        with pytest.raises(ValueError, match="Expected fiducials"):
+            sqi.fiducials = fiducials.peaks
+
     # def test_load_rules_from_dict(self, valid_rule_dict, mock_rule):
     #     """Test _load_rules_from_dict method."""
     #     sfecg = 256
@@ -0,0 +1,136 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from vital_sqi.pipeline.online_sqi import OnlineSQI
+from vital_sqi.pipeline.pipeline_functions import generate_ruleset
+from vital_sqi.sqi.standard_sqi import (
+    kurtosis_sqi,
+    skewness_sqi,
+    signal_to_noise_sqi,
+    zero_crossings_rate_sqi,
+    mean_crossing_rate_sqi,
+)
+
+
+@pytest.fixture
+def ppg():
+    return pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+
+
+def push_packets(online, signal, seed=0):
+    rng = np.random.default_rng(seed)
+    rows, i = [], 0
+    while i < len(signal):
+        size = rng.integers(1, 250)
+        rows.append(online.push(signal[i : i + size]))
+        i += size
+    return pd.concat(rows, ignore_index=True)
+
+
+@pytest.mark.parametrize("hop", [1, 2.5, 10])
+def test_online_sqi_matches_window_sqis(ppg, hop):
+    online = OnlineSQI(sampling_rate=100, window=10, hop=hop)
+    df = push_packets(online, ppg[:6000])
+    assert len(df) == int((6000 - 1000) / (hop * 100)) + 1
+    assert df["end_idx"].iloc[0] == 1000
+    assert np.all(df["end_idx"] - df["start_idx"] == 1000)
+
+    for _, row in df.iterrows():
+        window = ppg[row["start_idx"] : row["end_idx"]]
+        expected = {
+            "kurtosis": kurtosis_sqi(window),
+            "skewness": skewness_sqi(window),
+            "signal_to_noise": signal_to_noise_sqi(window),
+            "zero_crossings_rate": zero_crossings_rate_sqi(window),
+            "mean_crossing_rate": mean_crossing_rate_sqi(window),
+        }
+        spectrum = np.fft.rfft(window)
+        freqs = np.fft.rfftfreq(len(window), d=0.01)
+        band = (freqs > 0.5) & (freqs <= 8)
+        expected["band_energy"] = np.sum(2 * np.abs(spectrum[band]) ** 2) / 1000**2
+        for name, value in expected.items():
+            assert row[name] == pytest.approx(value, rel=1e-8), name
+    assert df["hr_mean"].between(40, 200).all()
+
+
+@pytest.mark.parametrize(
+    "sqis", [["kurtosis"], ["mean_crossing_rate"], ["zero_crossings_rate", "hr_mean"]]
+)
+def test_online_sqi_subset(ppg, sqis):
+    # Only the state of the requested SQIs is kept up to date
+    expected = push_packets(OnlineSQI(sampling_rate=100, window=10, hop=1), ppg[:6000])
+    online = OnlineSQI(sampling_rate=100, window=10, hop=1, sqis=sqis)
+    df = push_packets(online, ppg[:6000])
+    pd.testing.assert_frame_equal(df, expected[sqis + ["start_idx", "end_idx"]])
+
+
+def test_online_sqi_faster_than_recompute(ppg):
+    sqis = {
+        "kurtosis": kurtosis_sqi,
+        "skewness": skewness_sqi,
+        "signal_to_noise": signal_to_noise_sqi,
+        "zero_crossings_rate": zero_crossings_rate_sqi,
+        "mean_crossing_rate": mean_crossing_rate_sqi,
+    }
+    signal = ppg[:30000]
+
+    start = time.perf_counter()
+    online = OnlineSQI(sampling_rate=100, window=30, hop=1, sqis=list(sqis))
+    for i in range(0, len(signal), 1000):
+        online.push(signal[i : i + 1000])
+    online_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for end in range(3000, len(signal) + 1, 100):
+        window = signal[end - 3000 : end]
+        for sqi in sqis.values():
+            sqi(window)
+    recompute_time = time.perf_counter() - start
+    assert online_time < recompute_time
+
+
+def test_online_sqi_float_sampling_rate(ppg):
+    # Monitor feeds often report the sampling rate as a float
+    df = push_packets(OnlineSQI(sampling_rate=100.0, window=10, hop=1), ppg[:6000])
+    expected = push_packets(OnlineSQI(sampling_rate=100, window=10, hop=1), ppg[:6000])
+    assert df["hr_mean"].notna().all()
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_online_sqi_constant_windows():
+    signal = np.concatenate((np.zeros(1500), np.full(1500, 3.0)))
+    online = OnlineSQI(sampling_rate=100, window=10, hop=0.5, sqis=["kurtosis"])
+    df = online.push(signal)
+    assert df["kurtosis"].iloc[0] == 0
+    assert np.isnan(df["kurtosis"].iloc[-1])
+    assert df["kurtosis"].iloc[5] == pytest.approx(
+        kurtosis_sqi(signal[df["start_idx"].iloc[5] : df["end_idx"].iloc[5]])
+    )
+
+
+def test_online_sqi_decisions(ppg):
+    ruleset = generate_ruleset(
+        "tests/test_data/rule_dict_test.json", {1: "skewness_1"}, auto_mode=False
+    )
+    online = OnlineSQI(
+        sampling_rate=100,
+        window=10,
+        hop=1,
+        sqis={"skewness_1": "skewness"},
+        ruleset=ruleset,
+    )
+    df = online.push(ppg[:3000])
+    assert df.columns.tolist() == ["skewness_1", "start_idx", "end_idx", "decision"]
+    expected = ruleset.execute_batch(df[["skewness_1"]])
+    assert df["decision"].tolist() == expected.tolist()
+
+    online.reset()
+    assert online.push(ppg[:999]).empty
+    assert len(online.push(ppg[999:1000])) == 1
+
+
+def test_online_sqi_invalid_input():
+    with pytest.raises(ValueError):
+        OnlineSQI(sampling_rate=100, window=1, hop=2)
+    with pytest.raises(ValueError, match="Unknown online SQIs"):
+        OnlineSQI(sampling_rate=100, sqis=["entropy"])
@@ -8,13 +8,32 @@ from vital_sqi.pipeline.pipeline_functions import (
     map_decision,
     get_decision_segments,
     per_beat_sqi,
+    get_beat_matrix,
     get_sqi_dict,
     get_sqi,
     extract_segment_sqi,
+    extract_batch_sqi,
     extract_sqi,
     generate_rule,
+    get_n_jobs,
+    SQIPlan,
+    _bounded_map,
 )
+from concurrent.futures import ThreadPoolExecutor
+import pickle
+from unittest.mock import patch
+from vital_sqi.sqi import sqi_mapping
+from vital_sqi.sqi.standard_sqi import kurtosis_sqi
+from vital_sqi.preprocess.preprocess_signal import taper_signal
+from scipy.signal import resample
 from vital_sqi.rule import Rule
+from vital_sqi.data.signal_io import PPG_stream_reader
+from vital_sqi.common.rpeak_detection import (
+    PeakDetector,
+    FiducialIndex,
+    DEFAULT,
+    BILLAUER_METHOD,
+)
 
 
 # Fixtures for test data
@@ -101,6 +120,55 @@ def test_per_beat_sqi(mock_segments):
     )  # SQI values should be numeric
 
 
+def test_per_beat_sqi_batch_attribute(mock_segments):
+    calls = []
+
+    def mock_sqi_func(signal, **kwargs):
+        return np.mean(signal)
+
+    def mock_sqi_batch(beats, **kwargs):
+        calls.append(len(beats))
+        return [np.mean(beat) for beat in beats]
+
+    signal = mock_segments[0]["signal"]
+    troughs = [0, 3, 6, 10]
+    expected = per_beat_sqi(mock_sqi_func, troughs, signal, False, 100)
+    mock_sqi_func.batch = mock_sqi_batch
+    sqi_vals = per_beat_sqi(mock_sqi_func, troughs, signal, False, 100)
+    assert calls == [len(troughs) - 1]
+    np.testing.assert_allclose(sqi_vals, expected)
+
+
+def test_get_beat_matrix():
+    signal = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    signal = signal[:3000]
+    _, troughs = PeakDetector().ppg_detector(signal, DEFAULT)
+    troughs = np.append(troughs, troughs[-1])  # with an empty beat
+    beats = [signal[a:b] for a, b in zip(troughs[:-1], troughs[1:]) if b > a]
+
+    matrix, mean_beat = get_beat_matrix(signal, troughs, 100)
+    expected = np.array([resample(beat, 100) for beat in beats])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(mean_beat, expected.mean(axis=0), atol=1e-9)
+
+    matrix, _ = get_beat_matrix(signal, troughs, 100, taper=True)
+    expected = np.array([resample(taper_signal(beat), 100) for beat in beats])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-12, atol=1e-9)
+
+    matrix, _ = get_beat_matrix(signal, troughs, 50, method="linear")
+    assert matrix.shape == (len(beats), 50)
+    np.testing.assert_allclose(matrix[:, 0], [beat[0] for beat in beats])
+    np.testing.assert_allclose(matrix[:, -1], [beat[-1] for beat in beats])
+
+    matrix, mean_beat = get_beat_matrix(signal, [5, 5], 100)
+    assert matrix.shape == (0, 100) and mean_beat is None
+    with pytest.raises(ValueError, match="method"):
+        get_beat_matrix(signal, troughs, method="cubic")
+
+    sqi_vals = per_beat_sqi(kurtosis_sqi, troughs, signal, False, 100)
+    assert sqi_vals == pytest.approx([kurtosis_sqi(beat) for beat in beats])
+
+
 def test_get_sqi_dict():
     sqi_values = [0.5, 0.7]
     result = get_sqi_dict(sqi_values, "mean_sqi")
@@ -160,6 +228,171 @@ def test_extract_sqi(mock_segments, mock_milestones):
     assert "end_idx" in df_sqi.columns
 
 
+def test_extract_sqi_parallel(mock_segments, mock_milestones):
+    sqi_file_path = "tests/test_data/sqi_dict.json"
+    df_serial = extract_sqi(mock_segments, mock_milestones, sqi_file_path)
+    df_parallel = extract_sqi(
+        mock_segments, mock_milestones, sqi_file_path, n_jobs=2
+    )
+    pd.testing.assert_frame_equal(df_serial, df_parallel)
+
+
+
+def test_bounded_map_chunks():
+    pulled = []
+
+    def items():
+        for i in range(50):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with patch.object(executor, "submit", wraps=executor.submit) as submit:
+            results = _bounded_map(executor, abs, items(), max_pending=2, chunksize=8)
+            assert next(results) == 0
+            # Two tasks of 8 segments in flight before the first result
+            assert len(pulled) <= 16
+            assert [0] + list(results) == list(range(50))
+            assert submit.call_count == 7
+
+def test_extract_sqi_on_chunks():
+    sqi_file_path = "tests/test_data/sqi_dict.json"
+    chunks = list(
+        PPG_stream_reader(
+            "tests/test_data/ppg_smartcare.csv",
+            signal_idx=["PLETH"],
+            timestamp_idx=["TIMESTAMP_MS"],
+            duration=10,
+        )
+    )[:3]
+    df_chunks = extract_sqi((chunk for chunk in chunks), None, sqi_file_path)
+    segments = [chunk.to_frame() for chunk in chunks]
+    milestones = pd.DataFrame(
+        [[chunk.start_idx, chunk.end_idx] for chunk in chunks],
+        columns=["start", "end"],
+    )
+    df_segments = extract_sqi(segments, milestones, sqi_file_path)
+    pd.testing.assert_frame_equal(df_chunks, df_segments)
+    assert df_chunks["start_idx"].tolist() == [0, 1000, 2000]
+
+    with pytest.raises(ValueError, match="Milestones are required"):
+        extract_sqi(segments, None, sqi_file_path)
+
+
+def test_extract_sqi_with_fiducials():
+    sqi_file_path = "tests/test_data/sqi_dict.json"
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    fiducials = FiducialIndex.detect(ppg[:3000], detector_type=DEFAULT)
+    chunks = list(
+        PPG_stream_reader(
+            "tests/test_data/ppg_smartcare.csv",
+            signal_idx=["PLETH"],
+            timestamp_idx=["TIMESTAMP_MS"],
+            duration=10,
+        )
+    )[:3]
+    segments = [chunk.to_frame() for chunk in chunks]
+    milestones = pd.DataFrame({"start": [0, 1000, 2000], "end": [1000, 2000, 3000]})
+
+    detect = PeakDetector.ppg_detector
+    with patch.object(
+        PeakDetector, "ppg_detector", autospec=True, side_effect=detect
+    ) as mock_detector:
+        df_sqi = extract_sqi(segments, milestones, sqi_file_path, fiducials=fiducials)
+    # Only the other detector of msq runs on the segments
+    detector_types = {call.kwargs["detector_type"] for call in mock_detector.mock_calls}
+    assert detector_types == {BILLAUER_METHOD}
+
+    # Same fiducials sliced for chunks and in worker processes
+    df_chunks = extract_sqi(
+        (chunk for chunk in chunks), None, sqi_file_path, fiducials=fiducials
+    )
+    df_parallel = extract_sqi(
+        segments, milestones, sqi_file_path, n_jobs=2, fiducials=fiducials
+    )
+    pd.testing.assert_frame_equal(df_sqi, df_chunks)
+    pd.testing.assert_frame_equal(df_sqi, df_parallel)
+
+
+def test_extract_sqi_batched():
+    sqi_file_path = "tests/test_data/sqi_dict.json"
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    # Equal-length segments, a flat one and a shorter last one
+    segments = [ppg[i : i + 1000] for i in range(0, 5500, 1000)]
+    segments[2] = np.zeros(1000)
+    milestones = pd.DataFrame(
+        {"start": range(0, 5500, 1000), "end": [1000, 2000, 3000, 4000, 5000, 5500]}
+    )
+    df_sqi = extract_sqi(segments, milestones, sqi_file_path)
+    df_batched = extract_sqi(segments, milestones, sqi_file_path, batch_size=4)
+    df_parallel = extract_sqi(
+        segments, milestones, sqi_file_path, batch_size=4, n_jobs=2
+    )
+    pd.testing.assert_frame_equal(df_sqi, df_batched)
+    pd.testing.assert_frame_equal(df_sqi, df_parallel)
+    assert {"kurtosis_2", "entropy_2", "signal_to_noise"} <= set(df_sqi.columns)
+    with pytest.raises(ValueError, match="batch_size"):
+        extract_sqi(segments, milestones, sqi_file_path, batch_size=0)
+
+
+def test_sqi_plan(sqi_dict):
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    segment = ppg[:3000]
+    sqi_names = list(sqi_dict.keys())
+    sqi_list = [sqi_mapping[sqi["sqi"]] for sqi in sqi_dict.values()]
+    sqi_arg_list = {name: sqi["args"] for name, sqi in sqi_dict.items()}
+    plan = SQIPlan.from_file("tests/test_data/sqi_dict.json", wave_type="PPG")
+    assert plan.sqi_names == sqi_names
+
+    expected = extract_segment_sqi(
+        segment, sqi_list, sqi_names, sqi_arg_list, wave_type="PPG"
+    )
+    pd.testing.assert_series_equal(plan.execute(segment), expected)
+    # Frequency SQIs take the arguments of sqi_dict.json
+    assert {"peak_frequency", "normalized_power", "lf_hf_ratio"} <= set(expected.index)
+    # Lambdas of sqi_mapping are resolved again when unpickled
+    unpickled = pickle.loads(pickle.dumps(plan))
+    pd.testing.assert_series_equal(unpickled.execute(segment), expected)
+
+    segments = [ppg[i : i + 1000] for i in range(0, 3000, 1000)]
+    milestones = pd.DataFrame({"start": [0, 1000, 2000], "end": [1000, 2000, 3000]})
+    pd.testing.assert_frame_equal(
+        extract_sqi(segments, milestones, plan, n_jobs=2),
+        extract_sqi(segments, milestones, "tests/test_data/sqi_dict.json"),
+    )
+    with pytest.raises(ValueError, match="wave_type"):
+        SQIPlan(sqi_dict, wave_type="EEG")
+
+
+def test_sqi_plan_shared_by_extractors(sqi_dict):
+    ppg = pd.read_csv("tests/test_data/ppg_smartcare.csv")["PLETH"].to_numpy(float)
+    segments = [ppg[i : i + 1000] for i in range(0, 3000, 1000)]
+    plan = SQIPlan(sqi_dict, wave_type="PPG")
+    sqi_names = list(sqi_dict.keys())
+    sqi_list = [sqi_mapping[sqi["sqi"]] for sqi in sqi_dict.values()]
+    sqi_arg_list = {name: sqi["args"] for name, sqi in sqi_dict.items()}
+
+    expected = [plan.execute(segment) for segment in segments]
+    result = extract_batch_sqi(segments, sqi_list, sqi_names, sqi_arg_list, "PPG")
+    for row, expected_row in zip(result, expected):
+        pd.testing.assert_series_equal(row, expected_row)
+    # Per beat, on NN intervals, and taking wave_type or fiducial_cache
+    for name in ["kurtosis_1", "skewness", "dtw", "sdnn", "msq", "ectopic"]:
+        sqi = sqi_dict[name]
+        sqi_func = sqi_mapping[sqi["sqi"]]
+        sqis = get_sqi(sqi_func, name, segments[0], **sqi["args"])
+        for key, value in sqis.items():
+            assert value == pytest.approx(expected[0][key], nan_ok=True)
+
+
+def test_get_n_jobs():
+    assert get_n_jobs(None) == 1
+    assert get_n_jobs(4) == 4
+    assert get_n_jobs(-1) >= 1
+    with pytest.raises(ValueError):
+        get_n_jobs(0)
+
+
 def test_generate_rule():
     # Load rule_dict_test.json directly
     rule_file_path = "tests/test_data/rule_dict_test.json"
@@ -6,9 +6,12 @@ from vital_sqi.pipeline.pipeline_highlevel import (
     get_ecg_sqis,
     get_qualified_ppg,
     get_qualified_ecg,
+    stream_qualified_ppg,
 )
 from vital_sqi.data.signal_sqi_class import SignalSQI
+from vital_sqi.data.segment_store import SegmentStore
 from unittest.mock import patch
+import numpy as np
 import pandas as pd
 import json
 
@@ -58,6 +61,23 @@ class TestGetPPGSQIs:
         ), "Returned object should be of type SignalSQI."
         assert signal_obj.sqis is not None, "SQIs should not be None."
 
+    def test_on_recording_fiducials(self):
+        """Test get_ppg_sqis with fiducials detected on the whole recording."""
+        file_in = os.path.abspath("tests/test_data/ppg_smartcare.csv")
+        sqi_dict = os.path.abspath("tests/test_data/sqi_dict.json")
+        segments, signal_obj = get_ppg_sqis(
+            file_name=file_in,
+            sqi_dict_filename=sqi_dict,
+            signal_idx=6,
+            timestamp_idx=0,
+            split_type=1,
+            recording_fiducials=True,
+        )
+        troughs = signal_obj.fiducials.troughs
+        assert len(segments[0]) == len(troughs) - 1
+        np.testing.assert_array_equal(signal_obj.sqis[0]["start_idx"], troughs[:-1])
+        np.testing.assert_array_equal(signal_obj.sqis[0]["end_idx"], troughs[1:])
+
     def test_on_missing_file(self):
         """Test get_ppg_sqis with a missing PPG file."""
         sqi_dict = os.path.abspath("tests/test_data/sqi_dict.json")
@@ -86,6 +106,80 @@ class TestGetPPGSQIs:
         os.unlink(empty_file.name)
 
 
+class TestStreamQualifiedPPG:
+    file_in = os.path.abspath("tests/test_data/ppg_smartcare.csv")
+    sqi_dict = os.path.abspath("tests/test_data/sqi_dict.json")
+    rule_dict_filename = os.path.abspath("tests/test_data/rule_dict_test.json")
+    ruleset_order = {2: "skewness_1", 1: "perfusion"}
+
+    def run(self, func, output_dir, **kwargs):
+        return func(
+            file_name=self.file_in,
+            sqi_dict_filename=self.sqi_dict,
+            signal_idx=["PLETH"],
+            timestamp_idx=["TIMESTAMP_MS"],
+            duration=30,
+            rule_dict_filename=self.rule_dict_filename,
+            ruleset_order=self.ruleset_order,
+            output_dir=output_dir,
+            **kwargs,
+        )
+
+    def test_on_same_output_as_batch(self, tmp_path):
+        batch_dir, stream_dir = tmp_path / "batch", tmp_path / "stream"
+        batch_dir.mkdir()
+        stream_dir.mkdir()
+        batch_obj = self.run(get_qualified_ppg, str(batch_dir))
+        stream_obj = self.run(stream_qualified_ppg, str(stream_dir), block_size=4000)
+
+        assert isinstance(stream_obj, SignalSQI)
+        pd.testing.assert_frame_equal(batch_obj.sqis[0], stream_obj.sqis[0])
+        for seg_type in ["accept", "reject"]:
+            batch_files = sorted(os.listdir(batch_dir / seg_type))
+            assert batch_files == sorted(os.listdir(stream_dir / seg_type))
+            for file_name in batch_files:
+                assert (batch_dir / seg_type / file_name).read_text() == (
+                    stream_dir / seg_type / file_name
+                ).read_text()
+
+    def test_on_fixed_thresholds(self, tmp_path):
+        signal_obj = self.run(stream_qualified_ppg, str(tmp_path), auto_mode=False)
+        sqi_df = signal_obj.sqis[0]
+        expected = signal_obj.ruleset.execute_batch(
+            sqi_df[list(self.ruleset_order.values())]
+        )
+        assert sqi_df["decision"].tolist() == list(expected)
+        n_saved = len(os.listdir(tmp_path / "accept")) + len(
+            os.listdir(tmp_path / "reject")
+        )
+        assert n_saved == len(sqi_df)
+
+    def test_on_npy_backend(self, tmp_path):
+        batch_dir, stream_dir = tmp_path / "batch", tmp_path / "stream"
+        batch_dir.mkdir()
+        stream_dir.mkdir()
+        self.run(get_qualified_ppg, str(batch_dir), segment_name="seg", backend="npy")
+        signal_obj = self.run(
+            stream_qualified_ppg, str(stream_dir), segment_name="seg", backend="npy"
+        )
+        sqi_df = signal_obj.sqis[0]
+        for seg_type in ["accept", "reject"]:
+            batch_store = SegmentStore(str(batch_dir / seg_type / "seg"))
+            stream_store = SegmentStore(str(stream_dir / seg_type / "seg"))
+            np.testing.assert_array_equal(batch_store.signals, stream_store.signals)
+            selected = sqi_df[sqi_df["decision"] == seg_type]
+            assert stream_store.milestones["start"].tolist() == (
+                selected["start_idx"].tolist()
+            )
+            for store in (batch_store, stream_store):
+                assert store.milestones["start"].tolist() == (
+                    selected["start_idx"].tolist()
+                )
+                assert store.index["decision"].tolist() == [seg_type] * len(selected)
+                for name in self.ruleset_order.values():
+                    np.testing.assert_allclose(store.sqis[name], selected[name])
+
+
 # class TestGetQualifiedPPG:
 #     @patch("vital_sqi.pipeline.pipeline_functions.extract_sqi")
 #     def test_on_valid_ppg_with_classification(self, mock_extract_sqi):
@@ -27,6 +27,14 @@ def test_taper_signal_with_window():
     np.testing.assert_almost_equal(tapered_signal, expected_result)
 
 
+def test_taper_signal_rows():
+    """Test that a 2D array is tapered row by row."""
+    signals = np.array([[1, 2, 3, 4, 5], [4, 1, 0, 2, 7]])
+    tapered = taper_signal(signals)
+    expected = np.array([taper_signal(row) for row in signals])
+    np.testing.assert_almost_equal(tapered, expected)
+
+
 def test_smooth_signal_flat_window():
     """Test smoothing a signal with a flat window."""
     signal = np.array([1, 2, 3, 4, 5, 6, 7])
@@ -4,10 +4,13 @@ import numpy as np
 import pandas as pd
 import tempfile
 from unittest.mock import patch
-from vital_sqi.common.rpeak_detection import PeakDetector
+from vital_sqi.common.rpeak_detection import PeakDetector, FiducialIndex
+from vital_sqi.data.signal_io import SignalChunk
+from vital_sqi.data.segment_store import SegmentStore
 from vital_sqi.preprocess.segment_split import (
     split_segment,
     save_segment,
+    SegmentWriter,
 )  # Replace with actual module name
 
 
@@ -42,6 +45,25 @@ def test_split_segment_time_based_with_overlap(generate_signal_data):
     assert milestones.iloc[1, 0] == 50  # Next segment starts at 50% overlap
 
 
+def test_split_segment_on_chunk():
+    """Test splitting a streamed chunk keeps positions in the recording."""
+    chunk = SignalChunk(
+        start_idx=500,
+        end_idx=1500,
+        start_datetime=pd.Timestamp(0),
+        sampling_rate=10.0,
+        timestamps=np.arange(1000, dtype=np.int64) * 10**8,
+        signals=np.sin(np.arange(1000) / 10).astype(np.float32).reshape(-1, 1),
+        columns=("signal",),
+    )
+    segments, milestones = split_segment(chunk, sampling_rate=None, duration=10)
+
+    assert len(segments) == 10
+    assert milestones.iloc[0].tolist() == [500, 600]
+    assert milestones.iloc[-1].tolist() == [1400, 1500]
+    np.testing.assert_array_equal(segments[1]["signal"], chunk.signals[100:200, 0])
+
+
 def test_split_segment_beat_based():
     """Test splitting signal by beats."""
     test_data_path = "tests/test_data/ppg_smartcare.csv"
@@ -57,6 +79,34 @@ def test_split_segment_beat_based():
     # assert milestones.shape == (111, 2)  # Start and end indices for each segment
 
 
+def test_split_segment_beat_based_on_fiducials():
+    """Test splitting by beats on the fiducials of the whole recording."""
+    fiducials = FiducialIndex([5, 25, 45, 65], [0, 20, 40, 60, 80])
+    signal = pd.DataFrame({"signal": np.arange(100, dtype=float)})
+    with patch.object(PeakDetector, "ppg_detector") as mock_detector:
+        segments, milestones = split_segment(
+            signal, sampling_rate=100, split_type=1, fiducials=fiducials
+        )
+    mock_detector.assert_not_called()
+    assert milestones.values.tolist() == [[0, 20], [20, 40], [40, 60], [60, 80]]
+    np.testing.assert_array_equal(segments[1]["signal"], np.arange(20, 40))
+
+    # The troughs of a chunk are taken at its position in the recording
+    chunk = SignalChunk(
+        start_idx=30,
+        end_idx=100,
+        start_datetime=pd.Timestamp(0),
+        sampling_rate=100.0,
+        timestamps=np.arange(70, dtype=np.int64) * 10**7,
+        signals=np.arange(30, 100, dtype=np.float32).reshape(-1, 1),
+        columns=("signal",),
+    )
+    _, milestones = split_segment(
+        chunk, sampling_rate=None, split_type=1, fiducials=fiducials
+    )
+    assert milestones.values.tolist() == [[40, 60], [60, 80]]
+
+
 def test_split_segment_invalid_input(generate_signal_data):
     """Test invalid input for split_segment."""
     signal = generate_signal_data
@@ -85,6 +135,86 @@ def test_save_segment(generate_signal_data):
         # assert len(saved_img_files) == len(segments)  # All segments saved as PNG
 
 
+def test_split_segment_on_array(generate_signal_data):
+    """Test splitting an array into views gives the same segments."""
+    values = generate_signal_data[["signal"]].to_numpy()
+    segments, milestones = split_segment(values, sampling_rate=10, duration=10)
+    expected_segments, expected_milestones = split_segment(
+        generate_signal_data, sampling_rate=10, duration=10
+    )
+    pd.testing.assert_frame_equal(milestones, expected_milestones)
+    for segment, expected in zip(segments, expected_segments):
+        assert np.shares_memory(segment, values)
+        np.testing.assert_array_equal(segment[:, 0], expected["signal"])
+
+
+def test_segment_writer(generate_signal_data):
+    """Test incremental saving gives the same files as save_segment."""
+    segments, _ = split_segment(generate_signal_data, sampling_rate=10, duration=5)
+    batch_dir, stream_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    save_segment(segments, segment_name="test", save_file_folder=batch_dir)
+    with SegmentWriter(segment_name="test", save_file_folder=stream_dir) as writer:
+        for segment in segments:
+            writer.write(segment)
+    assert writer.count == 20
+    assert sorted(os.listdir(batch_dir)) == sorted(os.listdir(stream_dir))
+    assert "test-01.csv" in os.listdir(stream_dir)
+
+
+def test_save_segment_npy_backend(generate_signal_data):
+    """Test saving all segments to a single SegmentStore."""
+    segments, milestones = split_segment(
+        generate_signal_data, sampling_rate=10, duration=5
+    )
+    save_dir = tempfile.mkdtemp()
+    save_segment(segments, segment_name="test", save_file_folder=save_dir, backend="npy")
+    assert os.listdir(save_dir) == ["test"]
+    store = SegmentStore(os.path.join(save_dir, "test"))
+    assert len(store) == len(segments)
+    np.testing.assert_array_equal(store.milestones.values, milestones.values)
+    for segment, values in zip(segments, store):
+        np.testing.assert_array_equal(
+            values, segment.select_dtypes(include=["number"]).to_numpy()
+        )
+
+    stream_dir = tempfile.mkdtemp()
+    with SegmentWriter("test", stream_dir, backend="npy") as writer:
+        for segment in segments:
+            writer.write(segment, decision="accept")
+    stream_store = SegmentStore(os.path.join(stream_dir, "test"))
+    np.testing.assert_array_equal(stream_store.signals, store.signals)
+    assert set(stream_store.index["decision"]) == {"accept"}
+
+
+
+def test_save_segment_npy_backend_metadata(generate_signal_data):
+    """Test keeping the decision and SQIs of each segment in the store."""
+    segments, milestones = split_segment(
+        generate_signal_data, sampling_rate=10, duration=5
+    )
+    decisions = ["accept", "reject"] * (len(segments) // 2) + ["accept"] * (
+        len(segments) % 2
+    )
+    sqis = pd.DataFrame({"kurtosis": np.arange(len(segments), dtype=float)})
+    save_dir = tempfile.mkdtemp()
+    save_segment(
+        segments,
+        segment_name=None,
+        save_file_folder=save_dir,
+        backend="npy",
+        milestones=milestones + 100,
+        decisions=decisions,
+        sqis=sqis,
+    )
+    assert os.listdir(save_dir) == ["segment"]
+    store = SegmentStore(os.path.join(save_dir, "segment"))
+    np.testing.assert_array_equal(store.milestones.values, milestones.values + 100)
+    assert store.index["decision"].tolist() == decisions
+    np.testing.assert_array_equal(store.sqis["kurtosis"], sqis["kurtosis"])
+
+    with pytest.raises(ValueError, match="decisions"):
+        save_segment(segments, save_file_folder=save_dir, backend="npy", decisions=[])
+
 def test_save_segment_invalid_input():
     """Test invalid input for save_segment."""
     with pytest.raises(AssertionError):
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from vital_sqi.rule.rule_class import Rule
 import os
 import tempfile
@@ -83,6 +84,20 @@ class TestRuleClass(object):
         assert out.apply_rule(10) == "reject"  # On the boundary
         assert out.apply_rule(12) == "accept"  # Above the highest boundary
 
+    def test_on_apply_rule_vectorized(self):
+        out = Rule("test_sqi")
+        out.update_def(
+            op_list=["<=", "<", ">=", ">"],
+            value_list=[3, 4, 10, 11],
+            label_list=["reject", "accept", "reject", "accept"],
+        )
+        values = [2, 3, 3.5, 4, 10, 10.5, 11, 12, np.nan]
+        expected = [out.apply_rule(x) for x in values]
+        assert list(out.apply_rule_vectorized(values)) == expected
+
+        out.rule = {"def": [], "boundaries": [], "labels": []}
+        assert list(out.apply_rule_vectorized([1, 2])) == [None, None]
+
     def test_on_save(self):
         rule_obj = Rule("perfusion")
         source = os.path.abspath("tests/test_data/rule_dict_test.json")
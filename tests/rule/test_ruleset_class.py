@@ -76,6 +76,19 @@ class TestRuleSet(object):
             self.s.execute(dat)
         assert exc_info.match("not found in input data frame")
 
+    def test_on_execute_batch(self):
+        dat = pd.DataFrame(
+            [[6, 100, 1], [10, 100, 0], [0, 0, 0], [3, float("nan"), 5]],
+            columns=["perfusion", "entropy", "skewness_1"],
+        )
+        expected = [self.s.execute(dat.iloc[[idx]]) for idx in range(len(dat))]
+        assert list(self.s.execute_batch(dat)) == expected
+        assert len(self.s.execute_batch(dat.iloc[:0])) == 0
+        with pytest.raises(KeyError) as exc_info:
+            dat = pd.DataFrame([[6, 100, 1]], columns=["perfusion", "entropy", "sqi4"])
+            self.s.execute_batch(dat)
+        assert exc_info.match("not found in input data frame")
+
     @pytest.fixture
     def sample_rules(self):
         """Fixture to create sample Rule objects for testing."""
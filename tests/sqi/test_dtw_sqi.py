@@ -1,6 +1,70 @@
 import pytest
 import numpy as np
-from vital_sqi.sqi.dtw_sqi import dtw_sqi
+from vital_sqi.sqi.dtw_sqi import (
+    dtw_sqi,
+    dtw_sqi_batch,
+    dtw_band,
+    dtw_distance,
+    dtw_distance_batch,
+    lb_keogh,
+)
+
+
+def naive_dtw(seq1, seq2, lo=None, hi=None):
+    """Reference DTW filling the full accumulated cost matrix cell by cell."""
+    n, m = len(seq1), len(seq2)
+    dtw_matrix = np.full((n + 1, m + 1), np.inf)
+    dtw_matrix[0, 0] = 0
+    for i in range(1, n + 1):
+        columns = range(1, m + 1) if lo is None else range(lo[i - 1], hi[i - 1] + 1)
+        for j in columns:
+            dtw_matrix[i, j] = abs(seq1[i - 1] - seq2[j - 1]) + min(
+                dtw_matrix[i - 1, j], dtw_matrix[i, j - 1], dtw_matrix[i - 1, j - 1]
+            )
+    return dtw_matrix[n, m]
+
+
+class TestDtwDistance:
+    rng = np.random.default_rng(0)
+    seq1 = rng.normal(size=25)
+    seq2 = rng.normal(size=18)
+
+    def test_on_unconstrained(self):
+        assert dtw_distance(self.seq1, self.seq2) == pytest.approx(
+            naive_dtw(self.seq1, self.seq2)
+        )
+        assert dtw_distance([0, 1, 2], [0, 0, 1, 2]) == 0
+
+    @pytest.mark.parametrize(
+        "band, window", [("sakoe_chiba", 0), ("sakoe_chiba", 3), ("itakura", None)]
+    )
+    def test_on_band(self, band, window):
+        lo, hi = dtw_band(len(self.seq1), len(self.seq2), band, window)
+        expected = naive_dtw(self.seq1, self.seq2, lo, hi)
+        result = dtw_distance(self.seq1, self.seq2, band=band, window=window)
+        assert np.isfinite(result)
+        assert result == pytest.approx(expected)
+        assert result >= dtw_distance(self.seq1, self.seq2)
+        assert lb_keogh(self.seq1, self.seq2, band, window) <= result
+
+    def test_on_invalid_band(self):
+        with pytest.raises(ValueError, match="Unknown band constraint"):
+            dtw_distance(self.seq1, self.seq2, band="diagonal")
+        with pytest.raises(ValueError, match="non-negative window"):
+            dtw_distance(self.seq1, self.seq2, band="sakoe_chiba")
+
+    def test_on_early_abandon(self):
+        distance = dtw_distance(self.seq1, self.seq2)
+        assert dtw_distance(self.seq1, self.seq2, max_distance=distance + 1e-6) == (
+            pytest.approx(distance)
+        )
+        assert dtw_distance(self.seq1, self.seq2, max_distance=distance / 2) == np.inf
+
+    def test_on_batch(self):
+        seqs = [self.rng.normal(size=n) for n in [10, 12, 10, 7]]
+        expected = [dtw_distance(seq, self.seq2, "sakoe_chiba", 4) for seq in seqs]
+        result = dtw_distance_batch(seqs, self.seq2, "sakoe_chiba", 4)
+        np.testing.assert_allclose(result, expected)
 
 
 class TestDtwSqi:
@@ -108,3 +172,24 @@ class TestDtwSqi:
     #     for template_type in self.template_types:
     #         with pytest.raises(ValueError, match="Signal must be one-dimensional."):
     #             dtw_sqi(high_dim_signal, template_type)
+
+    def test_on_batch(self):
+        """Test that batch scoring matches scoring each beat on its own."""
+        beats = [np.sin(np.linspace(0, np.pi, n)) + 0.1 * n for n in [40, 55, 61]]
+        for template_type in [0, 1, 2]:
+            for simple_mode in [False, True]:
+                expected = [
+                    dtw_sqi(beat, template_type, simple_mode=simple_mode)
+                    for beat in beats
+                ]
+                result = dtw_sqi_batch(beats, template_type, simple_mode=simple_mode)
+                np.testing.assert_allclose(result, expected)
+
+    def test_on_batch_validation(self):
+        """Test that batch scoring validates each beat as dtw_sqi does."""
+        assert dtw_sqi.batch is dtw_sqi_batch
+        for beat in [self.invalid_signal, self.empty_signal]:
+            with pytest.raises(ValueError):
+                dtw_sqi(beat, 0)
+            with pytest.raises(ValueError):
+                dtw_sqi_batch([self.valid_signal, beat], 0)
@@ -16,6 +16,9 @@ from vital_sqi.sqi.hrv_sqi import (
     poincare_features_sqi,
     get_all_features_hrva,
 )
+from unittest.mock import patch
+from vital_sqi.common.power_spectrum import calculate_psd
+from vital_sqi.common.rpeak_detection import FiducialCache
 
 
 class TestHRVSQIs:
@@ -273,6 +276,23 @@ class TestHRVSQIs:
         )
         assert np.isnan(very_high_hf_ratio)
 
+    def test_frequency_sqis_share_psd(self):
+        nn_intervals = np.array(self.generate_nn_intervals(length=300))
+        cache = FiducialCache()
+        with patch(
+            "vital_sqi.sqi.hrv_sqi.calculate_psd", wraps=calculate_psd
+        ) as mock_psd:
+            ratio = lf_hf_ratio_sqi(nn_intervals, fiducial_cache=cache)
+            power = frequency_sqi(
+                nn_intervals, metric="absolute", fiducial_cache=cache
+            )
+        assert mock_psd.call_count == 1
+        assert ratio == pytest.approx(lf_hf_ratio_sqi(nn_intervals))
+        assert power == pytest.approx(frequency_sqi(nn_intervals, metric="absolute"))
+        # A known PSD is used as given
+        psd = calculate_psd(nn_intervals)
+        assert frequency_sqi(nn_intervals, metric="absolute", psd=psd) == power
+
     def test_poincare_features_sqi(self, valid_nn_intervals, short_nn_intervals):
         features = poincare_features_sqi(valid_nn_intervals)
         assert features["sd1"] >= 0
@@ -2,6 +2,7 @@ import pytest
 import numpy as np
 from scipy import signal
 from vitalDSP.utils.synthesize_data import generate_ecg_signal
+from vital_sqi.common.rpeak_detection import FiducialCache
 from vital_sqi.sqi.rpeaks_sqi import (
     ectopic_sqi,
     correlogram_sqi,
@@ -172,3 +173,10 @@ class TestRPeakSQI:
                     wave_type="PPG",
                 )
             )
+
+    def test_msq_sqi_ecg_with_cache(self):
+        """Test that ECG msq_sqi is the same with and without a cache."""
+        ecg_signal = generate_ecg_signal(sfecg=256, N=30, Anoise=0.05, hrmean=70)
+        uncached = msq_sqi(ecg_signal, wave_type="ECG")
+        cached = msq_sqi(ecg_signal, wave_type="ECG", fiducial_cache=FiducialCache())
+        assert uncached == cached == 1.0
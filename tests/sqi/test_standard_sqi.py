@@ -8,6 +8,7 @@ from vital_sqi.sqi.standard_sqi import (
     signal_to_noise_sqi,
     zero_crossings_rate_sqi,
     mean_crossing_rate_sqi,
+    sliding_window_sqi,
 )
 
 
@@ -114,3 +115,89 @@ class TestMeanCrossingRateSqi:
     def test_mean_crossing_rate_sqi_invalid_inputs(self):
         with pytest.raises(TypeError):
             mean_crossing_rate_sqi("invalid")
+
+
+class TestSlidingWindowSqi:
+    functions = {
+        "perfusion_sqi": lambda w: perfusion_sqi(w, w),
+        "kurtosis_sqi": kurtosis_sqi,
+        "skewness_sqi": skewness_sqi,
+        "signal_to_noise_sqi": signal_to_noise_sqi,
+        "zero_crossings_rate_sqi": zero_crossings_rate_sqi,
+        "mean_crossing_rate_sqi": mean_crossing_rate_sqi,
+    }
+
+    def test_on_overlapping_windows(self):
+        rng = np.random.default_rng(0)
+        # Wandering baseline, with a flat and a zero stretch
+        signal = np.cumsum(rng.standard_normal(5000)) + 100
+        signal[1000:1400] = 7.0
+        signal[2000:2300] = 0.0
+        starts = np.arange(0, 5000, 50)
+        milestones = np.column_stack((starts, np.minimum(starts + 300, 5000)))
+        sqis = sliding_window_sqi(signal, milestones)
+        for name, function in self.functions.items():
+            expected = [function(signal[start:end]) for start, end in milestones]
+            np.testing.assert_allclose(
+                sqis[name], np.asarray(expected, dtype=float), rtol=1e-8, atol=1e-12
+            )
+
+    def test_on_dropout(self):
+        # Small pulsation on a high level, with a dropout to 0 for 5 s
+        t = np.arange(12000) / 100
+        signal = 50000 + 0.01 * np.sin(2 * np.pi * 1.2 * t)
+        signal[5000:5500] = 0.0
+        starts = np.arange(0, 9001, 100)
+        milestones = np.column_stack((starts, starts + 3000))
+        sqis = sliding_window_sqi(signal, milestones, ["kurtosis_sqi", "skewness_sqi"])
+        for name in ("kurtosis_sqi", "skewness_sqi"):
+            function = self.functions[name]
+            expected = [function(signal[start:end]) for start, end in milestones]
+            np.testing.assert_allclose(sqis[name], expected, rtol=1e-8, atol=1e-8)
+
+    def test_on_perfusion_with_filtered_signal(self):
+        raw_signal = np.arange(1, 101, dtype=float)
+        filtered_signal = np.sin(raw_signal)
+        sqis = sliding_window_sqi(
+            raw_signal, [[0, 10], [5, 40]], ["perfusion_sqi"], y=filtered_signal
+        )
+        assert sqis["perfusion_sqi"][1] == pytest.approx(
+            perfusion_sqi(raw_signal[5:40], filtered_signal[5:40])
+        )
+
+    def test_sliding_window_sqi_invalid_inputs(self):
+        with pytest.raises(ValueError, match="sliding-window mode"):
+            sliding_window_sqi(np.zeros(10), [[0, 5]], ["entropy_sqi"])
+        with pytest.raises(ValueError, match="within the signal"):
+            sliding_window_sqi(np.zeros(10), [[5, 15]])
+
+
+class TestBatchedSqi:
+    def test_on_rows_of_2d_signal(self):
+        rng = np.random.default_rng(0)
+        block = rng.standard_normal((6, 200)) + 5
+        block[1] = 0.0
+        block[2] = 3.0
+        functions = [
+            lambda x, **kw: perfusion_sqi(x, x, **kw),
+            kurtosis_sqi,
+            skewness_sqi,
+            signal_to_noise_sqi,
+            zero_crossings_rate_sqi,
+            mean_crossing_rate_sqi,
+        ]
+        for function in functions:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                expected = [function(row) for row in block]
+            np.testing.assert_allclose(
+                function(block, axis=-1), np.asarray(expected, dtype=float)
+            )
+
+    def test_on_entropy_of_2d_signal(self):
+        rng = np.random.default_rng(1)
+        block = rng.random((4, 100))
+        block[3] = 2.0
+        result = entropy_sqi(block, axis=1)
+        np.testing.assert_allclose(result[:3], [entropy_sqi(row) for row in block[:3]])
+        # A flat row has no distribution, as entropy_sqi raises on it
+        assert np.isnan(result[3])
@@ -1,6 +1,8 @@
 import pytest
 from vital_sqi.sqi.waveform_sqi import *
 from vital_sqi.data.signal_io import ECG_reader
+from vital_sqi.common.rpeak_detection import FiducialCache
+from unittest.mock import patch
 import os
 
 
@@ -38,6 +40,52 @@ class TestBandEnergySqi(object):
             )
         assert exc_info.match("Invalid band values")
 
+    def test_on_shared_stft(self):
+        signal = self.out.signals.iloc[:, 1].to_numpy()
+        fs = self.out.sampling_rate
+        cache = FiducialCache()
+        with patch("scipy.signal.stft", wraps=sn.stft) as mock_stft:
+            energies = [
+                lf_energy_sqi(signal, fs, fiducial_cache=cache),
+                qrs_energy_sqi(signal, fs, fiducial_cache=cache),
+                vhf_norm_power_sqi(signal, fs, fiducial_cache=cache),
+            ]
+        assert mock_stft.call_count == 1
+        np.testing.assert_array_equal(
+            energies,
+            [
+                lf_energy_sqi(signal, fs),
+                qrs_energy_sqi(signal, fs),
+                vhf_norm_power_sqi(signal, fs),
+            ],
+        )
+
+    def test_on_multi_band(self):
+        signal = self.out.signals.iloc[:, 1].to_numpy()
+        fs = self.out.sampling_rate
+        energies, normalized_powers = multi_band_energy_sqi(signal, fs)
+        np.testing.assert_array_equal(
+            energies,
+            [
+                lf_energy_sqi(signal, fs),
+                qrs_energy_sqi(signal, fs),
+                hf_energy_sqi(signal, fs),
+                band_energy_sqi(signal, fs, [150, np.inf]),
+            ],
+        )
+        np.testing.assert_array_equal(
+            normalized_powers[[1, 3]],
+            [
+                vhf_norm_power_sqi(signal, fs, band=[5, 25]),
+                vhf_norm_power_sqi(signal, fs),
+            ],
+        )
+        energies, _ = multi_band_energy_sqi(signal, fs, bands=[None, [1, 40]])
+        assert energies[0] == band_energy_sqi(signal, fs)
+        assert energies[1] == band_energy_sqi(signal, fs, [1, 40])
+        with pytest.raises(ValueError, match="Invalid band"):
+            multi_band_energy_sqi(signal, fs, bands=[[5, 1]])
+
     def test_on_sampling_rate(self):
         with pytest.raises(AssertionError) as exc_info:
             out = band_energy_sqi(
@@ -10,6 +10,14 @@ from vital_sqi.common.generate_template import (
     ppg_nonlinear_dynamic_system_template,
     ecg_dynamic_template,
     squeeze_template,
+    TemplateCache,
+    get_template,
+)
+from vital_sqi.common.band_filter import BandpassFilter, StreamingFilter
+from vital_sqi.common.rpeak_detection import (
+    PeakDetector,
+    FiducialCache,
+    SegmentFiducials,
+    FiducialIndex,
 )
-from vital_sqi.common.rpeak_detection import PeakDetector
 from vital_sqi.common.utils import *
@@ -1,11 +1,63 @@
 """Filtering of raw signals using bandpass filters."""
 
 import numpy as np
-from scipy.signal import butter, cheby1, cheby2, ellip, bessel, lfilter, filtfilt
+from functools import lru_cache
+from scipy.signal import (
+    butter,
+    cheby1,
+    cheby2,
+    ellip,
+    bessel,
+    sosfilt,
+    sosfilt_zi,
+    sosfiltfilt,
+)
 from scipy import signal
 import logging
 
 
+@lru_cache(maxsize=128)
+def _design_coefficients(band_type, fs, cutoff, order, a_pass, rp, rs, btype, output):
+    """
+    Designs the coefficients of `BandpassFilter._design_filter`, cached by
+    all design parameters and kept read-only.
+    """
+    nyq = 0.5 * fs
+    normal_cutoff = cutoff / nyq
+
+    if normal_cutoff <= 0 or normal_cutoff >= 1:
+        raise ValueError("Cutoff frequency must be between 0 and Nyquist frequency.")
+
+    if order <= 0:
+        raise ValueError("Filter order must be a positive integer.")
+
+    try:
+        if band_type == "cheby1":
+            coefficients = cheby1(
+                order, a_pass, normal_cutoff, btype=btype, output=output
+            )
+        elif band_type == "cheby2":
+            coefficients = cheby2(
+                order, a_pass, normal_cutoff, btype=btype, output=output
+            )
+        elif band_type == "ellip":
+            coefficients = ellip(
+                order, rp, rs, normal_cutoff, btype=btype, output=output
+            )
+        elif band_type == "bessel":
+            coefficients = bessel(order, normal_cutoff, btype=btype, output=output)
+        elif band_type == "butter":
+            coefficients = butter(order, normal_cutoff, btype=btype, output=output)
+        else:
+            raise ValueError(f"Invalid band type: {band_type}")
+    except Exception as e:
+        logging.error(f"Error in filter design: {e}")
+        raise ValueError("Filter design failed due to invalid parameters.")
+    for array in coefficients if output == "ba" else (coefficients,):
+        array.flags.writeable = False
+    return coefficients
+
+
 class BandpassFilter:
     """
     A class for bandpass filtering of signals using different filter types.
@@ -33,10 +85,15 @@ class BandpassFilter:
         self.band_type = band_type
         self.fs = fs
 
-    def _design_filter(self, cutoff, order, a_pass=3, rp=4, rs=40, btype="high"):
+    def _design_filter(
+        self, cutoff, order, a_pass=3, rp=4, rs=40, btype="high", output="ba"
+    ):
         """
         Designs a digital filter based on the specified parameters.
 
+        Designs are cached by their parameters, so filtering many segments
+        with the same filter designs it once.
+
         Parameters
         ----------
         cutoff : float
@@ -51,40 +108,22 @@ class BandpassFilter:
             Minimum stopband attenuation (only for elliptic filters, default is 40 dB).
         btype : str, optional
             Type of filter: "low", "high" (default is "high").
+        output : str, optional
+            "ba" for the transfer function coefficients or "sos" for
+            second-order sections (default is "ba").
 
         Returns
         -------
-        tuple
-            Filter coefficients (b, a).
+        tuple or np.ndarray
+            Filter coefficients (b, a), or second-order sections of shape
+            (n_sections, 6).
         """
-        nyq = 0.5 * self.fs
-        normal_cutoff = cutoff / nyq
-
-        if normal_cutoff <= 0 or normal_cutoff >= 1:
-            raise ValueError(
-                "Cutoff frequency must be between 0 and Nyquist frequency."
-            )
-
-        if order <= 0:
-            raise ValueError("Filter order must be a positive integer.")
-
-        try:
-            if self.band_type == "cheby1":
-                b, a = cheby1(order, a_pass, normal_cutoff, btype=btype)
-            elif self.band_type == "cheby2":
-                b, a = cheby2(order, a_pass, normal_cutoff, btype=btype)
-            elif self.band_type == "ellip":
-                b, a = ellip(order, rp, rs, normal_cutoff, btype=btype)
-            elif self.band_type == "bessel":
-                b, a = bessel(order, normal_cutoff, btype=btype)
-            elif self.band_type == "butter":
-                b, a = butter(order, normal_cutoff, btype=btype)
-            else:
-                raise ValueError(f"Invalid band type: {self.band_type}")
-        except Exception as e:
-            logging.error(f"Error in filter design: {e}")
-            raise ValueError("Filter design failed due to invalid parameters.")
-        return b, a
+        coefficients = _design_coefficients(
+            self.band_type, self.fs, cutoff, order, a_pass, rp, rs, btype, output
+        )
+        if output == "ba":
+            return tuple(np.array(array) for array in coefficients)
+        return np.array(coefficients)
 
     def signal_lowpass_filter(self, data, cutoff, order=3, a_pass=3, rp=4, rs=40):
         """
@@ -111,8 +150,10 @@ class BandpassFilter:
             The filtered signal.
         """
         try:
-            b, a = self._design_filter(cutoff, order, a_pass, rp, rs, btype="low")
-            return lfilter(b, a, data)
+            sos = self._design_filter(
+                cutoff, order, a_pass, rp, rs, btype="low", output="sos"
+            )
+            return sosfilt(sos, data)
         except Exception as e:
             logging.error(f"Low-pass filtering failed: {e}")
             return np.array([])
@@ -142,8 +183,209 @@ class BandpassFilter:
             The filtered signal.
         """
         try:
-            b, a = self._design_filter(cutoff, order, a_pass, rp, rs, btype="high")
-            return filtfilt(b, a, data)  # Zero-phase filtering for better results
+            sos = self._design_filter(
+                cutoff, order, a_pass, rp, rs, btype="high", output="sos"
+            )
+            # Zero-phase filtering for better results, padded as by filtfilt
+            return sosfiltfilt(sos, data, padlen=3 * (order + 1))
         except Exception as e:
             logging.error(f"High-pass filtering failed: {e}")
             return np.array([])
+
+    def signal_bandpass_filter(
+        self, data, low_cutoff, high_cutoff, order=3, a_pass=3, rp=4, rs=40
+    ):
+        """
+        Applies a zero-phase band-pass filter to the input signal.
+
+        The second-order sections of a high-pass filter at `low_cutoff` and
+        a low-pass filter at `high_cutoff` are cascaded and run forward and
+        backward in a single pass.
+
+        Parameters
+        ----------
+        data : array_like
+            The input signal to be filtered, or a 2-D array of signals, one
+            per row.
+        low_cutoff : float
+            The lower cutoff frequency of the band.
+        high_cutoff : float
+            The upper cutoff frequency of the band.
+        order : int, optional
+            The order of both filters (default is 3).
+        a_pass : float, optional
+            Passband maximum loss (only for Chebyshev Type I, default is 3).
+        rp : float, optional
+            Maximum ripple in the passband (only for elliptic filters, default is 4 dB).
+        rs : float, optional
+            Minimum stopband attenuation (only for elliptic filters, default is 40 dB).
+
+        Returns
+        -------
+        array_like
+            The filtered signal.
+        """
+        try:
+            if low_cutoff >= high_cutoff:
+                raise ValueError("Lower cutoff must be below the upper cutoff.")
+            sos = np.vstack(
+                (
+                    self._design_filter(
+                        low_cutoff, order, a_pass, rp, rs, btype="high", output="sos"
+                    ),
+                    self._design_filter(
+                        high_cutoff, order, a_pass, rp, rs, btype="low", output="sos"
+                    ),
+                )
+            )
+            return sosfiltfilt(sos, data)
+        except Exception as e:
+            logging.error(f"Band-pass filtering failed: {e}")
+            return np.array([])
+
+
+class StreamingFilter:
+    """
+    Filters a signal pushed chunk by chunk, as it would be filtered whole.
+
+    The state of the filter is carried from one chunk to the next, so the
+    chunks are filtered without discontinuities at their boundaries. With
+    no lookahead the filter is causal and its output matches `sosfilt` (or
+    `BandpassFilter.signal_lowpass_filter` for a low-pass filter) over the
+    whole signal. With a lookahead, samples are held back for `lookahead`
+    seconds and filtered backward over the samples that followed them,
+    which approximates the zero-phase filtering of `filtfilt` (as in
+    `BandpassFilter.signal_highpass_filter`) once the backward transient
+    has decayed over the lookahead. Near the ends of the signal, which
+    filtfilt pads, the outputs differ.
+
+    Parameters
+    ----------
+    cutoff : float or tuple of float
+        Cutoff frequency, or (low, high) cutoffs of a band-pass filter.
+    btype : str, optional
+        Type of filter: "low", "high" or "band" (default is "low").
+    order : int, optional
+        Order of the filter, or of both filters of a band-pass filter
+        (default is 3).
+    band_type : str, optional
+        Filter family, as in `BandpassFilter` (default is "butter").
+    fs : float, optional
+        Sampling frequency of the signal (default is 100 Hz).
+    lookahead : float, optional
+        Delay in seconds of the zero-phase approximation, 0 for causal
+        filtering (default is 0).
+    a_pass, rp, rs : float, optional
+        Ripple parameters, as in `BandpassFilter.signal_lowpass_filter`.
+
+    Examples
+    --------
+    >>> stream = StreamingFilter(cutoff=1, btype="high", fs=100, lookahead=5)
+    >>> filtered = [stream.push(chunk) for chunk in chunks]
+    >>> filtered.append(stream.flush())
+    """
+
+    def __init__(
+        self,
+        cutoff,
+        btype="low",
+        order=3,
+        band_type="butter",
+        fs=100,
+        lookahead=0,
+        a_pass=3,
+        rp=4,
+        rs=40,
+    ):
+        if lookahead < 0:
+            raise ValueError("lookahead must be non-negative.")
+        design = BandpassFilter(band_type=band_type, fs=fs)._design_filter
+        if btype == "band":
+            low_cutoff, high_cutoff = cutoff
+            self.sos = np.vstack(
+                (
+                    design(low_cutoff, order, a_pass, rp, rs, "high", "sos"),
+                    design(high_cutoff, order, a_pass, rp, rs, "low", "sos"),
+                )
+            )
+        elif btype in ("low", "high"):
+            self.sos = design(cutoff, order, a_pass, rp, rs, btype, "sos")
+        else:
+            raise ValueError("btype must be one of 'low', 'high' or 'band'.")
+        self.lookahead = int(round(lookahead * fs))
+        self._zi = sosfilt_zi(self.sos)
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the pushed samples, to filter a new signal.
+        """
+        self._state = None
+        self._held = None
+
+    def push(self, chunk):
+        """
+        Filters the next chunk of the signal.
+
+        Parameters
+        ----------
+        chunk : array_like
+            Next samples of the signal, along the last axis for several
+            channels.
+
+        Returns
+        -------
+        np.ndarray
+            The filtered samples of the chunk, or with a lookahead the
+            filtered samples that are `lookahead` seconds older than the
+            newest sample.
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.shape[-1] == 0:
+            return chunk
+        if self._state is None:
+            zi = self._zi.reshape((len(self.sos),) + (1,) * (chunk.ndim - 1) + (2,))
+            if self.lookahead:
+                # Start in the steady state of the first sample, as filtfilt
+                self._state = zi * chunk[..., :1]
+            else:
+                self._state = np.zeros_like(zi * chunk[..., :1])
+        forward, self._state = sosfilt(self.sos, chunk, zi=self._state)
+        if not self.lookahead:
+            return forward
+        if self._held is not None:
+            forward = np.concatenate((self._held, forward), axis=-1)
+        n_out = max(forward.shape[-1] - self.lookahead, 0)
+        self._held = forward
+        return self._backward(n_out)
+
+    def flush(self):
+        """
+        Returns the samples held back for the lookahead and resets the
+        filter.
+
+        Returns
+        -------
+        np.ndarray
+            The last filtered samples, filtered backward from the end of
+            the signal.
+        """
+        if self._held is None:
+            self.reset()
+            return np.zeros(0)
+        filtered = self._backward(self._held.shape[-1])
+        self.reset()
+        return filtered
+
+    def _backward(self, n_out):
+        """
+        Filters the held samples backward from the newest one, starting in
+        its steady state, and releases the oldest n_out of them.
+        """
+        held = self._held
+        if n_out == 0:
+            return held[..., :0]
+        zi = self._zi.reshape((len(self.sos),) + (1,) * (held.ndim - 1) + (2,))
+        backward = sosfilt(self.sos, held[..., ::-1], zi=zi * held[..., -1:])[0]
+        self._held = held[..., n_out:]
+        return backward[..., ::-1][..., :n_out]
@@ -1,5 +1,11 @@
 """Generating templates of ECG and PPG complexes"""
 
+import os
+import hashlib
+import inspect
+import tempfile
+import threading
+from collections import OrderedDict
 import numpy as np
 from scipy.special import erf
 from sklearn.preprocessing import MinMaxScaler
@@ -335,3 +341,185 @@ def rr_process(flo, fhi, flostd, fhistd, lfhfratio, hrmean, hrstd, sfrr, n):
     x = (1 / n) * np.real(np.fft.ifft(SwC))
     rr = rrmean + (rrstd / np.std(x)) * x
     return rr
+
+
+TEMPLATE_GENERATORS = {
+    "ppg_dual_double_frequency": ppg_dual_double_frequency_template,
+    "ppg_absolute_dual_skewness": ppg_absolute_dual_skewness_template,
+    "ppg_nonlinear_dynamic_system": ppg_nonlinear_dynamic_system_template,
+    "ecg_dynamic": ecg_dynamic_template,
+}
+
+
+def normalize_template(s):
+    """
+    Scale a template to the range [0, 1].
+
+    Parameters
+    ----------
+    s : array_like
+        Template values.
+
+    Returns
+    -------
+    numpy.ndarray
+        A 1-D array scaled with MinMaxScaler.
+    """
+    s = np.asarray(s, dtype=float).reshape(-1, 1)
+    return MinMaxScaler(feature_range=(0, 1)).fit_transform(s).reshape(-1)
+
+
+class TemplateCache:
+    """
+    Bounded memo of normalized templates, optionally backed by .npy files.
+
+    Templates only depend on the generator, the width and the model
+    parameters, so each one is built once and then shared. Cached arrays
+    are read-only; copy them before modifying.
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of templates kept in memory. The least recently
+        used template is dropped first.
+    cache_dir : str or None
+        Directory where templates are saved as .npy files and looked up
+        before being generated. None disables the disk cache.
+
+    Examples
+    --------
+    >>> cache = TemplateCache(maxsize=8)
+    >>> template = cache.get("ppg_dual_double_frequency", 100)
+    >>> template is cache.get(ppg_dual_double_frequency_template, 100)
+    True
+    """
+
+    def __init__(self, maxsize=32, cache_dir=None):
+        if maxsize < 1:
+            raise ValueError("Template cache size must be at least 1.")
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._templates)
+
+    @staticmethod
+    def _resolve(generator):
+        if callable(generator):
+            return generator.__name__.replace("_template", ""), generator
+        if generator not in TEMPLATE_GENERATORS:
+            raise ValueError(
+                f"Unknown template generator {generator}. "
+                f"Available generators: {list(TEMPLATE_GENERATORS.keys())}"
+            )
+        return generator, TEMPLATE_GENERATORS[generator]
+
+    @staticmethod
+    def _make_key(name, generator, width, params):
+        bound = inspect.signature(generator).bind(width, **params)
+        bound.apply_defaults()
+        items = []
+        for param, value in bound.arguments.items():
+            if isinstance(value, np.ndarray):
+                value = tuple(value.tolist())
+            items.append((param, value))
+        return (name, tuple(items))
+
+    def _file_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key[0]}_{digest}.npy")
+
+    def get(self, generator, width, **params):
+        """
+        Return the normalized template, generating it on first use.
+
+        Parameters
+        ----------
+        generator : str or callable
+            A key of TEMPLATE_GENERATORS or one of the template functions.
+        width : int
+            Width passed to the generator.
+        **params :
+            Model parameters passed to the generator.
+
+        Returns
+        -------
+        numpy.ndarray
+            The read-only template scaled to [0, 1].
+        """
+        name, generator = self._resolve(generator)
+        key = self._make_key(name, generator, width, params)
+
+        with self._lock:
+            if key in self._templates:
+                self._templates.move_to_end(key)
+                return self._templates[key]
+
+        template = None
+        if self.cache_dir is not None:
+            file_path = self._file_path(key)
+            if os.path.isfile(file_path):
+                try:
+                    template = np.load(file_path)
+                except (OSError, ValueError, EOFError):
+                    # Truncated or corrupt file; regenerate and overwrite it.
+                    template = None
+        if template is None:
+            template = normalize_template(generator(width, **params))
+            if self.cache_dir is not None:
+                self._save(file_path, template)
+        template.setflags(write=False)
+
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def _save(self, file_path, template):
+        # Write to a temporary file in cache_dir and rename it into place so
+        # concurrent readers never see a partially written template.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, template)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        """
+        Drop all templates kept in memory. Files in cache_dir are kept.
+        """
+        with self._lock:
+            self._templates.clear()
+
+
+template_cache = TemplateCache()
+
+
+def get_template(generator, width, **params):
+    """
+    Return a normalized, read-only template from the shared template cache.
+
+    Parameters
+    ----------
+    generator : str or callable
+        A key of TEMPLATE_GENERATORS or one of the template functions.
+    width : int
+        Width passed to the generator.
+    **params :
+        Model parameters passed to the generator.
+
+    Returns
+    -------
+    numpy.ndarray
+        The template scaled to [0, 1].
+    """
+    return template_cache.get(generator, width, **params)
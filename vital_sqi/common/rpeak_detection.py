@@ -1,12 +1,13 @@
 """R peak detection approaches for PPG and ECG."""
 
 import numpy as np
-from sklearn.cluster import KMeans
+from collections import namedtuple
 from scipy import signal
-import warnings
+from scipy.ndimage import minimum_filter1d, maximum_filter1d
 import logging
 from vital_sqi.common.band_filter import BandpassFilter
 from vitalDSP.physiological_features.waveform import WaveformMorphology
+from vitalDSP.transforms.beats_transformation import RRTransformation
 
 # Set up logging configuration
 logging.basicConfig(
@@ -23,6 +24,228 @@ DEFAULT = 6
 BILLAUER_METHOD = 7
 
 
+def _reduceat_arg(x, starts, ufunc):
+    """
+    Index of the first extremum of each segment of x starting at starts,
+    relative to the start of x. ufunc is np.maximum or np.minimum.
+    """
+    extrema = ufunc.reduceat(x, starts)
+    lengths = np.diff(np.append(starts, len(x)))
+    positions = np.flatnonzero(x == np.repeat(extrema, lengths))
+    return positions[np.searchsorted(positions, starts)]
+
+
+def _billauer_loop(s, delta):
+    """
+    Per-sample loop of Billauer's method, the reference of
+    `PeakDetector.detect_peak_trough_billauer`.
+    """
+    maxtab, mintab = [], []
+    mn, mx = np.inf, -np.inf
+    look_for_max = True
+    for i in range(len(s)):
+        if s[i] > mx:
+            mx = s[i]
+        if s[i] < mn:
+            mn = s[i]
+        if look_for_max:
+            if s[i] < mx - delta:
+                maxtab.append(i)
+                mn = s[i]
+                look_for_max = False
+        else:
+            if s[i] > mn + delta:
+                mintab.append(i)
+                mx = s[i]
+                look_for_max = True
+    return np.array(maxtab), np.array(mintab)
+
+
+def _first_crossings(s, starts, ends, thresholds, falling):
+    """
+    Index of the first sample of each monotonic run s[starts:ends] below
+    its threshold if the run is falling, or above it if rising.
+    """
+    lengths = ends - starts
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    bounds = np.cumsum(lengths) - lengths
+    positions = np.arange(lengths.sum()) - np.repeat(bounds - starts, lengths)
+    values = s[positions]
+    thresholds = np.repeat(thresholds, lengths)
+    before = np.where(
+        np.repeat(falling, lengths), values >= thresholds, values <= thresholds
+    )
+    return starts + np.add.reduceat(before.astype(np.int64), bounds)
+
+
+def _window_argmax(x, starts, ends, before, after):
+    """
+    Index of the first maximum of x over each window
+    [starts[i] - before, ends[i] + after], clipped to x, where the windows
+    starts[i]:ends[i] + 1 are sorted and disjoint before widening.
+    """
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64)
+    # Among equal values the earlier sample ranks higher, so the highest
+    # rank of a window is its first maximum
+    order = np.lexsort((-np.arange(len(x)), x))
+    ranks = np.empty(len(x), dtype=np.int64)
+    ranks[order] = np.arange(len(x))
+    size = before + after + 1
+    ranks = maximum_filter1d(
+        ranks, size, mode="constant", cval=-1, origin=before - size // 2
+    )
+    bounds = np.column_stack((starts, np.asarray(ends) + 1)).ravel()
+    if bounds[-1] == len(x):
+        bounds = bounds[:-1]
+    return order[np.maximum.reduceat(ranks, bounds)[::2]]
+
+
+def _two_means(features, max_iter=100):
+    """
+    Labels 0 and 1 of a 2-means clustering of the rows of features.
+
+    The clusters start from the best split of the rows along their first
+    principal axis, found in closed form over the sorted projections, and
+    are refined by Lloyd iterations, so the labels are deterministic.
+    """
+    features = np.asarray(features, dtype=float)
+    n = len(features)
+    if n < 2:
+        raise ValueError("Expected at least 2 samples to cluster.")
+    centered = features - features.mean(axis=0)
+    axis = np.linalg.svd(centered, full_matrices=False)[2][0]
+    projection = centered @ axis
+    order = np.argsort(projection, kind="stable")
+    # Between-cluster sum of squares of each split of the centered
+    # projections, the within-cluster one being minimal where it is maximal
+    prefix = np.cumsum(projection[order])[:-1]
+    sizes = np.arange(1, n)
+    between = prefix**2 / sizes + prefix**2 / (n - sizes)
+    labels = np.zeros(n, dtype=np.int64)
+    labels[order[np.argmax(between) + 1 :]] = 1
+    for _ in range(max_iter):
+        centers = np.stack([features[labels == k].mean(axis=0) for k in (0, 1)])
+        distances = ((features[:, None, :] - centers) ** 2).sum(axis=-1)
+        new_labels = np.argmin(distances, axis=1)
+        if np.array_equal(new_labels, labels) or np.all(new_labels == new_labels[0]):
+            break
+        labels = new_labels
+    return labels
+
+
+def _as_segment_rows(segments, offsets=None):
+    """
+    Returns the segments of a batch as a list of 1-D arrays, with their
+    boundaries in the concatenated signal.
+    """
+    if offsets is not None:
+        s = np.asarray(segments)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if s.ndim != 1:
+            raise ValueError("Offsets require a 1-D signal.")
+        if np.any(np.diff(offsets) < 0) or offsets[0] < 0 or offsets[-1] > len(s):
+            raise ValueError("Offsets must be increasing and within the signal.")
+        rows = [s[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        return rows, offsets
+    if isinstance(segments, np.ndarray) and segments.ndim == 2:
+        rows = list(segments)
+    elif isinstance(segments, np.ndarray) and segments.ndim == 1:
+        rows = [segments]
+    else:
+        rows = [np.asarray(s) for s in segments]
+    lengths = [len(s) for s in rows]
+    return rows, np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+
+
+def _group_rows_by_length(rows):
+    """
+    Groups segments by length, yielding their positions in the batch and
+    a 2-D block of the segments.
+    """
+    groups = {}
+    for i, s in enumerate(rows):
+        groups.setdefault(len(s), []).append(i)
+    for indices in groups.values():
+        yield indices, np.stack([rows[i] for i in indices])
+
+
+def _split_rows(row_col, n_rows):
+    """
+    Splits the (rows, columns) output of a 2-D argrelextrema into one
+    array of columns per row.
+    """
+    rows, cols = row_col
+    bounds = np.searchsorted(rows, np.arange(n_rows + 1))
+    return [cols[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class SegmentFiducials(
+    namedtuple(
+        "SegmentFiducials",
+        ["peaks", "peak_ptr", "troughs", "trough_ptr", "segment_offsets"],
+    )
+):
+    """
+    Peaks and troughs of a batch of segments in compressed sparse row layout.
+
+    The peaks of segment i are peaks[peak_ptr[i]:peak_ptr[i + 1]], as
+    indices within the segment, and likewise for the troughs. Segment i
+    spans segment_offsets[i]:segment_offsets[i + 1] of the concatenated
+    segments, which `to_absolute` uses to give positions in the whole
+    signal.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_list(cls, fiducials, segment_offsets):
+        """
+        Builds the CSR layout from a list of (peaks, troughs) per segment.
+        """
+        peaks = [np.asarray(f[0], dtype=np.int64).ravel() for f in fiducials]
+        troughs = [np.asarray(f[1], dtype=np.int64).ravel() for f in fiducials]
+
+        def concatenate(arrays):
+            ptr = np.concatenate(([0], np.cumsum([len(a) for a in arrays])))
+            values = np.concatenate(arrays) if arrays else np.array([])
+            return values.astype(np.int64), ptr.astype(np.int64)
+
+        peaks, peak_ptr = concatenate(peaks)
+        troughs, trough_ptr = concatenate(troughs)
+        return cls(
+            peaks, peak_ptr, troughs, trough_ptr, np.asarray(segment_offsets)
+        )
+
+    @property
+    def n_segments(self):
+        """
+        Number of segments.
+        """
+        return len(self.peak_ptr) - 1
+
+    def get_segment(self, i):
+        """
+        Returns the peaks and troughs of segment i, within the segment.
+        """
+        return (
+            self.peaks[self.peak_ptr[i] : self.peak_ptr[i + 1]],
+            self.troughs[self.trough_ptr[i] : self.trough_ptr[i + 1]],
+        )
+
+    def to_absolute(self):
+        """
+        Returns the peaks and troughs of all segments as positions in the
+        concatenated segments.
+        """
+        starts = self.segment_offsets[:-1]
+        return (
+            self.peaks + np.repeat(starts, np.diff(self.peak_ptr)),
+            self.troughs + np.repeat(starts, np.diff(self.trough_ptr)),
+        )
+
+
 class PeakDetector:
     """
     Detects peaks in PPG and ECG signals using various algorithms.
@@ -155,10 +378,139 @@ class PeakDetector:
             )
             return np.array([]), np.array([])
 
+    def ppg_detector_batch(
+        self,
+        segments,
+        detector_type=DEFAULT,
+        offsets=None,
+        preprocess=False,
+        cubing=False,
+    ):
+        """
+        Detects peaks and troughs in many PPG segments at once.
+
+        Segments of equal length are stacked and the filtering, cubing and
+        the vectorizable stages of the detectors (slope sum and sliding
+        extrema of SLOPE_SUM_METHOD, local extrema of COUNT_ORIG_METHOD, and
+        gradient and local extrema of CLUSTERER_METHOD)
+        run on the whole block. The other stages and detectors run segment
+        by segment. The fiducials of each segment are the same as those
+        returned by `ppg_detector`.
+
+        Parameters
+        ----------
+        segments : np.ndarray or list of array_like
+            A 2-D array of equal-length segments, one per row, a list of
+            segments of any length, or a 1-D signal cut by `offsets`.
+        detector_type : int, optional
+            Method for peak detection (default is DEFAULT).
+        offsets : array_like of int, optional
+            Boundaries of the segments in a 1-D signal, segment i spanning
+            offsets[i]:offsets[i + 1].
+        preprocess : bool, optional
+            Whether to apply filtering to the segments (default is False).
+        cubing : bool, optional
+            Whether to cube the segments (default is False).
+
+        Returns
+        -------
+        SegmentFiducials
+            Peaks and troughs of all segments in CSR layout.
+
+        Examples
+        --------
+        >>> detector = PeakDetector(wave_type="PPG", fs=100)
+        >>> fiducials = detector.ppg_detector_batch(signal, offsets=[0, 3000, 6000])
+        >>> peaks, troughs = fiducials.get_segment(1)
+        """
+        rows, segment_offsets = _as_segment_rows(segments, offsets)
+        results = [None] * len(rows)
+        for indices, block in _group_rows_by_length(rows):
+            if preprocess:
+                filter = BandpassFilter(fs=self.fs)
+                block = filter.signal_highpass_filter(block, cutoff=1, order=2)
+                block = filter.signal_lowpass_filter(block, cutoff=12, order=2)
+            if cubing:
+                block = block**3
+            for i, fiducials in zip(indices, self._detect_block(block, detector_type)):
+                results[i] = fiducials
+        return SegmentFiducials.from_list(results, segment_offsets)
+
+    def ecg_detector_batch(self, segments, offsets=None):
+        """
+        Detects R peaks and Q valleys in many ECG segments.
+
+        Parameters
+        ----------
+        segments : np.ndarray or list of array_like
+            Segments, as in `ppg_detector_batch`.
+        offsets : array_like of int, optional
+            Boundaries of the segments in a 1-D signal.
+
+        Returns
+        -------
+        SegmentFiducials
+            R peaks as peaks and Q valleys as troughs, in CSR layout.
+        """
+        rows, segment_offsets = _as_segment_rows(segments, offsets)
+        results = []
+        for row in rows:
+            r_peaks, q_valleys = self.ecg_detector(row)[:2]
+            results.append((r_peaks, q_valleys))
+        return SegmentFiducials.from_list(results, segment_offsets)
+
+    def _detect_block(self, block, detector_type):
+        """
+        Runs a PPG detector on each row of a 2-D block of segments, sharing
+        the vectorizable stages.
+        """
+        if block.shape[-1] == 0 or detector_type not in (
+            SLOPE_SUM_METHOD,
+            COUNT_ORIG_METHOD,
+            CLUSTERER_METHOD,
+        ):
+            return [self.ppg_detector(s, detector_type=detector_type) for s in block]
+
+        if detector_type == SLOPE_SUM_METHOD:
+            block = np.asarray(block, dtype=float)
+            envelopes = zip(*self._slope_sum_envelope(block))
+            detect = self._slope_sum_beats
+        else:
+            envelopes = zip(
+                _split_rows(signal.argrelmax(block, axis=-1), len(block)),
+                _split_rows(signal.argrelmin(block, axis=-1), len(block)),
+            )
+            detect = self._count_orig_beats
+            if detector_type == CLUSTERER_METHOD:
+                envelopes = zip(np.gradient(block, axis=-1), *zip(*envelopes))
+                detect = self._clusterer_beats
+
+        results = []
+        for s, envelope in zip(block, envelopes):
+            try:
+                results.append(detect(s, *envelope))
+            except Exception as e:
+                logging.error(
+                    f"PPG detection failed with detector type {detector_type}: {e}"
+                )
+                results.append((np.array([]), np.array([])))
+        return results
+
     def detect_peak_trough_slope_sum(self, s):
         """
         Detect peaks and troughs in a signal using the slope sum method.
 
+        The slope sum of each sample is the sum of the positive increments
+        over the preceding ~120 ms, computed from a cumulative sum. A pulse
+        is accepted where the slope sum exceeds 60% of the threshold base
+        and its range over the surrounding ~300 ms exceeds twice its
+        minimum; the threshold base then becomes that local maximum. The
+        local extrema come from O(n) sliding minimum/maximum filters and
+        all window lengths scale with `fs`. Pulse onsets are searched
+        backward from the accepted samples with `search_for_onset`, and the
+        peak and trough of each beat are the extrema between consecutive
+        onsets.
+
         Parameters
         ----------
         s : array_like
@@ -167,56 +519,135 @@ class PeakDetector:
         Returns
         -------
         tuple
-            Detected peaks and troughs as lists of indices.
+            Detected peaks and troughs as arrays of indices.
         """
-        # Define constants and initialize lists
-        fs = 100
-        window_size = 12  # Approx. 128 ms at 100 Hz
-        slope_sum = []
-        onset_list = []
-        peak_finalist = []
-        trough_finalist = []
+        s = np.asarray(s, dtype=float)
+        return self._slope_sum_beats(s, *self._slope_sum_envelope(s))
 
-        # Compute slope sum for each sample using a sliding window
-        for n in range(window_size + 1, len(s)):
-            Zk = sum(max(0, s[k] - s[k - 1]) for k in range(n - window_size, n))
-            slope_sum.append(Zk)
-        slope_sum = np.array(slope_sum)
+    def _slope_sum_windows(self):
+        """
+        Slope sum window and half-width of the extrema window, in samples.
+        """
+        window_size = max(1, int(round(0.12 * self.fs)))  # 12 samples at 100 Hz
+        half_width = max(1, int(round(0.15 * self.fs)))  # 15 samples at 100 Hz
+        return window_size, half_width
+
+    def _slope_sum_envelope(self, s):
+        """
+        Slope sum of s and its sliding minimum and maximum, along the last
+        axis so that a 2-D block of equal-length segments is processed at
+        once.
+        """
+        window_size, half_width = self._slope_sum_windows()
+        slope_sum = self.get_slope_sum(s, window_size)
+        if slope_sum.shape[-1] == 0:
+            return slope_sum, slope_sum, slope_sum
+        # Extrema over [n - half_width, n + half_width) clipped to the signal
+        local_min = minimum_filter1d(
+            slope_sum, 2 * half_width, axis=-1, mode="nearest"
+        )
+        local_max = maximum_filter1d(
+            slope_sum, 2 * half_width, axis=-1, mode="nearest"
+        )
+        return slope_sum, local_min, local_max
+
+    def _slope_sum_beats(self, s, slope_sum, local_min, local_max):
+        """
+        Sequential thresholding of the slope sum of one segment and
+        peak/trough search between the pulse onsets.
+        """
+        window_size, _ = self._slope_sum_windows()
+        if len(slope_sum) == 0:
+            return np.array([], dtype=int), np.array([], dtype=int)
 
         # Establish adaptive threshold based on initial slope sum values
-        initial_threshold = 3 * np.mean(slope_sum[: 10 * fs])
-        threshold_base = initial_threshold
-
-        # Identify threshold crossings and search for peaks and onsets
-        for n, Z_value in enumerate(slope_sum):
-            actual_threshold = threshold_base * 0.6
-            if Z_value > actual_threshold:
-                left, right = max(0, n - 15), min(len(slope_sum), n + 15)
-                local_min, local_max = np.min(slope_sum[left:right]), np.max(
-                    slope_sum[left:right]
-                )
+        threshold_base = 3 * np.mean(slope_sum[: int(round(10 * self.fs))])
+
+        # Only samples with a pulse-like local range can be accepted, the
+        # threshold base is then updated sequentially over these candidates
+        candidates = np.flatnonzero(
+            ((local_max - local_min) > local_min * 2) & (slope_sum > 0)
+        )
+        accepted = []
+        for n, Z_value, Z_max in zip(
+            candidates.tolist(),
+            slope_sum[candidates].tolist(),
+            local_max[candidates].tolist(),
+        ):
+            if Z_value > threshold_base * 0.6:
+                accepted.append(n)
+                threshold_base = Z_max  # Update threshold base for next detection
+
+        # Remove duplicates and sort onsets, as indices of the signal
+        onset_list = np.unique(self.search_for_onset(slope_sum, accepted, local_max))
+        onset_list = onset_list + window_size
+        if len(onset_list) < 2:
+            return np.array([], dtype=int), np.array([], dtype=int)
+
+        # Detect peaks and troughs between consecutive onsets
+        left = onset_list[:-1]
+        beats = s[left[0] : onset_list[-1]]
+        beat_starts = left - left[0]
+        peak_finalist = _reduceat_arg(beats, beat_starts, np.maximum) + left[0]
+        trough_finalist = _reduceat_arg(beats, beat_starts, np.minimum) + left[0]
+        return peak_finalist, trough_finalist
+
+    def get_slope_sum(self, s, window_size):
+        """
+        Computes the slope sum function of a signal.
 
-                if (local_max - local_min) > local_min * 2:
-                    # Accept the pulse
-                    onset = self.search_for_onset(slope_sum, n, local_max)
-                    onset_list.append(onset)
-                    threshold_base = (
-                        local_max  # Update threshold base for next detection
-                    )
+        Parameters
+        ----------
+        s : array_like
+            Input signal, or 2-D array of equal-length signals, one per row.
+        window_size : int
+            Number of increments summed for each sample.
 
-        # Remove duplicates and sort onsets
-        onset_list = np.unique(onset_list)
+        Returns
+        -------
+        np.ndarray
+            Slope sum of samples window_size + 1 onwards, the i-th value
+            summing the positive increments of s[i:i + window_size + 1],
+            along the last axis.
+        """
+        s = np.asarray(s, dtype=float)
+        n = s.shape[-1]
+        if n <= window_size + 1:
+            return np.zeros(s.shape[:-1] + (0,))
+        rises = np.cumsum(np.maximum(np.diff(s, axis=-1), 0), axis=-1)
+        rises = np.concatenate((np.zeros(s.shape[:-1] + (1,)), rises), axis=-1)
+        return rises[..., window_size : n - 1] - rises[..., : n - window_size - 1]
+
+    def search_for_onset(self, slope_sum, n, local_max, ratio=0.01):
+        """
+        Searches backward from threshold crossings for the pulse onsets.
 
-        # Detect peaks and troughs between consecutive onsets
-        for i in range(1, len(onset_list)):
-            left, right = onset_list[i - 1], onset_list[i]
-            try:
-                peak_finalist.append(np.argmax(s[left:right]) + left)
-                trough_finalist.append(np.argmin(s[left:right]) + left)
-            except ValueError as e:
-                warnings.warn(f"Peak detection failed at index {i} due to {e}")
+        The onset of a pulse is the last sample, at or before its threshold
+        crossing, where the slope sum is below `ratio` times its local
+        maximum, i.e. where the upstroke starts.
 
-        return np.array(peak_finalist), np.array(trough_finalist)
+        Parameters
+        ----------
+        slope_sum : np.ndarray
+            Slope sum function of the signal.
+        n : int or array_like of int
+            Indices of threshold crossings in slope_sum.
+        local_max : np.ndarray
+            Sliding maximum of slope_sum.
+        ratio : float, optional
+            Fraction of the local maximum below which the slope sum is flat
+            (default is 0.01).
+
+        Returns
+        -------
+        int or np.ndarray
+            Index of the onset in slope_sum of each crossing, 0 if the
+            slope sum is never flat before it.
+        """
+        slope_sum = np.asarray(slope_sum)
+        flat = slope_sum < ratio * np.asarray(local_max)
+        onsets = np.maximum.accumulate(np.where(flat, np.arange(len(slope_sum)), 0))
+        return onsets[np.asarray(n, dtype=int)]
 
     def detect_peak_trough_count_orig(self, s):
         """
@@ -235,7 +666,13 @@ class PeakDetector:
         # Identify local extrema
         local_maxima = signal.argrelmax(s)[0]
         local_minima = signal.argrelmin(s)[0]
+        return self._count_orig_beats(s, local_maxima, local_minima)
 
+    def _count_orig_beats(self, s, local_maxima, local_minima):
+        """
+        Thresholding of the local extrema of one segment and pairing of the
+        peaks with the troughs around them.
+        """
         # Define thresholds based on quantiles
         peak_threshold = np.quantile(s[local_maxima], 0.75) * 0.2
         trough_threshold = np.quantile(s[local_minima], 0.25) * 0.2
@@ -279,6 +716,11 @@ class PeakDetector:
         """
         Detect peaks and troughs in a signal using an adaptive threshold approach.
 
+        The peak of each region above the threshold, widened by a tenth of
+        the signal length on both sides, is found with one sliding maximum
+        over the signal, and the trough between two distinct peaks with one
+        segmented minimum.
+
         Parameters
         ----------
         s : array_like
@@ -295,25 +737,28 @@ class PeakDetector:
         tuple
             Detected peaks and troughs.
         """
+        s = np.asarray(s)
         adaptive_window = int(adaptive_size * self.fs)
         adaptive_threshold = self.get_moving_average(s, int(adaptive_window * 2 + 1))
 
-        start_ROIs, end_ROIs = self.get_ROI(s, adaptive_threshold)
-
-        # Detect peaks within the regions of interest
-        peak_finalist = [
-            np.argmax(s[start_ROI : end_ROI + 1]) + start_ROI
-            for start_ROI, end_ROI in zip(start_ROIs, end_ROIs)
-        ]
+        # Detect peaks within the regions of interest, widened as in get_ROI
+        start_ROIs, end_ROIs = self.get_ROI(s, adaptive_threshold, margin=0)
+        widening = 0.1 * len(s)
+        peak_finalist = _window_argmax(
+            s, start_ROIs, end_ROIs, int(np.ceil(widening)), int(widening)
+        )
+        # Overlapping regions share their highest peak
+        peak_finalist = np.unique(peak_finalist)
 
         # Detect troughs between the peaks
-        trough_finalist = [
-            np.argmin(s[peak_finalist[idx] : peak_finalist[idx + 1]])
-            + peak_finalist[idx]
-            for idx in range(len(peak_finalist) - 1)
-        ]
+        if len(peak_finalist) < 2:
+            return peak_finalist, np.zeros(0, dtype=np.int64)
+        first = peak_finalist[0]
+        trough_finalist = first + _reduceat_arg(
+            s[first : peak_finalist[-1]], peak_finalist[:-1] - first, np.minimum
+        )
 
-        return np.array(peak_finalist), np.array(trough_finalist)
+        return peak_finalist, trough_finalist
 
     def get_ROI(self, s, adaptive_threshold, margin=0.1):
         """
@@ -331,7 +776,7 @@ class PeakDetector:
         Returns
         -------
         tuple
-            Two lists: start_ROIs and end_ROIs, which contain the start and end indices of the ROIs.
+            Two arrays: start_ROIs and end_ROIs, which contain the start and end indices of the ROIs.
 
         Notes
         -----
@@ -346,34 +791,28 @@ class PeakDetector:
         >>> start_ROIs, end_ROIs = peak_detector.get_ROI(s, adaptive_threshold)
         """
         # Identify regions where the signal exceeds the adaptive threshold
-        above_threshold = s > adaptive_threshold
-
-        # Find the start and end indices of these regions
-        start_ROIs = []
-        end_ROIs = []
+        above_threshold = np.asarray(s) > np.asarray(adaptive_threshold)
+        signal_length = len(above_threshold)
 
-        for i in range(1, len(above_threshold)):
-            # Transition from below threshold to above threshold: start of an ROI
-            if above_threshold[i] and not above_threshold[i - 1]:
-                start_ROIs.append(i)
+        # Transitions from below to above the threshold start an ROI, and
+        # transitions from above to below end one
+        transitions = np.diff(above_threshold.astype(np.int8))
+        start_ROIs = np.flatnonzero(transitions == 1) + 1
+        end_ROIs = np.flatnonzero(transitions == -1)
 
-            # Transition from above threshold to below threshold: end of an ROI
-            if not above_threshold[i] and above_threshold[i - 1]:
-                end_ROIs.append(i - 1)
-
-        # Handle case where the signal ends above the threshold
-        if above_threshold[-1]:
-            end_ROIs.append(len(s) - 1)
+        # Handle the signal starting or ending above the threshold
+        if signal_length and above_threshold[0]:
+            start_ROIs = np.insert(start_ROIs, 0, 0)
+        if signal_length and above_threshold[-1]:
+            end_ROIs = np.append(end_ROIs, signal_length - 1)
 
         # Apply margin to widen the ROIs
-        signal_length = len(s)
-        start_ROIs = [
-            max(0, int(start - margin * signal_length)) for start in start_ROIs
-        ]
-        end_ROIs = [
-            min(signal_length - 1, int(end + margin * signal_length))
-            for end in end_ROIs
-        ]
+        start_ROIs = np.maximum(
+            0, (start_ROIs - margin * signal_length).astype(np.int64)
+        )
+        end_ROIs = np.minimum(
+            signal_length - 1, (end_ROIs + margin * signal_length).astype(np.int64)
+        )
 
         return start_ROIs, end_ROIs
 
@@ -447,6 +886,10 @@ class PeakDetector:
         """
         Detects peaks and troughs in a signal using a clustering technique.
 
+        The local maxima, and separately the local minima, are split into
+        two clusters on their value and gradient by a deterministic 2-means,
+        and those in the cluster of the highest extremum are kept.
+
         Parameters
         ----------
         s : array_like
@@ -458,23 +901,27 @@ class PeakDetector:
             Detected peaks and troughs.
         """
         try:
-            local_maxima = signal.argrelmax(s)[0]
-            local_minima = signal.argrelmin(s)[0]
-
-            def cluster_extrema(extrema):
-                features = np.vstack([s[extrema], np.gradient(s)[extrema]]).T
-                kmeans = KMeans(n_clusters=2)
-                labels = kmeans.fit_predict(features)
-                cluster = labels[np.argmax(s[extrema])]  # Cluster with higher peak
-                return extrema[labels == cluster]
-
-            peaks = cluster_extrema(local_maxima)
-            troughs = cluster_extrema(local_minima)
-            return peaks, troughs
+            return self._clusterer_beats(
+                s, np.gradient(s), signal.argrelmax(s)[0], signal.argrelmin(s)[0]
+            )
         except Exception as e:
             logging.error(f"Clustering-based peak/trough detection failed: {e}")
             return np.array([]), np.array([])
 
+    def _clusterer_beats(self, s, gradient, local_maxima, local_minima):
+        """
+        Keeps the local maxima and minima of s in the cluster of the highest
+        of them, clustered on their value and gradient.
+        """
+
+        def cluster_extrema(extrema):
+            features = np.column_stack((s[extrema], gradient[extrema]))
+            labels = _two_means(features)
+            cluster = labels[np.argmax(s[extrema])]  # Cluster with higher peak
+            return extrema[labels == cluster]
+
+        return cluster_extrema(local_maxima), cluster_extrema(local_minima)
+
     def detect_peak_trough_DEFAULT(self, s):
         """
         Detects peaks and troughs using SciPy's `find_peaks` function.
@@ -504,6 +951,13 @@ class PeakDetector:
         """
         Billauer's method for peak and trough detection, translated from MATLAB.
 
+        A peak is reported at the first sample falling `delta` below the
+        running maximum, and a trough at the first sample rising `delta`
+        above the running minimum. The hysteresis is resolved over the
+        turning points of the signal, and the detections located in their
+        monotonic runs with numpy; signals with non-finite values go
+        through the per-sample loop.
+
         Parameters
         ----------
         s : array_like
@@ -517,25 +971,358 @@ class PeakDetector:
             Detected peaks and troughs.
         """
         try:
-            maxtab, mintab = [], []
-            mn, mx = np.Inf, -np.Inf
+            s = np.asarray(s)
+            if len(s) < 2 or not np.all(np.isfinite(s)):
+                return _billauer_loop(s, delta)
+            # Between turning points the signal is monotonic, so the
+            # hysteresis reaches the same states on the turning points
+            # alone, with at most one detection per monotonic run
+            steps = np.diff(s)
+            moving = np.flatnonzero(steps)
+            rising = steps[moving] > 0
+            turns = moving[np.flatnonzero(rising[1:] != rising[:-1]) + 1]
+            turns = np.concatenate(([0], turns, [len(s) - 1]))
+            runs, thresholds, is_max = [], [], []
+            mn, mx = np.inf, -np.inf
             look_for_max = True
-            for i in range(len(s)):
-                if s[i] > mx:
-                    mx = s[i]
-                if s[i] < mn:
-                    mn = s[i]
+            for k, x in enumerate(s[turns].tolist()):
+                if x > mx:
+                    mx = x
+                if x < mn:
+                    mn = x
                 if look_for_max:
-                    if s[i] < mx - delta:
-                        maxtab.append(i)
-                        mn = s[i]
+                    if x < mx - delta:
+                        runs.append(k)
+                        thresholds.append(mx - delta)
+                        is_max.append(True)
+                        mn = x
                         look_for_max = False
                 else:
-                    if s[i] > mn + delta:
-                        mintab.append(i)
-                        mx = s[i]
+                    if x > mn + delta:
+                        runs.append(k)
+                        thresholds.append(mn + delta)
+                        is_max.append(False)
+                        mx = x
                         look_for_max = True
-            return np.array(maxtab), np.array(mintab)
+            runs = np.asarray(runs, dtype=np.int64)
+            is_max = np.asarray(is_max, dtype=bool)
+            crossings = _first_crossings(
+                s, turns[runs - 1] + 1, turns[runs] + 1, thresholds, is_max
+            )
+            return crossings[is_max], crossings[~is_max]
         except Exception as e:
             logging.error(f"Billauer method-based detection failed: {e}")
             return np.array([]), np.array([])
+
+
+class FiducialIndex:
+    """
+    Peaks and troughs of a whole recording, as sorted sample indices.
+
+    Running a detector on each segment repeats the work done for the
+    recording and finds inconsistent beats near the segment edges, where
+    the beats are truncated. The index holds the fiducials detected once
+    over the recording and answers the queries of a segment with binary
+    searches.
+
+    Parameters
+    ----------
+    peaks, troughs : array_like of int
+        Positions of the peaks and troughs in the recording.
+    wave_type : str, optional
+        Type of waveform, 'PPG' or 'ECG' (default is 'PPG').
+    detector_type : int, optional
+        PPG detector that found the fiducials (default is DEFAULT). None
+        for ECG, whose peaks and troughs are the R peaks and Q valleys.
+
+    Examples
+    --------
+    >>> index = FiducialIndex.detect(s, wave_type="PPG", fs=100)
+    >>> segment_index = index.get_segment(3000, 6000)
+    >>> segment_index.peaks
+    array([  41,  121,  203, ...])
+    """
+
+    def __init__(self, peaks, troughs, wave_type="PPG", detector_type=DEFAULT):
+        self.peaks = np.unique(np.asarray(peaks, dtype=np.int64).ravel())
+        self.troughs = np.unique(np.asarray(troughs, dtype=np.int64).ravel())
+        self.wave_type = wave_type
+        self.detector_type = detector_type if wave_type == "PPG" else None
+
+    def __repr__(self):
+        return (
+            f"FiducialIndex(wave_type={self.wave_type!r}, "
+            f"detector_type={self.detector_type!r}, "
+            f"n_peaks={len(self.peaks)}, n_troughs={len(self.troughs)})"
+        )
+
+    @classmethod
+    def detect(cls, s, wave_type="PPG", detector_type=DEFAULT, fs=100):
+        """
+        Detects the fiducials of a whole recording.
+
+        Parameters
+        ----------
+        s : array_like
+            Signal of the recording.
+        wave_type : str, optional
+            Type of waveform, 'PPG' or 'ECG' (default is 'PPG').
+        detector_type : int, optional
+            Method for PPG peak detection (default is DEFAULT). Ignored for
+            ECG.
+        fs : int, optional
+            Sampling frequency of the signal (default is 100).
+
+        Returns
+        -------
+        FiducialIndex
+            The index of the detected fiducials.
+        """
+        detector = PeakDetector(wave_type=wave_type, fs=fs)
+        s = np.asarray(s)
+        if wave_type == "PPG":
+            peaks, troughs = detector.ppg_detector(s, detector_type=detector_type)
+        else:
+            peaks, troughs = detector.ecg_detector(s)[:2]
+        return cls(peaks, troughs, wave_type=wave_type, detector_type=detector_type)
+
+    def get_segment(self, start, end):
+        """
+        Returns the fiducials of the samples in [start, end).
+
+        Parameters
+        ----------
+        start, end : int
+            Boundaries of the segment in the recording.
+
+        Returns
+        -------
+        FiducialIndex
+            The fiducials of the segment, as positions within the segment.
+        """
+        peaks = self.peaks[
+            np.searchsorted(self.peaks, start) : np.searchsorted(self.peaks, end)
+        ]
+        troughs = self.troughs[
+            np.searchsorted(self.troughs, start) : np.searchsorted(self.troughs, end)
+        ]
+        return FiducialIndex(
+            peaks - start, troughs - start, self.wave_type, self.detector_type
+        )
+
+    def segment_fiducials(self, milestones):
+        """
+        Returns the fiducials of many segments at once.
+
+        Parameters
+        ----------
+        milestones : pd.DataFrame or array_like
+            Start and end of each segment in the recording, one row per
+            segment, as returned by `split_segment`. Segments may overlap.
+
+        Returns
+        -------
+        SegmentFiducials
+            Fiducials of the segments in CSR layout, as positions within
+            each segment.
+        """
+        milestones = np.asarray(milestones, dtype=np.int64).reshape(-1, 2)
+        starts, ends = milestones[:, 0], milestones[:, 1]
+
+        def gather(values):
+            lo = np.searchsorted(values, starts)
+            counts = np.searchsorted(values, ends) - lo
+            ptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+            # Position of every gathered fiducial in `values`
+            idx = np.repeat(lo - ptr[:-1], counts) + np.arange(ptr[-1])
+            return values[idx] - np.repeat(starts, counts), ptr
+
+        peaks, peak_ptr = gather(self.peaks)
+        troughs, trough_ptr = gather(self.troughs)
+        segment_offsets = np.concatenate(([0], np.cumsum(ends - starts)))
+        return SegmentFiducials(peaks, peak_ptr, troughs, trough_ptr, segment_offsets)
+
+    def sessions(self):
+        """
+        Returns the beats of the recording, from each trough to the next.
+
+        Returns
+        -------
+        list
+            [start, end] of each beat.
+        """
+        return np.column_stack((self.troughs[:-1], self.troughs[1:])).tolist()
+
+
+class FiducialCache:
+    """
+    Per-segment store of detected fiducial points and of the quantities
+    derived from them.
+
+    Several SQIs of a segment need the same peaks and troughs, and each of
+    them used to run its own detector. The cache runs a detector once per
+    (segment identity, wave type, detector type, sampling rate) and hands
+    back the stored result on subsequent requests. A new cache is meant to
+    be created for every segment.
+
+    Quantities further down the chain, such as the NN intervals computed
+    from the RR intervals, their PSD, or the STFT of the segment, are kept
+    with `derived`. Each is keyed by the identity of the array it is
+    computed from, so that a quantity derived from a cached one, like the
+    PSD of the cached NN intervals, is computed once as well.
+
+    Parameters
+    ----------
+    fiducials : FiducialIndex, optional
+        Fiducials of the segment taken from the index of the whole
+        recording. They answer the `ppg_detector` queries of their detector
+        type without running the detector. ECG queries, which also need
+        the S valleys and the P and T peaks, are always detected.
+
+    Examples
+    --------
+    >>> cache = FiducialCache()
+    >>> s = np.sin(np.linspace(0, 20 * np.pi, 3000))
+    >>> peaks, troughs = cache.ppg_detector(s, detector_type=DEFAULT, fs=100)
+    >>> cache.ppg_detector(s, detector_type=DEFAULT, fs=100)[0] is peaks
+    True
+    """
+
+    def __init__(self, fiducials=None):
+        self._entries = {}
+        self.fiducials = fiducials
+
+    def _get(self, s, wave_type, detector_type, fs, detect):
+        if (
+            self.fiducials is not None
+            and self.fiducials.wave_type == wave_type
+            and self.fiducials.detector_type == detector_type
+        ):
+            return self.fiducials.peaks, self.fiducials.troughs
+        return self.derived((wave_type, detector_type, fs), s, detect)
+
+    def derived(self, key, s, compute):
+        """
+        Returns a quantity derived from an array, computed on the first
+        request only.
+
+        Parameters
+        ----------
+        key : tuple
+            Name of the quantity and the parameters it is computed with,
+            such as ("psd", "welch").
+        s : array_like
+            Array the quantity is derived from: the segment, or a quantity
+            derived from it such as its NN intervals.
+        compute : callable
+            Computes the quantity, called without arguments. Exceptions are
+            propagated and nothing is stored.
+
+        Returns
+        -------
+        object
+            The stored quantity.
+        """
+        key = (id(s),) + tuple(key)
+        entry = self._entries.get(key)
+        # Keep a reference to the array so that its id cannot be reused
+        if entry is None or entry[0] is not s:
+            entry = (s, compute())
+            self._entries[key] = entry
+        return entry[1]
+
+    def ppg_detector(self, s, detector_type=DEFAULT, fs=100):
+        """
+        Cached equivalent of `PeakDetector(fs=fs).ppg_detector(s, detector_type)`.
+
+        Parameters
+        ----------
+        s : array_like
+            Input PPG signal.
+        detector_type : int, optional
+            Method for peak detection (default is DEFAULT).
+        fs : int, optional
+            Sampling frequency of the signal (default is 100).
+
+        Returns
+        -------
+        tuple
+            Detected peaks and troughs.
+        """
+        return self._get(
+            s,
+            "PPG",
+            detector_type,
+            fs,
+            lambda: PeakDetector(wave_type="PPG", fs=fs).ppg_detector(
+                s, detector_type=detector_type
+            ),
+        )
+
+    def ecg_detector(self, s, get_session=False, fs=100):
+        """
+        Cached equivalent of `PeakDetector(fs=fs).ecg_detector(s, get_session)`.
+
+        Parameters
+        ----------
+        s : array_like
+            Input ECG signal.
+        get_session : bool, optional
+            Whether to return the ECG sessions instead of the characteristic
+            points (default is False).
+        fs : int, optional
+            Sampling frequency of the signal (default is 100).
+
+        Returns
+        -------
+        tuple
+            Output of `PeakDetector.ecg_detector`.
+        """
+        get_session = bool(get_session)
+        return self._get(
+            s,
+            "ECG",
+            ("session", get_session),
+            fs,
+            lambda: PeakDetector(wave_type="ECG", fs=fs).ecg_detector(
+                s, get_session=get_session
+            ),
+        )
+
+    def rr_intervals(self, s, wave_type="PPG", fs=100):
+        """
+        Cached RR intervals computed by vitalDSP's `RRTransformation`.
+
+        Parameters
+        ----------
+        s : array_like
+            Input signal.
+        wave_type : str, optional
+            Type of waveform, 'PPG' or 'ECG' (default is 'PPG').
+        fs : int, optional
+            Sampling frequency of the signal (default is 100).
+
+        Returns
+        -------
+        tuple
+            The `RRTransformation` instance and the RR intervals in seconds,
+            as returned by `RRTransformation.compute_rr_intervals`.
+
+        Raises
+        ------
+        Exception
+            The error raised by the transformation, re-raised on every call
+            when RR intervals cannot be computed for the segment.
+        """
+
+        def detect():
+            try:
+                transformer = RRTransformation(signal=s, fs=fs, signal_type=wave_type)
+                return transformer, transformer.compute_rr_intervals(), None
+            except Exception as e:
+                return None, None, e
+
+        transformer, rr_intervals, error = self._get(s, wave_type, "rr", fs, detect)
+        if error is not None:
+            raise error
+        return transformer, rr_intervals
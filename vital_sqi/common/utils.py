@@ -38,7 +38,12 @@ class HiddenPrints:
 
 
 def get_nn(
-    signal, wave_type="PPG", sample_rate=100, rpeak_method=6, remove_ectopic_beat=False
+    signal,
+    wave_type="PPG",
+    sample_rate=100,
+    rpeak_method=6,
+    remove_ectopic_beat=False,
+    fiducial_cache=None,
 ):
     """
     Calculate NN intervals from a PPG or ECG signal.
@@ -55,6 +60,10 @@ def get_nn(
         Method identifier for R-peak detection, by default 7.
     remove_ectopic_beat : bool, optional
         If True, removes ectopic beats, by default False.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment's fiducials. If given, the RR intervals are
+        read from it instead of being detected again, and the NN intervals
+        are kept in it, so that the same array is returned on every call.
 
     Returns
     -------
@@ -62,14 +71,26 @@ def get_nn(
         Array of NN intervals in milliseconds.
     """
     try:
-        transformer = RRTransformation(
-            signal=signal, fs=sample_rate, signal_type=wave_type
-        )
-        rr_intervals = transformer.process_rr_intervals(
-            impute_invalid=False, remove_invalid=remove_ectopic_beat
+        if fiducial_cache is None:
+            transformer = RRTransformation(
+                signal=signal, fs=sample_rate, signal_type=wave_type
+            )
+            rr_intervals = transformer.process_rr_intervals(
+                impute_invalid=False, remove_invalid=remove_ectopic_beat
+            )
+            return np.where(np.isnan(rr_intervals), -1, rr_intervals)
+
+        def compute():
+            transformer, rr_intervals = fiducial_cache.rr_intervals(
+                signal, wave_type=wave_type, fs=sample_rate
+            )
+            if remove_ectopic_beat:
+                rr_intervals = transformer.remove_invalid_rr_intervals(rr_intervals)
+            return np.where(np.isnan(rr_intervals), -1, rr_intervals)
+
+        return fiducial_cache.derived(
+            ("nn", wave_type, sample_rate, bool(remove_ectopic_beat)), signal, compute
         )
-        nn_intervals_non_na = np.where(np.isnan(rr_intervals), -1, rr_intervals)
-        return nn_intervals_non_na
     except Exception as e:
         logging.error(f"Error in get_nn function: {e}")
         return np.array([])
@@ -181,8 +202,8 @@ def generate_timestamp(start_datetime, sampling_rate, signal_length):
 
     Returns
     -------
-    np.ndarray
-        Array of pd.Timestamp objects.
+    pd.DatetimeIndex
+        The timestamps. Use `TimeAxis` to avoid materializing them.
 
     Raises
     ------
@@ -192,21 +213,168 @@ def generate_timestamp(start_datetime, sampling_rate, signal_length):
     if not isinstance(sampling_rate, (int, float)) or not np.isreal(sampling_rate):
         raise ValueError("Sampling rate must be a real number.")
 
-    if start_datetime is None:
-        start_datetime = pd.Timestamp.now()
-    elif not isinstance(start_datetime, pd.Timestamp):
-        start_datetime = pd.Timestamp(start_datetime)
-
     try:
-        step_size = 1 / sampling_rate
-        time_offsets = np.arange(signal_length) * step_size
-        timestamps = start_datetime + pd.to_timedelta(time_offsets, unit="s")
-        return timestamps
+        time_axis = TimeAxis(start_datetime, sampling_rate, signal_length)
+        return time_axis.to_datetime_index()
     except Exception as e:
         logging.error(f"Error generating timestamps: {e}")
         return np.array([])
 
 
+class TimeAxis:
+    """
+    Lazy time axis of a uniformly sampled signal.
+
+    Only the start, the sampling rate and the number of samples are kept.
+    Timestamps are computed on request, for the requested samples only,
+    and slicing the axis gives another lazy axis.
+
+    Parameters
+    ----------
+    start_datetime : datetime.datetime or pd.Timestamp or str or None
+        Timestamp of the first sample. If None, uses current time.
+    sampling_rate : float
+        The sampling rate in Hz.
+    length : int
+        Number of samples.
+
+    Examples
+    --------
+    >>> axis = TimeAxis("2024-01-01", 100, 360000)
+    >>> axis.index_to_time(150)
+    Timestamp('2024-01-01 00:00:01.500000')
+    >>> axis.time_to_index("2024-01-01 00:10:00")
+    60000
+    >>> axis[1000:2000].start_datetime
+    Timestamp('2024-01-01 00:00:10')
+    """
+
+    def __init__(self, start_datetime, sampling_rate, length):
+        if not isinstance(sampling_rate, (int, float)) or not np.isreal(sampling_rate):
+            raise ValueError("Sampling rate must be a real number.")
+        if sampling_rate <= 0:
+            raise ValueError("Sampling rate must be positive.")
+        if start_datetime is None:
+            start_datetime = pd.Timestamp.now()
+        self.start_datetime = pd.Timestamp(start_datetime)
+        self.sampling_rate = sampling_rate
+        self.length = int(length)
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return (
+            f"TimeAxis(start_datetime={self.start_datetime!r}, "
+            f"sampling_rate={self.sampling_rate}, length={self.length})"
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, TimeAxis):
+            return NotImplemented
+        return (
+            self.start_datetime == other.start_datetime
+            and self.sampling_rate == other.sampling_rate
+            and self.length == other.length
+        )
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step == 1:
+                return TimeAxis(
+                    self.index_to_time(start), self.sampling_rate, max(stop - start, 0)
+                )
+            return self.index_to_time(np.arange(start, stop, step))
+        if np.ndim(key) == 0:
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError(f"Index {key} out of range for length {self.length}.")
+        return self.index_to_time(key)
+
+    @property
+    def end_datetime(self):
+        """
+        Timestamp of the last sample.
+        """
+        return self.index_to_time(self.length - 1)
+
+    @property
+    def duration(self):
+        """
+        Duration covered by the samples, in seconds.
+        """
+        return self.length / self.sampling_rate
+
+    def index_to_time(self, index):
+        """
+        Returns the timestamps of sample indices.
+
+        Parameters
+        ----------
+        index : int or array-like of int
+            Sample indices, not bounded by the length of the axis.
+
+        Returns
+        -------
+        pd.Timestamp or pd.DatetimeIndex
+            The timestamp of a scalar index, or of each index.
+        """
+        offsets = np.round(np.asarray(index) * (1e9 / self.sampling_rate))
+        if np.ndim(offsets) == 0:
+            return self.start_datetime + pd.Timedelta(int(offsets), unit="ns")
+        timestamps = pd.DatetimeIndex(
+            self.start_datetime.value + offsets.astype(np.int64)
+        )
+        if self.start_datetime.tz is not None:
+            timestamps = timestamps.tz_localize("UTC").tz_convert(
+                self.start_datetime.tz
+            )
+        return timestamps
+
+    def time_to_index(self, time, rounding="nearest"):
+        """
+        Returns the sample indices of timestamps.
+
+        Parameters
+        ----------
+        time : datetime-like or array-like of datetime-like
+            Timestamps to locate.
+        rounding : str, optional
+            "nearest" (default), "floor" for the sample at or before each
+            timestamp, or "ceil" for the sample at or after it.
+
+        Returns
+        -------
+        int or np.ndarray
+            The index of a scalar timestamp, or of each timestamp. Indices are
+            not clipped to the length of the axis.
+        """
+        rounding_func = {"nearest": np.round, "floor": np.floor, "ceil": np.ceil}
+        if rounding not in rounding_func:
+            raise ValueError("Rounding must be 'nearest', 'floor' or 'ceil'.")
+        if np.ndim(time) == 0:
+            elapsed = (pd.Timestamp(time) - self.start_datetime).value
+        else:
+            elapsed = pd.DatetimeIndex(time).asi8 - self.start_datetime.value
+        index = rounding_func[rounding](
+            np.asarray(elapsed) * (self.sampling_rate / 1e9)
+        ).astype(np.int64)
+        return int(index) if np.ndim(index) == 0 else index
+
+    def to_datetime_index(self):
+        """
+        Materializes the timestamps of all samples.
+
+        Returns
+        -------
+        pd.DatetimeIndex
+            One timestamp per sample.
+        """
+        return self.index_to_time(np.arange(self.length))
+
+
 def parse_datetime(string, type="datetime"):
     """
     A simple dateparser that detects common  datetime formats
@@ -562,20 +730,24 @@ def get_value_label_list(df, boundaries, interval_label_list):
     return value_label_list
 
 
-def cut_segment(df, milestones):
+def cut_segment(df, milestones, time_axis=None):
     """
     Splits a DataFrame into segments based on the start and end indices provided in the milestones DataFrame.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        Signal DataFrame containing the full data to be segmented.
+    df : pd.DataFrame or np.ndarray
+        Signal DataFrame containing the full data to be segmented. Segments
+        of an array are views of it, so a memory-mapped array is not read.
     milestones : pd.DataFrame
         DataFrame containing 'start' and 'end' columns, representing the start and end indices for each segment.
+    time_axis : TimeAxis, optional
+        Time axis of df. If given, 'start' and 'end' may hold timestamps,
+        and each segment holds the samples in [start, end).
 
     Returns
     -------
-    list of pd.DataFrame
+    list of pd.DataFrame or np.ndarray
         A list of DataFrame segments based on the specified start and end indices.
 
     Raises
@@ -593,13 +765,18 @@ def cut_segment(df, milestones):
         "start" in milestones.columns and "end" in milestones.columns
     ), "Milestones DataFrame must contain 'start' and 'end' columns."
 
+    starts, ends = milestones["start"], milestones["end"]
+    if time_axis is not None and pd.api.types.is_datetime64_any_dtype(starts):
+        starts = time_axis.time_to_index(starts, rounding="ceil")
+        ends = time_axis.time_to_index(ends, rounding="ceil")
+    starts = np.asarray(starts).astype(int)
+    ends = np.asarray(ends).astype(int)
+
     # Initialize list to hold segmented DataFrames
     segmented_dfs = []
 
     # Loop over each milestone row to cut segments
-    for _, row in milestones.iterrows():
-        start, end = int(row["start"]), int(row["end"])
-
+    for start, end in zip(starts.tolist(), ends.tolist()):
         # Check that start and end are within DataFrame bounds
         if start < 0 or end > len(df):
             raise ValueError(
@@ -611,7 +788,10 @@ def cut_segment(df, milestones):
             )
 
         # Slice DataFrame for the given segment and append to list
-        segmented_dfs.append(df.iloc[start:end])
+        if isinstance(df, np.ndarray):
+            segmented_dfs.append(df[start:end])
+        else:
+            segmented_dfs.append(df.iloc[start:end])
 
     return segmented_dfs
 
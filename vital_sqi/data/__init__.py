@@ -5,5 +5,13 @@ A subpackage for all raw waveform data manipulation such as read/write,
 edit, resample.
 """
 
-from vital_sqi.data.signal_io import PPG_reader, PPG_writer, ECG_reader, ECG_writer
+from vital_sqi.data.signal_io import (
+    PPG_reader,
+    PPG_writer,
+    ECG_reader,
+    ECG_writer,
+    PPG_stream_reader,
+    SignalChunk,
+)
+from vital_sqi.data.segment_store import SegmentStore
 from vital_sqi.data.signal_sqi_class import *
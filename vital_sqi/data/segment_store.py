@@ -0,0 +1,309 @@
+"""
+Binary container holding all segments of a recording in a single
+memory-mapped .npy file, with an index of per-segment metadata.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+SIGNALS_FILE = "signals.npy"
+INDEX_FILE = "index.csv"
+META_FILE = "meta.json"
+
+# Reserved size of the .npy header, large enough for any 2-D shape
+_HEADER_LEN = 246
+_INDEX_COLUMNS = ["segment_id", "offset", "length", "start", "end", "decision"]
+
+
+def _write_npy_header(file, dtype, shape):
+    """
+    Write a version 1.0 .npy header padded to a fixed size, so that it can be
+    rewritten in place once the final shape is known.
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape)
+    )
+    header = header.ljust(_HEADER_LEN - 1) + "\n"
+    file.seek(0)
+    file.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", _HEADER_LEN))
+    file.write(header.encode("latin1"))
+
+
+def _segment_values(segment):
+    """
+    Return the signal channels of a segment as a 2-D array.
+    """
+    if isinstance(segment, pd.DataFrame):
+        segment = segment.select_dtypes(include=["number"])
+        values = segment.to_numpy()
+    else:
+        values = np.asarray(segment)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    return values
+
+
+class SegmentStore:
+    """
+    Stores the segments of a recording in one binary container.
+
+    The samples of all segments are appended to a single memory-mapped
+    ``signals.npy`` file. ``index.csv`` holds one row per segment with its
+    position in the container, its start and end indices in the recording,
+    its decision and its SQIs. Segments can be read back by id without
+    loading the others.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the store.
+    mode : str, optional
+        "r" to read an existing store (default), "w" to create a new one.
+    columns : list of str, optional
+        Names of the signal channels. Taken from the first DataFrame
+        segment if None.
+    dtype : numpy dtype, optional
+        Type of the stored samples. Taken from the first segment if None.
+        Segments that cannot be cast to it safely, such as float samples
+        in an integer store, are rejected.
+    sampling_rate : float, optional
+        Sampling rate of the recording, kept as metadata.
+
+    Examples
+    --------
+    >>> with SegmentStore("out/segments", mode="w", sampling_rate=100) as store:
+    ...     for segment, (start, end) in zip(segments, milestones.values):
+    ...         store.append(segment, start=start, end=end, decision="accept")
+    >>> store = SegmentStore("out/segments")
+    >>> store[3].shape
+    (3000, 1)
+    >>> segments = cut_segment(store.to_frame(), store.offsets)
+    """
+
+    def __init__(self, path, mode="r", columns=None, dtype=None, sampling_rate=None):
+        if mode not in ("r", "w"):
+            raise ValueError("Mode must be either 'r' (read) or 'w' (write).")
+        self.path = path
+        self.mode = mode
+
+        if mode == "w":
+            os.makedirs(path, exist_ok=True)
+            self.columns = list(columns) if columns is not None else None
+            self.dtype = np.dtype(dtype) if dtype is not None else None
+            self.sampling_rate = sampling_rate
+            self._records = []
+            self._sqi_rows = []
+            self._n_samples = 0
+            self._file = None
+            self.signals = None
+        else:
+            with open(os.path.join(path, META_FILE), "r") as meta_file:
+                meta = json.load(meta_file)
+            self.columns = meta["columns"]
+            self.dtype = np.dtype(meta["dtype"])
+            self.sampling_rate = meta["sampling_rate"]
+            self.index = pd.read_csv(os.path.join(path, INDEX_FILE))
+            self.signals = np.load(os.path.join(path, SIGNALS_FILE), mmap_mode="r")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        if self.mode == "w":
+            return len(self._records)
+        return len(self.index)
+
+    def __getitem__(self, segment_id):
+        return self.get_segment(segment_id)
+
+    def __iter__(self):
+        for segment_id in range(len(self)):
+            yield self.get_segment(segment_id)
+
+    def append(self, segment, start=None, end=None, decision=None, sqis=None):
+        """
+        Appends a segment to the store.
+
+        Parameters
+        ----------
+        segment : np.ndarray or pd.DataFrame
+            Segment samples. Only the numeric columns of a DataFrame are
+            stored, so generated timestamps are dropped.
+        start, end : int, optional
+            Indices of the segment in the recording. Taken from the index
+            of a DataFrame segment if None.
+        decision : str, optional
+            Decision of the segment ('accept' or 'reject').
+        sqis : dict or pd.Series, optional
+            SQI values of the segment.
+
+        Returns
+        -------
+        int
+            The id of the appended segment.
+        """
+        if self.mode != "w":
+            raise ValueError("Segments can only be appended in write mode.")
+
+        values = _segment_values(segment)
+        if self._file is None:
+            if self.columns is None:
+                if isinstance(segment, pd.DataFrame):
+                    self.columns = [
+                        str(col)
+                        for col in segment.select_dtypes(include=["number"]).columns
+                    ]
+                else:
+                    self.columns = [f"signal_{i}" for i in range(values.shape[1])]
+            if self.dtype is None:
+                self.dtype = values.dtype
+            self._file = open(os.path.join(self.path, SIGNALS_FILE), "wb")
+            _write_npy_header(self._file, self.dtype, (0, len(self.columns)))
+        if values.shape[1] != len(self.columns):
+            raise ValueError(
+                f"Expected {len(self.columns)} channels but got {values.shape[1]}."
+            )
+        if not np.can_cast(values.dtype, self.dtype, "same_kind"):
+            raise ValueError(
+                f"Cannot store {values.dtype} samples in a {self.dtype} store; "
+                "pass a wider dtype when creating the store."
+            )
+
+        if start is None and isinstance(segment, pd.DataFrame) and len(segment):
+            if pd.api.types.is_integer_dtype(segment.index):
+                start, end = int(segment.index[0]), int(segment.index[-1]) + 1
+        if start is not None and end is None:
+            end = start + len(values)
+
+        self._file.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+        segment_id = len(self._records)
+        self._records.append(
+            [
+                segment_id,
+                self._n_samples,
+                len(values),
+                -1 if start is None else int(start),
+                -1 if end is None else int(end),
+                decision,
+            ]
+        )
+        self._sqi_rows.append(dict(sqis) if sqis is not None else {})
+        self._n_samples += len(values)
+        return segment_id
+
+    def close(self):
+        """
+        Finalizes a store opened for writing: the .npy header is updated with
+        the number of samples and the index and metadata are written.
+        """
+        if self.mode != "w" or self._records is None:
+            return
+        if self._file is None:
+            if self.dtype is None:
+                self.dtype = np.dtype(np.float64)
+            self.columns = self.columns or []
+            self._file = open(os.path.join(self.path, SIGNALS_FILE), "wb")
+        _write_npy_header(self._file, self.dtype, (self._n_samples, len(self.columns)))
+        self._file.close()
+
+        index = pd.DataFrame(self._records, columns=_INDEX_COLUMNS)
+        sqi_df = pd.DataFrame(self._sqi_rows, index=index.index)
+        index = pd.concat([index, sqi_df], axis=1)
+        index.to_csv(os.path.join(self.path, INDEX_FILE), index=False)
+
+        with open(os.path.join(self.path, META_FILE), "w") as meta_file:
+            json.dump(
+                {
+                    "columns": self.columns,
+                    "dtype": np.lib.format.dtype_to_descr(self.dtype),
+                    "sampling_rate": self.sampling_rate,
+                },
+                meta_file,
+            )
+        self._records = None
+
+    def get_segment(self, segment_id):
+        """
+        Returns the samples of one segment without reading the others.
+
+        Parameters
+        ----------
+        segment_id : int
+            Id of the segment, in order of appending.
+
+        Returns
+        -------
+        np.ndarray
+            A read-only view of shape (length, n_channels).
+        """
+        if self.mode != "r":
+            raise ValueError("Segments can only be read in read mode.")
+        offset = int(self.index.at[segment_id, "offset"])
+        length = int(self.index.at[segment_id, "length"])
+        return self.signals[offset : offset + length]
+
+    def get_frame(self, segment_id):
+        """
+        Returns one segment as a DataFrame indexed by its position in the
+        recording.
+
+        Parameters
+        ----------
+        segment_id : int
+            Id of the segment.
+
+        Returns
+        -------
+        pd.DataFrame
+            The segment with one column per channel.
+        """
+        values = self.get_segment(segment_id)
+        start = int(self.index.at[segment_id, "start"])
+        index = pd.RangeIndex(start, start + len(values)) if start >= 0 else None
+        return pd.DataFrame(values, columns=self.columns, index=index)
+
+    def to_frame(self):
+        """
+        Returns all stored samples as one DataFrame, for use with `cut_segment`
+        and `offsets`.
+
+        Returns
+        -------
+        pd.DataFrame
+            The samples of all segments, one after the other.
+        """
+        return pd.DataFrame(self.signals, columns=self.columns, copy=False)
+
+    @property
+    def offsets(self):
+        """
+        Positions of the segments in the store, as a `cut_segment` milestone
+        DataFrame with 'start' and 'end' columns.
+        """
+        return pd.DataFrame(
+            {
+                "start": self.index["offset"],
+                "end": self.index["offset"] + self.index["length"],
+            }
+        )
+
+    @property
+    def milestones(self):
+        """
+        Start and end indices of the segments in the recording, as returned
+        by `split_segment`.
+        """
+        return self.index[["start", "end"]]
+
+    @property
+    def sqis(self):
+        """
+        SQI values of the segments, one row per segment.
+        """
+        return self.index.drop(columns=_INDEX_COLUMNS)
@@ -1,4 +1,5 @@
 import logging
+import json
 from pyedflib import highlevel
 from wfdb import rdsamp, wrsamp
 import numpy as np
@@ -6,8 +7,9 @@ import pandas as pd
 import datetime as dt
 import os
 import glob
+from collections import namedtuple
 from vital_sqi.common import utils
-from vital_sqi.common.utils import generate_timestamp
+from vital_sqi.common.utils import generate_timestamp, TimeAxis
 from vital_sqi.data.signal_sqi_class import SignalSQI
 
 logging.basicConfig(
@@ -22,6 +24,7 @@ def ECG_reader(
     channel_name=None,
     sampling_rate=None,
     start_datetime=None,
+    lazy_timestamps=False,
 ):
     """
     Reads ECG data from a specified file type and returns a SignalSQI object.
@@ -31,7 +34,9 @@ def ECG_reader(
     file_name : str
         Path to ECG file.
     file_type : str
-        Supported types include 'edf', 'mit' or 'csv'.
+        Supported types include 'edf', 'mit', 'csv' or 'npy'. A .npy file,
+        as written by `ECG_writer`, is memory-mapped rather than read, and
+        the signals are kept as an array without a timestamps column.
     channel_num : list, optional
         List of channel ids to read, starting from 0.
     channel_name : list, optional
@@ -40,6 +45,11 @@ def ECG_reader(
         Sampling rate of the signal.
     start_datetime : str, optional
         Start datetime in '%Y-%m-%d %H:%M:%S.%f' format.
+    lazy_timestamps : bool, optional
+        If True, edf and mit signals are kept as an array without a
+        timestamps column, and their timestamps are given by the lazy
+        `time_axis` of the SignalSQI object (default is False). npy signals
+        are always read this way.
 
     Returns
     -------
@@ -56,7 +66,8 @@ def ECG_reader(
             "edf",
             "mit",
             "csv",
-        ], "Only edf, mit, and csv are supported."
+            "npy",
+        ], "Only edf, mit, csv and npy are supported."
         assert (
             isinstance(channel_num, list) or channel_num is None
         ), "Channel num must be a list or None"
@@ -86,10 +97,19 @@ def ECG_reader(
             if sampling_rate is None:
                 raise ValueError("Sampling rate could not be inferred.")
             start_datetime = start_datetime or header.get("startdate")
+            info = [header, signal_headers]
+            if lazy_timestamps:
+                return SignalSQI(
+                    signals=signals.T,
+                    wave_type="ECG",
+                    start_datetime=start_datetime,
+                    sampling_rate=sampling_rate,
+                    info=info,
+                    channels=[h.get("label") for h in signal_headers],
+                )
             signals = pd.DataFrame(signals.T)
             timestamps = generate_timestamp(start_datetime, sampling_rate, len(signals))
             signals.insert(0, "timestamps", timestamps)
-            info = [header, signal_headers]
             return SignalSQI(
                 signals=signals,
                 wave_type="ECG",
@@ -113,6 +133,15 @@ def ECG_reader(
                 start_datetime = (
                     dt.datetime.combine(date, time) if date and time else None
                 )
+            if lazy_timestamps:
+                return SignalSQI(
+                    signals=signals,
+                    wave_type="ECG",
+                    start_datetime=start_datetime,
+                    sampling_rate=sampling_rate,
+                    info=info,
+                    channels=info.get("sig_name"),
+                )
             timestamps = generate_timestamp(start_datetime, sampling_rate, len(signals))
             signals = pd.DataFrame(signals)
             signals["timestamps"] = timestamps
@@ -137,11 +166,73 @@ def ECG_reader(
                 sampling_rate=sampling_rate,
             )
 
+        elif file_type == "npy":
+            signals = np.load(file_name, mmap_mode="r")
+            meta = _read_npy_meta(file_name)
+            channels = meta.get("channels") or [
+                str(i) for i in range(signals.shape[1])
+            ]
+            if channel_name:
+                channel_num = [channels.index(name) for name in channel_name]
+            if channel_num:
+                signals = _select_columns(signals, channel_num)
+                channels = [channels[i] for i in channel_num]
+            sampling_rate = sampling_rate or meta.get("sampling_rate")
+            if sampling_rate is None:
+                raise ValueError("Sampling rate could not be inferred.")
+            start_datetime = start_datetime or meta.get("start_datetime")
+            return SignalSQI(
+                signals=signals,
+                wave_type="ECG",
+                start_datetime=(
+                    pd.Timestamp(start_datetime) if start_datetime else None
+                ),
+                sampling_rate=sampling_rate,
+                channels=channels,
+            )
+
     except Exception as e:
         logging.error(f"Failed to read ECG file: {e}")
         raise
 
 
+def _npy_meta_path(file_name):
+    """
+    Path of the JSON file holding the metadata of a .npy signal file.
+    """
+    return os.path.splitext(file_name)[0] + ".json"
+
+
+def _read_npy_meta(file_name):
+    """
+    Reads the metadata written alongside a .npy signal file, if any.
+    """
+    meta_path = _npy_meta_path(file_name)
+    if not os.path.isfile(meta_path):
+        return {}
+    with open(meta_path, "r") as meta_file:
+        return json.load(meta_file)
+
+
+def _select_columns(signals, columns):
+    """
+    Selects columns of a 2-D array, as a view when they are contiguous.
+    """
+    columns = list(columns)
+    if columns == list(range(columns[0], columns[0] + len(columns))):
+        return signals[:, columns[0] : columns[0] + len(columns)]
+    return signals[:, columns]
+
+
+def _signal_values(signal_sqi):
+    """
+    Returns the signal channels of a SignalSQI object as a 2-D array.
+    """
+    if isinstance(signal_sqi.signals, np.ndarray):
+        return signal_sqi.signals
+    return signal_sqi.signals.drop(columns="timestamps").to_numpy()
+
+
 def ECG_writer(signal_sqi, file_name, file_type, info=None):
     """
     Writes the SignalSQI object to a file.
@@ -153,12 +244,14 @@ def ECG_writer(signal_sqi, file_name, file_type, info=None):
     file_name : str
         Name of the file to write, with extension.
     file_type : str
-        Type of file ('edf', 'mit', 'csv').
+        Type of file ('edf', 'mit', 'csv', 'npy'). A .npy file is written
+        with its sampling rate, start datetime and channel names in a .json
+        file of the same name, and can be memory-mapped by `ECG_reader`.
     info : list or dict, optional
         Additional header information.
     """
     try:
-        signals = signal_sqi.signals.drop(columns="timestamps").to_numpy()
+        signals = _signal_values(signal_sqi)
         sampling_rate = signal_sqi.sampling_rate
         start_datetime = signal_sqi.start_datetime
 
@@ -187,12 +280,32 @@ def ECG_writer(signal_sqi, file_name, file_type, info=None):
             )
 
         elif file_type == "csv":
-            timestamps = generate_timestamp(start_datetime, sampling_rate, len(signals))
-            signals = pd.DataFrame(
-                np.hstack((np.array(timestamps).reshape(-1, 1), signals))
-            )
+            timestamps = TimeAxis(start_datetime, sampling_rate, len(signals))
+            signals = pd.DataFrame(signals)
+            signals.insert(0, "timestamps", timestamps.to_datetime_index())
             signals.to_csv(file_name, index=False)
 
+        elif file_type == "npy":
+            np.save(file_name, signals)
+            if isinstance(signal_sqi.signals, np.ndarray):
+                channels = signal_sqi.channels
+            else:
+                channels = signal_sqi.signals.columns.drop("timestamps")
+            channels = channels if channels is not None else range(signals.shape[1])
+            with open(_npy_meta_path(file_name), "w") as meta_file:
+                json.dump(
+                    {
+                        "sampling_rate": float(sampling_rate),
+                        "start_datetime": (
+                            str(pd.Timestamp(start_datetime))
+                            if start_datetime is not None
+                            else None
+                        ),
+                        "channels": [str(channel) for channel in channels],
+                    },
+                    meta_file,
+                )
+
         return True  # Ensure success is indicated
 
     except Exception as e:
@@ -304,6 +417,216 @@ def PPG_reader(
         raise
 
 
+class SignalChunk(
+    namedtuple(
+        "SignalChunk",
+        [
+            "start_idx",
+            "end_idx",
+            "start_datetime",
+            "sampling_rate",
+            "timestamps",
+            "signals",
+            "columns",
+        ],
+    )
+):
+    """
+    A fixed-duration piece of a recording yielded by `PPG_stream_reader`.
+
+    Attributes
+    ----------
+    start_idx, end_idx : int
+        Position of the chunk in the whole recording, end excluded.
+    start_datetime : pd.Timestamp
+        Time of the first sample of the chunk.
+    sampling_rate : float
+        Sampling rate of the recording.
+    timestamps : np.ndarray
+        int64 timestamps in nanoseconds since the epoch, one per sample.
+    signals : np.ndarray
+        Array of shape (n_samples, n_channels), float32 by default.
+    columns : tuple of str
+        Names of the signal channels.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return self.end_idx - self.start_idx
+
+    def to_frame(self):
+        """
+        Convert the chunk to a DataFrame with a 'timestamps' column
+        followed by one float64 column per signal channel.
+
+        Returns
+        -------
+        pd.DataFrame
+            The chunk as a DataFrame.
+        """
+        frame = pd.DataFrame(
+            self.signals.astype(np.float64), columns=list(self.columns)
+        )
+        frame.insert(0, "timestamps", self.timestamps.view("datetime64[ns]"))
+        return frame
+
+
+def PPG_stream_reader(
+    file_name,
+    signal_idx,
+    timestamp_idx,
+    timestamp_unit="ms",
+    sampling_rate=None,
+    start_datetime=None,
+    duration=30.0,
+    overlapping=0,
+    block_size=100000,
+    dtype=np.float32,
+):
+    """
+    Reads a PPG CSV file block by block and yields fixed-duration chunks.
+
+    Only the rows of the chunk being assembled are held in memory, so the
+    recording can be larger than the available RAM. Chunks follow the same
+    layout as `split_segment` with split_type=0 on the whole recording: one
+    chunk starts every `duration - overlapping` seconds and the last ones
+    are cut at the end of the recording.
+
+    Parameters
+    ----------
+    file_name : str
+        Path to the PPG file (CSV format).
+    signal_idx : int, str or list
+        Indices or names of the columns with PPG signal data.
+    timestamp_idx : int, str or list
+        Index or name of the column with timestamp data.
+    timestamp_unit : str, optional
+        Unit of timestamp in the file. Accepts "ms" (milliseconds) or "s" (seconds). Default is "ms".
+    sampling_rate : int or float, optional
+        Sampling rate of the PPG signal. If None, it is inferred from the
+        timestamps of the first block. Default is None.
+    start_datetime : str, optional
+        Start datetime of the recording. If given, timestamps are shifted so
+        that the first sample falls on it.
+    duration : float, optional
+        Chunk length in seconds (default is 30).
+    overlapping : float, optional
+        Overlap between consecutive chunks in seconds (default is 0).
+    block_size : int, optional
+        Number of rows read from the file at a time (default is 100000).
+    dtype : numpy dtype or None, optional
+        Type of the chunk signals (default is np.float32). None keeps the
+        type parsed from the file.
+
+    Yields
+    ------
+    SignalChunk
+        The chunks of the recording in order.
+
+    Raises
+    ------
+    ValueError
+        If the timestamp unit is invalid, the sampling rate cannot be inferred
+        or the overlap is not shorter than the duration.
+
+    Examples
+    --------
+    >>> for chunk in PPG_stream_reader("ppg.csv", signal_idx=["PLETH"],
+    ...                                timestamp_idx=["TIMESTAMP_MS"]):
+    ...     print(chunk.start_idx, chunk.start_datetime, chunk.signals.shape)
+    """
+    valid_units = {"ms": 10**6, "s": 10**9}
+    if timestamp_unit not in valid_units:
+        raise ValueError(
+            "Timestamp unit must be either 'ms' (milliseconds) or 's' (seconds)."
+        )
+    unit_ns = valid_units[timestamp_unit]
+
+    if type(signal_idx) is not list:
+        signal_idx = [signal_idx]
+    if type(timestamp_idx) is not list:
+        timestamp_idx = [timestamp_idx]
+
+    # Resolve positional indices to column names so the order is preserved
+    header = pd.read_csv(file_name, nrows=0, skipinitialspace=True).columns
+    timestamp_col, *signal_cols = [
+        header[col] if isinstance(col, (int, np.integer)) else col
+        for col in timestamp_idx[:1] + signal_idx
+    ]
+
+    reader = pd.read_csv(
+        file_name,
+        usecols=[timestamp_col] + signal_cols,
+        skipinitialspace=True,
+        skip_blank_lines=True,
+        chunksize=block_size,
+    )
+
+    timestamps = np.empty(0, dtype=np.int64)
+    signals = None
+    buffer_start, next_start = 0, 0
+    offset = None
+
+    def make_chunk(start, end):
+        chunk_timestamps = timestamps[start - buffer_start : end - buffer_start]
+        return SignalChunk(
+            start_idx=start,
+            end_idx=end,
+            start_datetime=pd.Timestamp(int(chunk_timestamps[0])),
+            sampling_rate=sampling_rate,
+            timestamps=chunk_timestamps.copy(),
+            signals=signals[start - buffer_start : end - buffer_start].copy(),
+            columns=tuple(signal_cols),
+        )
+
+    for block in reader:
+        if len(block) == 0:
+            continue
+        raw = block[timestamp_col].to_numpy()
+        if np.issubdtype(raw.dtype, np.integer):
+            block_timestamps = raw.astype(np.int64) * unit_ns
+        else:
+            block_timestamps = np.round(raw.astype(np.float64) * unit_ns).astype(
+                np.int64
+            )
+
+        if offset is None:
+            offset = 0
+            if start_datetime:
+                offset = pd.Timestamp(start_datetime).value - block_timestamps[0]
+            if sampling_rate is None:
+                diffs = np.diff(block_timestamps) / 1e9
+                if len(diffs) == 0 or not np.median(diffs) > 0:
+                    raise ValueError(
+                        "Sampling rate could not be inferred from the first block."
+                    )
+                sampling_rate = 1 / np.median(diffs)
+            chunk_size = int(duration * sampling_rate)
+            chunk_step = chunk_size - int(overlapping * sampling_rate)
+            if chunk_size <= 0 or chunk_step <= 0:
+                raise ValueError("Overlapping must be shorter than the duration.")
+
+        block_signals = block[signal_cols].to_numpy(dtype=dtype)
+        if signals is None:
+            signals = block_signals[:0]
+        timestamps = np.concatenate([timestamps, block_timestamps + offset])
+        signals = np.concatenate([signals, block_signals])
+
+        while next_start + chunk_size <= buffer_start + len(timestamps):
+            yield make_chunk(next_start, next_start + chunk_size)
+            next_start += chunk_step
+            # Drop the samples that no later chunk will use
+            drop = min(next_start - buffer_start, len(timestamps))
+            timestamps, signals = timestamps[drop:], signals[drop:]
+            buffer_start += drop
+
+    total_length = buffer_start + len(timestamps)
+    while next_start < total_length:
+        yield make_chunk(next_start, total_length)
+        next_start += chunk_step
+
+
 def PPG_writer(signal_sqi, file_name, file_type="csv"):
     """
     Writes PPG SignalSQI data to a specified file format.
@@ -331,21 +654,24 @@ def PPG_writer(signal_sqi, file_name, file_type="csv"):
         If there are issues writing the file or converting data formats.
     """
     try:
-        # Generate timestamps for the signal based on start time and sampling rate
-        timestamps = generate_timestamp(
-            start_datetime=signal_sqi.start_datetime,
-            sampling_rate=signal_sqi.sampling_rate,
-            signal_length=len(signal_sqi.signals),
-        )
         # signals = pd.DataFrame(
         #     {"time": timestamps, "pleth": np.array(signal_sqi.signals).reshape(-1)}
         # )
-        signals = pd.DataFrame(
-            {
-                "time": np.array(signal_sqi.signals.iloc[:, 0]),
-                "pleth": np.array(signal_sqi.signals.iloc[:, 1]),
-            }
-        )
+        if isinstance(signal_sqi.signals, np.ndarray):
+            # Timestamps are generated from the start time and sampling rate
+            signals = pd.DataFrame(
+                {
+                    "time": signal_sqi.get_timestamps(),
+                    "pleth": np.array(signal_sqi.signals[:, 0]),
+                }
+            )
+        else:
+            signals = pd.DataFrame(
+                {
+                    "time": np.array(signal_sqi.signals.iloc[:, 0]),
+                    "pleth": np.array(signal_sqi.signals.iloc[:, 1]),
+                }
+            )
 
         if file_type == "csv":
             signals.to_csv(file_name, index=False)
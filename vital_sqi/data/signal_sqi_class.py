@@ -3,7 +3,8 @@ import pandas as pd
 import json
 import logging
 from vital_sqi.common.band_filter import BandpassFilter
-from vital_sqi.common.rpeak_detection import PeakDetector
+from vital_sqi.common.rpeak_detection import PeakDetector, FiducialIndex, DEFAULT
+from vital_sqi.common.utils import TimeAxis
 from vital_sqi.resource import sqi_dict, rule_dict
 from vital_sqi.rule import Rule, RuleSet
 
@@ -17,6 +18,15 @@ class SignalSQI:
     """
     A class representing a signal with its associated Signal Quality Index (SQI) values,
     rules, and rule set for quality analysis.
+
+    Signals are held either as a pd.DataFrame, or as a numpy array of shape
+    (n_samples, n_channels), which may be memory-mapped. An array holds no
+    timestamp column: timestamps are generated from `start_datetime` and
+    `sampling_rate` only when requested with `get_timestamps` or `to_frame`.
+
+    The peaks and troughs of the whole recording can be detected once with
+    `detect_fiducials` and kept in `fiducials`, from which the fiducials of
+    each segment are sliced instead of being detected again.
     """
 
     def __init__(
@@ -29,9 +39,13 @@ class SignalSQI:
         sqis=None,
         rules=None,
         ruleset=None,
+        channels=None,
+        fiducials=None,
     ):
         self.wave_type = wave_type
         self.signals = signals
+        self.channels = channels
+        self.fiducials = fiducials
         self.sampling_rate = sampling_rate
         self.start_datetime = (
             start_datetime or pd.Timestamp.now()
@@ -59,9 +73,17 @@ class SignalSQI:
             if value is not None and value not in ("ECG", "PPG"):
                 raise ValueError("Expected wave_type to be either 'ECG' or 'PPG'.")
         elif name == "signals":
-            if not isinstance(value, pd.DataFrame):
+            if isinstance(value, np.ndarray):
+                if value.ndim == 1:
+                    value = value.reshape(-1, 1)
+                if value.ndim != 2:
+                    raise ValueError(
+                        "Expected signals array of shape (n_samples, n_channels)."
+                    )
+            elif not isinstance(value, pd.DataFrame):
                 raise ValueError(
-                    "Expected signals as a pd.DataFrame with one channel per column."
+                    "Expected signals as a pd.DataFrame or a numpy array "
+                    "with one channel per column."
                 )
         elif name == "sampling_rate":
             if not np.isreal(value):
@@ -80,6 +102,12 @@ class SignalSQI:
         elif name == "ruleset":
             if value is not None and not isinstance(value, RuleSet):
                 raise ValueError("Expected ruleset as a RuleSet object.")
+        elif name == "channels":
+            if value is not None:
+                value = [str(channel) for channel in value]
+        elif name == "fiducials":
+            if value is not None and not isinstance(value, FiducialIndex):
+                raise ValueError("Expected fiducials as a FiducialIndex object.")
         super().__setattr__(name, value)
 
     def _load_rules_from_dict(self, rule_data):
@@ -132,6 +160,116 @@ class SignalSQI:
             logging.error("Cannot initialize RuleSet: rules not loaded properly.")
             return None
 
+    def get_channel(self, channel=0):
+        """
+        Returns the values of one channel without copying them.
+
+        Parameters
+        ----------
+        channel : int or str, optional
+            Position of the channel among the signal channels, or its name
+            (default is 0). The timestamps column of a DataFrame, or any
+            column of datetimes, is not counted as a channel.
+
+        Returns
+        -------
+        np.ndarray
+            1-D array of the channel values, a view of array signals.
+        """
+        if isinstance(self.signals, np.ndarray):
+            if isinstance(channel, str):
+                channel = (self.channels or []).index(channel)
+            return self.signals[:, channel]
+        signals = self.signals.drop(columns="timestamps", errors="ignore")
+        # Timestamps read from a file keep the name of their column
+        signals = signals.select_dtypes(exclude=["datetime", "datetimetz"])
+        if isinstance(channel, str):
+            return signals[channel].to_numpy()
+        return signals.iloc[:, channel].to_numpy()
+
+    def detect_fiducials(self, detector_type=DEFAULT, channel=0):
+        """
+        Detects the peaks and troughs of the whole recording once and keeps
+        them in `fiducials`.
+
+        Parameters
+        ----------
+        detector_type : int, optional
+            Method for PPG peak detection (default is DEFAULT). Ignored for
+            ECG, whose R peaks and Q valleys are detected.
+        channel : int or str, optional
+            Channel to detect the fiducials on, as in `get_channel`
+            (default is 0).
+
+        Returns
+        -------
+        FiducialIndex
+            The sorted fiducials of the recording.
+        """
+        self.fiducials = FiducialIndex.detect(
+            self.get_channel(channel),
+            wave_type=self.wave_type,
+            detector_type=detector_type,
+            fs=self.sampling_rate or 100,
+        )
+        return self.fiducials
+
+    @property
+    def time_axis(self):
+        """
+        Lazy time axis of the signals, from `start_datetime` and
+        `sampling_rate`.
+
+        Returns
+        -------
+        TimeAxis
+            The time axis, holding no timestamps.
+        """
+        if not self.sampling_rate:
+            raise ValueError("Sampling rate is required to generate timestamps.")
+        return TimeAxis(self.start_datetime, self.sampling_rate, len(self.signals))
+
+    def get_timestamps(self, start=0, end=None):
+        """
+        Returns the timestamps of the samples in [start, end).
+
+        Timestamps of array signals are generated from `time_axis` for the
+        requested samples only.
+
+        Parameters
+        ----------
+        start : int, optional
+            Index of the first sample (default is 0).
+        end : int, optional
+            Index after the last sample (default is the end of the signals).
+
+        Returns
+        -------
+        pd.DatetimeIndex
+            Timestamps of the samples.
+        """
+        if isinstance(self.signals, pd.DataFrame) and "timestamps" in self.signals:
+            return pd.DatetimeIndex(self.signals["timestamps"].iloc[start:end])
+        return self.time_axis[start:end].to_datetime_index()
+
+    def to_frame(self):
+        """
+        Returns the signals as a DataFrame with a 'timestamps' first column.
+
+        Array signals are copied and their timestamps generated.
+
+        Returns
+        -------
+        pd.DataFrame
+            Timestamps and one column per channel.
+        """
+        if isinstance(self.signals, pd.DataFrame):
+            return self.signals
+        columns = self.channels or list(range(self.signals.shape[1]))
+        signals = pd.DataFrame(np.array(self.signals), columns=columns)
+        signals.insert(0, "timestamps", self.get_timestamps())
+        return signals
+
     def update_info(self, info):
         """
         Update the info attribute.
@@ -155,8 +293,8 @@ class SignalSQI:
 
         Parameters
         ----------
-        signals : pd.DataFrame
-            DataFrame with signal data, where each column represents a channel.
+        signals : pd.DataFrame or np.ndarray
+            Signal data, where each column represents a channel.
 
         Returns
         -------
@@ -11,4 +11,6 @@ from vital_sqi.pipeline.pipeline_highlevel import (
     get_ppg_sqis,
     get_qualified_ecg,
     get_qualified_ppg,
+    stream_qualified_ppg,
 )
+from vital_sqi.pipeline.online_sqi import OnlineSQI, ONLINE_SQIS
@@ -0,0 +1,550 @@
+"""
+Online SQI computation for live streams.
+
+Samples are pushed as they arrive and the SQIs of the latest window are
+updated at every hop from running statistics, at a cost proportional to
+the hop instead of the window.
+"""
+
+import bisect
+import numpy as np
+import pandas as pd
+from vital_sqi.common.rpeak_detection import PeakDetector, SLOPE_SUM_METHOD
+from vital_sqi.sqi.standard_sqi import (
+    kurtosis_sqi,
+    skewness_sqi,
+    signal_to_noise_sqi,
+)
+
+ONLINE_SQIS = [
+    "kurtosis",
+    "skewness",
+    "signal_to_noise",
+    "zero_crossings_rate",
+    "mean_crossing_rate",
+    "band_energy",
+    "hr_mean",
+]
+
+
+def _block_moments(x):
+    """
+    Count, mean and central moment sums (M2, M3, M4) of a block of samples.
+    """
+    mean = np.mean(x)
+    d = x - mean
+    d2 = d * d
+    return len(x), mean, np.sum(d2), np.sum(d2 * d), np.sum(d2 * d2)
+
+
+def _sorted_insert(a, values):
+    """
+    Inserts values into the sorted array a, returning the sorted result.
+    """
+    values = np.sort(values)
+    return np.insert(a, np.searchsorted(a, values), values)
+
+
+def _sorted_remove(a, values):
+    """
+    Removes one occurrence of each of values from the sorted array a.
+    """
+    values = np.sort(values)
+    # Repeated values are removed from consecutive positions
+    rank = np.arange(len(values)) - np.searchsorted(values, values)
+    return np.delete(a, np.searchsorted(a, values) + rank)
+
+
+class _SlidingMoments:
+    """
+    Running mean and central moment sums of a sliding window.
+
+    Blocks of samples are merged in and taken out with the pairwise update
+    formulas of Welford and Pebay, which do not suffer from the
+    cancellation of raw power sums.
+    """
+
+    def __init__(self):
+        self.n, self.mean, self.m2, self.m3, self.m4 = 0, 0.0, 0.0, 0.0, 0.0
+
+    def reset(self, x):
+        self.n, self.mean, self.m2, self.m3, self.m4 = _block_moments(x)
+
+    def add(self, x):
+        if self.n == 0:
+            self.reset(x)
+            return
+        n_a, mean_a, m2_a, m3_a, m4_a = self.n, self.mean, self.m2, self.m3, self.m4
+        n_b, mean_b, m2_b, m3_b, m4_b = _block_moments(x)
+        n = n_a + n_b
+        d = mean_b - mean_a
+        self.n = n
+        self.mean = mean_a + d * n_b / n
+        self.m2 = m2_a + m2_b + d**2 * n_a * n_b / n
+        self.m3 = (
+            m3_a
+            + m3_b
+            + d**3 * n_a * n_b * (n_a - n_b) / n**2
+            + 3 * d * (n_a * m2_b - n_b * m2_a) / n
+        )
+        self.m4 = (
+            m4_a
+            + m4_b
+            + d**4 * n_a * n_b * (n_a**2 - n_a * n_b + n_b**2) / n**3
+            + 6 * d**2 * (n_a**2 * m2_b + n_b**2 * m2_a) / n**2
+            + 4 * d * (n_a * m3_b - n_b * m3_a) / n
+        )
+
+    def remove(self, x):
+        n, mean, m2, m3, m4 = self.n, self.mean, self.m2, self.m3, self.m4
+        n_b, mean_b, m2_b, m3_b, m4_b = _block_moments(x)
+        n_a = n - n_b
+        if n_a <= 0:
+            self.__init__()
+            return
+        mean_a = (n * mean - n_b * mean_b) / n_a
+        d = mean_b - mean_a
+        m2_a = m2 - m2_b - d**2 * n_a * n_b / n
+        m3_a = (
+            m3
+            - m3_b
+            - d**3 * n_a * n_b * (n_a - n_b) / n**2
+            - 3 * d * (n_a * m2_b - n_b * m2_a) / n
+        )
+        m4_a = (
+            m4
+            - m4_b
+            - d**4 * n_a * n_b * (n_a**2 - n_a * n_b + n_b**2) / n**3
+            - 6 * d**2 * (n_a**2 * m2_b + n_b**2 * m2_a) / n**2
+            - 4 * d * (n_a * m3_b - n_b * m3_a) / n
+        )
+        self.n, self.mean, self.m2, self.m3, self.m4 = n_a, mean_a, m2_a, m3_a, m4_a
+
+
+class OnlineSQI:
+    """
+    Computes the SQIs of a live stream over a sliding window.
+
+    Samples are pushed in packets of any size. Once the window is full, the
+    SQIs of the latest window are emitted at every hop, together with the
+    decision of the rule set if one is given. Each hop updates the running
+    statistics of the requested SQIs only, at O(hop) cost:
+
+    - kurtosis, skewness and signal_to_noise from the mean and central
+      moments of the window, updated block by block with Welford-style
+      formulas.
+    - zero_crossings_rate from a running count of sign changes.
+    - mean_crossing_rate from sorted arrays of the lower and upper values
+      of consecutive samples, merged with the pairs of each hop, which
+      count the pairs crossing the window mean by binary search.
+    - band_energy, the mean square of the window's components in `band`,
+      from a sliding DFT of the frequency bins of the band, whose twiddle
+      factors for a hop are computed once.
+    - hr_mean from peaks detected on the newest samples only. A peak is
+      kept once `peak_margin` seconds of signal follow it, so the peaks of
+      the last `peak_margin` seconds of the window are not counted yet.
+
+    Values match `kurtosis_sqi`, `skewness_sqi`, `signal_to_noise_sqi`,
+    `zero_crossings_rate_sqi` and `mean_crossing_rate_sqi` (with their
+    default arguments) computed on the window. Rounding errors of the
+    running statistics are reset by recomputing them from the window once
+    every window.
+
+    Parameters
+    ----------
+    sampling_rate : float
+        Sampling rate of the stream.
+    window : float, optional
+        Window duration in seconds (default is 30).
+    hop : float, optional
+        Duration in seconds between emitted windows (default is 1).
+    sqis : list or dict, optional
+        SQIs to compute, among `ONLINE_SQIS` (default is all of them). A
+        dict maps output names, such as the SQI names of a rule set, to
+        the online SQIs.
+    ruleset : RuleSet, optional
+        Rule set applied to the SQIs of every emitted window.
+    band : list, optional
+        Frequency band [low, high] of `band_energy` in Hz (default is
+        [0.5, 8]).
+    threshold : float, optional
+        Threshold below which values count as zero in the crossing rates
+        (default is 1e-10).
+    wave_type : str, optional
+        Type of waveform, 'PPG' or 'ECG' (default is 'PPG').
+    detector_type : int, optional
+        PPG peak detector of `hr_mean` (default is SLOPE_SUM_METHOD).
+    peak_margin : float, optional
+        Duration in seconds of the context around the new samples given to
+        the peak detector (default is 2).
+
+    Examples
+    --------
+    >>> online = OnlineSQI(sampling_rate=100, window=30, hop=1,
+    ...                    sqis={"skewness_1": "skewness"}, ruleset=ruleset)
+    >>> for packet in monitor:
+    ...     for _, row in online.push(packet).iterrows():
+    ...         print(row["end_idx"], row["skewness_1"], row["decision"])
+    """
+
+    def __init__(
+        self,
+        sampling_rate,
+        window=30,
+        hop=1,
+        sqis=None,
+        ruleset=None,
+        band=None,
+        threshold=1e-10,
+        wave_type="PPG",
+        detector_type=SLOPE_SUM_METHOD,
+        peak_margin=2,
+    ):
+        if not sampling_rate or sampling_rate <= 0:
+            raise ValueError("Expected a positive sampling rate.")
+        if wave_type not in ["PPG", "ECG"]:
+            raise ValueError("Expected wave_type to be 'PPG' or 'ECG'.")
+        self.sampling_rate = sampling_rate
+        self.window_size = int(round(window * sampling_rate))
+        self.hop_size = int(round(hop * sampling_rate))
+        if not 0 < self.hop_size <= self.window_size:
+            raise ValueError("Expected 0 < hop <= window.")
+
+        if sqis is None:
+            sqis = ONLINE_SQIS
+        if not isinstance(sqis, dict):
+            sqis = {name: name for name in sqis}
+        unknown = set(sqis.values()) - set(ONLINE_SQIS)
+        if unknown:
+            raise ValueError(f"Unknown online SQIs: {sorted(unknown)}")
+        self.sqis = sqis
+        self.ruleset = ruleset
+        self.band = list(band) if band is not None else [0.5, 8]
+        if self.band[0] > self.band[1]:
+            raise ValueError("Invalid band values.")
+        self.threshold = threshold
+        self.wave_type = wave_type
+        self.detector_type = detector_type
+        self.peak_margin = int(round(peak_margin * sampling_rate))
+        self.detector = PeakDetector(wave_type=wave_type, fs=sampling_rate)
+
+        n = self.window_size
+        freqs = np.fft.rfftfreq(n, d=1 / sampling_rate)
+        self._bins = np.where((freqs > self.band[0]) & (freqs <= self.band[1]))[0]
+        # One-sided spectrum: every bin but DC and Nyquist stands for two
+        self._bin_weights = np.where(
+            (self._bins == 0) | (2 * self._bins == n), 1.0, 2.0
+        )
+
+        # State kept up to date for the requested SQIs only
+        requested = set(sqis.values())
+        self._track_moments = bool(
+            requested
+            & {"kurtosis", "skewness", "signal_to_noise", "mean_crossing_rate"}
+        )
+        self._track_zero_crossings = "zero_crossings_rate" in requested
+        self._track_pairs = "mean_crossing_rate" in requested
+        self._track_spectrum = "band_energy" in requested and len(self._bins) > 0
+        self._track_peaks = "hr_mean" in requested
+
+        # Sliding DFT of a hop: X <- w^h X + sum_i w^(h - i) (in_i - out_i),
+        # with w = exp(2j pi k / n). Unless the hop is too long for it to be
+        # cheaper than a transform of the window.
+        h = self.hop_size
+        self._hop_twiddle = None
+        if self._track_spectrum and h * len(self._bins) <= n * np.log2(n):
+            self._hop_shift = np.exp(2j * np.pi * self._bins * h / n)
+            self._hop_twiddle = np.exp(
+                2j * np.pi / n * np.outer(self._bins, np.arange(h, 0, -1))
+            )
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all pushed samples and running statistics.
+        """
+        n = self.window_size
+        self.n_samples = 0
+        self._buffer = np.zeros(n)
+        self._pending = []
+        self._n_pending = 0
+        self._hops_since_refresh = 0
+        self._moments = _SlidingMoments()
+        # Sign change and (low, high) of each sample and its predecessor
+        self._signs = np.zeros(n, dtype=np.int8)
+        self._zero_crossings = np.zeros(n, dtype=bool)
+        self._n_zero_crossings = 0
+        self._pairs = np.zeros((n, 2))
+        self._low = np.empty(0)
+        self._high = np.empty(0)
+        self._flat_low = np.empty(0)
+        self._flat_high = np.empty(0)
+        self._n_equal_pairs = 0
+        self._spectrum = np.zeros(len(self._bins), dtype=complex)
+        self._peaks = []
+        self._peaks_until = 0
+
+    def push(self, samples):
+        """
+        Appends samples to the stream.
+
+        Parameters
+        ----------
+        samples : array_like
+            New samples, in order.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per hop completed by the samples once the window is
+            full, with the SQIs of the window, its 'start_idx' and
+            'end_idx' in the stream and its 'decision' if a rule set is
+            given. Empty if no hop was completed.
+        """
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        if len(samples):
+            self._pending.append(samples)
+            self._n_pending += len(samples)
+
+        rows = []
+        if self._n_pending >= self._block_size():
+            pending = np.concatenate(self._pending)
+            offset = 0
+            while len(pending) - offset >= self._block_size():
+                size = self._block_size()
+                self._update(pending[offset : offset + size])
+                offset += size
+                if self.n_samples >= self.window_size:
+                    rows.append(self._emit())
+            rest = pending[offset:]
+            self._pending = [rest] if len(rest) else []
+            self._n_pending = len(rest)
+
+        columns = list(self.sqis) + ["start_idx", "end_idx"]
+        if self.ruleset is not None:
+            columns.append("decision")
+        return pd.DataFrame(rows, columns=columns)
+
+    def _block_size(self):
+        """
+        Number of samples filling the window, or completing the next hop.
+        """
+        if self.n_samples < self.window_size:
+            return self.window_size - self.n_samples
+        return self.hop_size
+
+    def get_window(self):
+        """
+        Returns the samples of the current window, oldest first.
+
+        Returns
+        -------
+        np.ndarray
+            Up to `window_size` latest samples.
+        """
+        return self._tail(min(self.n_samples, self.window_size))
+
+    def _tail(self, size):
+        """
+        Returns the latest `size` samples of the ring buffer, oldest first.
+        """
+        n = self.window_size
+        end = self.n_samples % n
+        start = (end - size) % n
+        if size == 0:
+            return self._buffer[:0].copy()
+        if start < end:
+            return self._buffer[start:end].copy()
+        return np.concatenate((self._buffer[start:], self._buffer[:end]))
+
+    def _positions(self, first, size):
+        """
+        Ring buffer positions of stream samples first to first + size.
+        """
+        return (first + np.arange(size)) % self.window_size
+
+    def _update(self, block):
+        n = self.window_size
+        size = len(block)
+        full = self.n_samples >= n
+        positions = self._positions(self.n_samples, size)
+        outgoing = self._buffer[positions].copy() if full else None
+        if self.n_samples:
+            previous = self._buffer[(self.n_samples - 1) % n]
+            with_previous = np.concatenate(([previous], block))
+        else:
+            with_previous = np.concatenate((block[:1], block))
+
+        # Pairs are counted for every sample of the window but the oldest
+        if full:
+            self._remove_pairs(
+                self._positions(self.n_samples - n + 1, min(size, n - 1))
+            )
+
+        self._buffer[positions] = block
+        if self._track_zero_crossings:
+            signs = np.sign(np.where(np.abs(block) <= self.threshold, 0, block))
+            previous_signs = np.append(
+                self._signs[(self.n_samples - 1) % n] if self.n_samples else signs[0],
+                signs[:-1],
+            )
+            self._signs[positions] = signs
+            self._zero_crossings[positions] = signs != previous_signs
+        self._pairs[positions, 0] = np.minimum(with_previous[:-1], with_previous[1:])
+        self._pairs[positions, 1] = np.maximum(with_previous[:-1], with_previous[1:])
+        first_pair = max(self.n_samples, self.n_samples + size - n + 1, 1)
+        self._add_pairs(positions[first_pair - self.n_samples :])
+
+        m2 = self._moments.m2
+        if self._track_moments:
+            if full:
+                self._moments.remove(outgoing)
+            self._moments.add(block)
+        self.n_samples += size
+        if self._moments.m2 < 1e-6 * m2:
+            # Most of the variance left the window: the running moments
+            # lost their precision to cancellation
+            self._moments.reset(self.get_window())
+        if self._track_spectrum:
+            self._update_spectrum(block - outgoing if full else None)
+        if self._track_peaks:
+            self._detect_peaks()
+
+        if full:
+            self._hops_since_refresh += 1
+            if self._hops_since_refresh * self.hop_size >= n:
+                self._refresh()
+
+    def _add_pairs(self, positions):
+        low, high = self._pairs[positions].T
+        self._n_equal_pairs += int(np.sum(high == low))
+        if self._track_zero_crossings:
+            self._n_zero_crossings += int(np.sum(self._zero_crossings[positions]))
+        if self._track_pairs:
+            flat = high - low <= 2 * self.threshold
+            self._low = _sorted_insert(self._low, low)
+            self._high = _sorted_insert(self._high, high)
+            self._flat_low = _sorted_insert(self._flat_low, low[flat])
+            self._flat_high = _sorted_insert(self._flat_high, high[flat])
+
+    def _remove_pairs(self, positions):
+        low, high = self._pairs[positions].T
+        self._n_equal_pairs -= int(np.sum(high == low))
+        if self._track_zero_crossings:
+            self._n_zero_crossings -= int(np.sum(self._zero_crossings[positions]))
+        if self._track_pairs:
+            flat = high - low <= 2 * self.threshold
+            self._low = _sorted_remove(self._low, low)
+            self._high = _sorted_remove(self._high, high)
+            self._flat_low = _sorted_remove(self._flat_low, low[flat])
+            self._flat_high = _sorted_remove(self._flat_high, high[flat])
+
+    def _update_spectrum(self, delta):
+        """
+        Sliding DFT of the band bins, over the window with its oldest
+        sample at index 0. Called once the block is in the window, with the
+        difference of the hop's incoming and outgoing samples, or None if
+        the window was just filled.
+        """
+        if delta is None or self._hop_twiddle is None:
+            self._spectrum = np.fft.rfft(self.get_window())[self._bins]
+            return
+        self._spectrum = self._hop_shift * self._spectrum + self._hop_twiddle @ delta
+
+    def _refresh(self):
+        """
+        Recomputes the running statistics from the window.
+        """
+        window = self.get_window()
+        if self._track_moments:
+            self._moments.reset(window)
+        if self._track_spectrum:
+            self._spectrum = np.fft.rfft(window)[self._bins]
+        self._hops_since_refresh = 0
+
+    def _detect_peaks(self):
+        confirmed_until = self.n_samples - self.peak_margin
+        if confirmed_until <= self._peaks_until:
+            return
+        start = max(
+            self._peaks_until - self.peak_margin,
+            self.n_samples - self.window_size,
+            0,
+        )
+        s = self._tail(self.n_samples - start)
+        if self.wave_type == "PPG":
+            peaks, _ = self.detector.ppg_detector(s, detector_type=self.detector_type)
+        else:
+            peaks = self.detector.ecg_detector(s)[0]
+        peaks = np.asarray(peaks, dtype=np.int64) + start
+        peaks = peaks[(peaks >= self._peaks_until) & (peaks < confirmed_until)]
+        self._peaks.extend(peaks.tolist())
+        self._peaks_until = confirmed_until
+        window_start = self.n_samples - self.window_size
+        del self._peaks[: bisect.bisect_left(self._peaks, window_start)]
+
+    def _mean_crossings(self):
+        """
+        Number of consecutive pairs whose signs about the mean differ.
+        """
+        m, t = self._moments.mean, self.threshold
+        n_pairs = len(self._low)
+        below = np.searchsorted(self._high, m - t, side="left")
+        above = n_pairs - np.searchsorted(self._low, m + t, side="right")
+        # Both samples of a pair are within the threshold of the mean only if
+        # the pair is flat, and a flat pair below the band ends inside it
+        inside = np.searchsorted(
+            self._flat_high, m + t, side="right"
+        ) - np.searchsorted(self._flat_low, m - t, side="left")
+        return n_pairs - below - above - inside
+
+    def _emit(self):
+        n = max(self._moments.n, 1)
+        mean, m2, m3, m4 = (
+            self._moments.mean,
+            self._moments.m2 / n,
+            self._moments.m3 / n,
+            self._moments.m4 / n,
+        )
+        # A constant window is left to the SQI functions
+        constant = self._n_equal_pairs == self.window_size - 1
+        values = {}
+        for name, sqi in self.sqis.items():
+            if sqi == "kurtosis":
+                if constant:
+                    value = kurtosis_sqi(self.get_window())
+                else:
+                    value = m4 / m2**2 - 3
+            elif sqi == "skewness":
+                if constant:
+                    value = skewness_sqi(self.get_window())
+                else:
+                    value = m3 / m2**1.5
+            elif sqi == "signal_to_noise":
+                if constant:
+                    value = float(signal_to_noise_sqi(self.get_window()))
+                else:
+                    value = np.abs(mean) / np.sqrt(m2)
+            elif sqi == "zero_crossings_rate":
+                value = self._n_zero_crossings / (self.window_size - 1)
+            elif sqi == "mean_crossing_rate":
+                value = self._mean_crossings() / (self.window_size - 1)
+            elif sqi == "band_energy":
+                value = (
+                    np.sum(self._bin_weights * np.abs(self._spectrum) ** 2)
+                    / self.window_size**2
+                )
+            else:
+                intervals = np.diff(self._peaks)
+                value = (
+                    60 * self.sampling_rate / np.mean(intervals)
+                    if len(intervals)
+                    else np.nan
+                )
+            values[name] = value
+
+        values["start_idx"] = self.n_samples - self.window_size
+        values["end_idx"] = self.n_samples
+        if self.ruleset is not None:
+            values["decision"] = self.ruleset.execute(pd.DataFrame([values]))
+        return values
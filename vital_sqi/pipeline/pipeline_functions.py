@@ -1,11 +1,17 @@
 """Signal Quality Index (SQI) Processing and Classification Utilities"""
 
+import os
 import numpy as np
 import pandas as pd
 import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import itertools
+from collections import deque
 from tqdm import tqdm
-from scipy.signal import resample
-from vital_sqi.common.rpeak_detection import PeakDetector
+from scipy import fft as sp_fft
+from vital_sqi.common.rpeak_detection import FiducialCache
+from vital_sqi.data.signal_io import SignalChunk
 import vital_sqi.sqi as sq
 from vital_sqi.rule import RuleSet, Rule, update_rule
 from vital_sqi.common.utils import get_nn, create_rule_def
@@ -47,6 +53,52 @@ def classify_segments(
     sqis : DataFrame
         Updated DataFrame with decisions ('accept' or 'reject') for each segment.
     """
+    ruleset = generate_ruleset(
+        rule_dict_filename,
+        ruleset_order,
+        sqis[0] if auto_mode else None,
+        auto_mode,
+        lower_bound,
+        upper_bound,
+    )
+    selected_sqi = list(ruleset_order.values())
+
+    for i, sqi_df in enumerate(sqis):
+        sqi_df["decision"] = ruleset.execute_batch(sqi_df[selected_sqi])
+        sqis[i] = sqi_df
+
+    return ruleset, sqis
+
+
+def generate_ruleset(
+    rule_dict_filename,
+    ruleset_order,
+    sqi_df=None,
+    auto_mode=True,
+    lower_bound=0.05,
+    upper_bound=0.95,
+):
+    """
+    Build the RuleSet used by `classify_segments`.
+
+    Parameters
+    ----------
+    rule_dict_filename : str
+        Path to the JSON file defining thresholds for each SQI.
+    ruleset_order : dict
+        Specifies the order of the rules in the ruleset.
+    sqi_df : DataFrame, optional
+        SQI values of all segments, required when auto_mode is True.
+    auto_mode : bool
+        Enables automatic threshold adjustment based on quantiles.
+    lower_bound, upper_bound : float
+        Quantiles for the lower and upper bounds of threshold adjustment.
+
+    Returns
+    -------
+    RuleSet
+        The rules ordered as in ruleset_order.
+    """
     # Load rule dictionary
     try:
         with open(rule_dict_filename, "r") as f:
@@ -67,7 +119,7 @@ def classify_segments(
 
         if auto_mode:
             valid_values = (
-                sqis[0][sqi_name].replace([np.inf, -np.inf, np.nan], np.nan).dropna()
+                sqi_df[sqi_name].replace([np.inf, -np.inf, np.nan], np.nan).dropna()
             )
             lower_unit = np.quantile(valid_values, lower_bound)
             upper_unit = np.quantile(valid_values, upper_bound)
@@ -79,20 +131,7 @@ def classify_segments(
         rule = generate_rule(rule_name, rule_dict[rule_name]["def"])
         rule_list[rule_order] = rule
 
-    ruleset = RuleSet(rule_list)
-    selected_sqi = list(ruleset_order.values())
-
-    for i, sqi_df in enumerate(sqis):
-        decisions = [
-            ruleset.execute(
-                pd.DataFrame(dict(sqi_df[selected_sqi].iloc[idx]), index=[0])
-            )
-            for idx in range(len(sqi_df))
-        ]
-        sqi_df["decision"] = decisions
-        sqis[i] = sqi_df
-
-    return ruleset, sqis
+    return RuleSet(rule_list)
 
 
 def get_reject_segments(segments, wave_type):
@@ -131,7 +170,7 @@ def map_decision(decision):
     return 0 if decision == "accept" else 1
 
 
-def get_decision_segments(segments, decision, reject_decision):
+def get_decision_segments(segments, decision, reject_decision, return_indices=False):
     """
     Separate accepted and rejected segments based on decisions.
 
@@ -143,11 +182,15 @@ def get_decision_segments(segments, decision, reject_decision):
         Decisions from SQI evaluation ('accept'/'reject').
     reject_decision : list
         Additional rejection criteria.
+    return_indices : bool, optional
+        Whether to also return the positions of the accepted and rejected
+        segments (default is False).
 
     Returns
     -------
     tuple of lists
-        Accepted and rejected segments.
+        Accepted and rejected segments, followed by their positions if
+        `return_indices` is True.
     """
     # Ensure inputs are of the same length
     if not (len(segments) == len(decision) == len(reject_decision)):
@@ -160,15 +203,137 @@ def get_decision_segments(segments, decision, reject_decision):
     ]
     accepted = [seg for idx, seg in enumerate(segments) if combined_decision[idx] == 0]
     rejected = [seg for idx, seg in enumerate(segments) if combined_decision[idx] == 1]
+    if return_indices:
+        accepted_idx = [idx for idx, d in enumerate(combined_decision) if d == 0]
+        rejected_idx = [idx for idx, d in enumerate(combined_decision) if d == 1]
+        return accepted, rejected, accepted_idx, rejected_idx
     return accepted, rejected
 
 
+def _beat_bounds(signal, troughs):
+    """
+    Start and length of the beats between consecutive troughs, as sliced by
+    signal[troughs[i] : troughs[i + 1]].
+    """
+    troughs = np.asarray(troughs, dtype=np.int64)
+    starts = np.minimum(troughs[:-1], len(signal))
+    lengths = np.maximum(np.minimum(troughs[1:], len(signal)) - starts, 0)
+    return starts, lengths
+
+
+def _beat_blocks(signal, troughs, taper=False):
+    """
+    Groups the non-empty beats between consecutive troughs by length,
+    yielding the positions of the beats among all beats and a 2-D block of
+    the beats, tapered as by `taper_signal` if requested.
+    """
+    signal = np.asarray(signal)
+    starts, lengths = _beat_bounds(signal, troughs)
+    for length in np.unique(lengths[lengths > 0]):
+        positions = np.flatnonzero(lengths == length)
+        block = signal[starts[positions, None] + np.arange(length)]
+        if taper:
+            block = taper_signal(block)
+        yield positions, block
+
+
+def get_beat_matrix(
+    signal, troughs, mean_resample_size=100, taper=False, method="fft"
+):
+    """
+    Resample all beats of a segment to the same length at once.
+
+    Beats are cut between consecutive troughs, skipping empty beats. The
+    beats of equal length are transformed together, and all of them are
+    resampled in one call.
+
+    Parameters
+    ----------
+    signal : array-like
+        Signal values for a single segment.
+    troughs : array-like
+        Indices marking the start of each beat.
+    mean_resample_size : int, optional
+        Number of samples of each resampled beat (default is 100).
+    taper : bool, optional
+        Whether to taper each beat before resampling (default is False).
+    method : {'fft', 'linear'}, optional
+        'fft' (default) resamples each beat as `scipy.signal.resample` does,
+        with identical values. 'linear' interpolates each beat linearly on
+        `mean_resample_size` points from its first to its last sample.
+
+    Returns
+    -------
+    beat_matrix : np.ndarray
+        Resampled beats of shape (n_beats, mean_resample_size), in the
+        order of the beats.
+    mean_beat : np.ndarray or None
+        Mean of the resampled beats, or None if there is no beat.
+    """
+    if method not in ("fft", "linear"):
+        raise ValueError("method must be either 'fft' or 'linear'.")
+    n_beats = max(len(troughs) - 1, 0)
+    size = mean_resample_size
+    if method == "linear" and not taper:
+        # Interpolated from the signal at once, whatever the beat lengths
+        signal = np.asarray(signal)
+        starts, lengths = _beat_bounds(signal, troughs)
+        starts, lengths = starts[lengths > 0, None], lengths[lengths > 0, None]
+        grid = np.linspace(0, 1, size) * (lengths - 1)
+        left = np.minimum(grid.astype(np.int64), np.maximum(lengths - 2, 0))
+        right = np.minimum(left + 1, lengths - 1)
+        weight = grid - left
+        beat_matrix = (
+            signal[starts + left] * (1 - weight) + signal[starts + right] * weight
+        )
+        mean_beat = np.mean(beat_matrix, axis=0) if len(beat_matrix) else None
+        return beat_matrix, mean_beat
+
+    valid = np.zeros(n_beats, dtype=bool)
+    if method == "fft":
+        # Only the spectrum depends on the length of a beat: the spectra,
+        # truncated and scaled as by `resample`, share one inverse FFT
+        spectra = np.zeros((n_beats, size // 2 + 1), dtype=complex)
+    else:
+        beat_matrix = np.empty((n_beats, size))
+    for positions, block in _beat_blocks(signal, troughs, taper):
+        length = block.shape[1]
+        valid[positions] = True
+        if method == "fft":
+            n_bins = min(size, length)
+            spectrum = sp_fft.rfft(block, axis=1)[:, : n_bins // 2 + 1]
+            if n_bins % 2 == 0 and size != length:
+                spectrum[:, n_bins // 2] *= 2 if size < length else 0.5
+            spectra[positions, : n_bins // 2 + 1] = spectrum / (length / size)
+        elif length == 1:
+            beat_matrix[positions] = block
+        else:
+            grid = np.linspace(0, length - 1, size)
+            left = np.minimum(grid.astype(np.int64), length - 2)
+            weight = grid - left
+            beat_matrix[positions] = (
+                block[:, left] * (1 - weight) + block[:, left + 1] * weight
+            )
+    if method == "fft":
+        beat_matrix = sp_fft.irfft(spectra[valid], n=size, axis=1)
+    else:
+        beat_matrix = beat_matrix[valid]
+    mean_beat = np.mean(beat_matrix, axis=0) if len(beat_matrix) else None
+    return beat_matrix, mean_beat
+
+
 def per_beat_sqi(
     sqi_func, troughs, signal, use_mean_beat, mean_resample_size, taper=False, **kwargs
 ):
     """
     Compute SQI per beat by dividing the signal based on trough indices.
 
+    The mean beat is computed from the beat matrix of `get_beat_matrix`.
+    Per-beat SQIs of `BATCH_SQIS` are computed on the beats of equal
+    length at once. An SQI with a `batch` attribute, such as `dtw_sqi`,
+    scores all beats in one call to it, and other SQIs are computed beat
+    by beat.
+
     Parameters
     ----------
     sqi_func : function
@@ -194,25 +359,37 @@ def per_beat_sqi(
         return [-np.inf]
 
     sqi_vals = []
-    beat_list = []
 
-    for idx in range(len(troughs) - 1):
-        single_beat = signal[troughs[idx] : troughs[idx + 1]]
-        if len(single_beat) == 0:
-            continue
-        if taper:
-            single_beat = taper_signal(single_beat)
-
-        if use_mean_beat:
-            beat_list.append(resample(single_beat, mean_resample_size))
-        else:
-            sqi = sqi_func(single_beat, **kwargs)
-            sqi_vals.append(sqi)
-
-    if use_mean_beat and beat_list:
-        mean_beat = np.mean(np.array(beat_list), axis=0)
-        sqi = sqi_func(mean_beat, **kwargs)
-        sqi_vals.extend([sqi] * (len(troughs) - 1))  # One SQI per beat
+    if use_mean_beat:
+        _, mean_beat = get_beat_matrix(signal, troughs, mean_resample_size, taper)
+        if mean_beat is not None:
+            sqi = sqi_func(mean_beat, **kwargs)
+            sqi_vals = [sqi] * (len(troughs) - 1)  # One SQI per beat
+    else:
+        batch_func = getattr(sqi_func, "batch", None)
+        beat_sqis = {}
+        beats = {}
+        for positions, block in _beat_blocks(signal, troughs, taper):
+            if batch_func is not None:
+                beats.update(zip(positions, block))
+                continue
+            try:
+                batch_scores = get_batch_sqi(sqi_func, "beat", block, **kwargs)
+            except Exception:
+                batch_scores = None
+            if batch_scores is None or np.isnan(batch_scores["beat"]).any():
+                # Computed beat by beat, raising as the SQI does
+                scores = [sqi_func(beat, **kwargs) for beat in block]
+            else:
+                scores = batch_scores["beat"]
+            beat_sqis.update(zip(positions, scores))
+        if beats:
+            # Score all beats against a single template in one call
+            order = sorted(beats)
+            beat_sqis = dict(
+                zip(order, batch_func([beats[i] for i in order], **kwargs))
+            )
+        sqi_vals = [beat_sqis[i] for i in sorted(beat_sqis)]
 
     if not sqi_vals:
         logging.warning("No valid beats found for SQI calculation.")
@@ -247,8 +424,12 @@ def get_sqi_dict(sqis, sqi_name):
     if isinstance(sqis, dict):
         return sqis
 
-    if isinstance(sqis, (float, int, np.ndarray)):
-        return {sqi_name: sqis[0] if isinstance(sqis, np.ndarray) else sqis}
+    if isinstance(sqis, np.ndarray):
+        # 0-d arrays, as returned by np.where, hold a single value
+        return {sqi_name: sqis[0] if sqis.ndim else sqis[()]}
+
+    if isinstance(sqis, (float, int)):
+        return {sqi_name: sqis}
 
     if isinstance(sqis, list) and len(sqis) > 1:
         return {
@@ -259,6 +440,57 @@ def get_sqi_dict(sqis, sqi_name):
     return {sqi_name: sqis[0]}
 
 
+# SQIs computed across a 2-D block of equal-length segments by
+# `get_batch_sqi`, unless computed per beat
+BATCH_SQIS = (
+    "perfusion_sqi",
+    "kurtosis_sqi",
+    "skewness_sqi",
+    "entropy_sqi",
+    "signal_to_noise_sqi",
+    "zero_crossings_rate_sqi",
+    "mean_crossing_rate_sqi",
+)
+
+# Largest number of segments sent to a worker process in one task
+MAX_TASK_SEGMENTS = 16
+
+# Arguments of the SQI configuration consumed by `get_sqi` itself
+_GET_SQI_ARGS = (
+    "per_beat",
+    "use_mean_beat",
+    "mean_resample_size",
+    "wave_type",
+    "peak_detector",
+)
+
+
+def get_segment_values(s):
+    """
+    Return the signal values of a segment as a 1-D numpy array.
+
+    Parameters
+    ----------
+    s : DataFrame, Series, SignalChunk or array-like
+        Segment data. DataFrames are expected to hold timestamps in the first
+        column and signal values in the second. The first channel of a
+        SignalChunk or of a 2-D array is used.
+
+    Returns
+    -------
+    np.ndarray
+        Signal values of the segment.
+    """
+    if isinstance(s, pd.DataFrame):
+        return s.iloc[:, 1].values  # Extract the second column as numpy array
+    if isinstance(s, SignalChunk):
+        return s.signals[:, 0].astype(np.float64)
+    if isinstance(s, pd.Series):
+        return s.values  # Convert Series to array
+    s = np.asarray(s)  # Ensure array-like for other input types
+    return s[:, 0] if s.ndim == 2 else s
+
+
 def get_sqi(
     sqi_func,
     sqi_name,
@@ -268,6 +500,7 @@ def get_sqi(
     mean_resample_size=100,
     wave_type="PPG",
     peak_detector=6,
+    fiducial_cache=None,
     **kwargs,
 ):
     """
@@ -291,54 +524,45 @@ def get_sqi(
         Waveform type ('PPG' or 'ECG').
     peak_detector : int, optional
         Peak detector mode (1-7).
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment's fiducials shared between SQIs. It is passed on
+        to SQI functions accepting a `fiducial_cache` argument.
 
     Returns
     -------
     dict
-        Calculated SQI values.
+        Calculated SQI values, computed as by one SQI of an `SQIPlan`.
     """
-    # Extract signal values as array-like
-    if isinstance(s, pd.DataFrame):
-        signal_values = s.iloc[:, 1].values  # Extract the second column as numpy array
-    elif isinstance(s, pd.Series):
-        signal_values = s.values  # Convert Series to array
-    else:
-        signal_values = np.asarray(s)  # Ensure array-like for other input types
-    # print(sqi_func.__name__)
-    # Handle nn_intervals or other signal arguments
-    if inspect.getfullargspec(sqi_func)[0][0] == "nn_intervals":
-        # print(sqi_func.__name__)
-        signal_values = get_nn(signal_values)
-
-    if per_beat:
-        # Peak detection and SQI calculation per beat
-        detector = PeakDetector()
-        if wave_type == "PPG":
-            peak_list, trough_list = detector.ppg_detector(signal_values, peak_detector)
-        else:
-            peak_list, trough_list = detector.ecg_detector(signal_values, peak_detector)
-        sqi_scores = per_beat_sqi(
-            sqi_func,
-            trough_list,
-            signal_values,
-            use_mean_beat,
-            mean_resample_size,
-            **kwargs,
-        )
+    step = _SQIStep(
+        sqi_name,
+        None,
+        dict(
+            kwargs,
+            per_beat=per_beat,
+            use_mean_beat=use_mean_beat,
+            mean_resample_size=mean_resample_size,
+            peak_detector=peak_detector,
+        ),
+        func=sqi_func,
+    )
+    signal_values = get_segment_values(s)
+    if fiducial_cache is None:
+        fiducial_cache = FiducialCache()
+    if step.input == "nn_intervals":
+        values = get_nn(signal_values, fiducial_cache=fiducial_cache)
     else:
-        # Add wave_type to kwargs if needed
-        if "wave_type" in inspect.getfullargspec(sqi_func)[0]:
-            kwargs["wave_type"] = wave_type
-        sqi_scores = sqi_func(signal_values, **kwargs)
+        values = signal_values
+    return step(values, signal_values, fiducial_cache, wave_type)
 
-    # Convert SQI scores into a dictionary
-    sqi_score_dict = get_sqi_dict(sqi_scores, sqi_name)
-    return sqi_score_dict
 
-
-def extract_segment_sqi(s, sqi_list, sqi_names, sqi_arg_list, wave_type):
+def extract_segment_sqi(
+    s, sqi_list, sqi_names, sqi_arg_list, wave_type, fiducials=None, batch_scores=None
+):
     """
-    Extract SQIs for a single segment.
+    Extract SQIs for a single segment with the `SQIPlan` of the SQIs.
+
+    Peaks and troughs are detected at most once per detector for the
+    segment and shared between its SQIs through a `FiducialCache`.
 
     Parameters
     ----------
@@ -352,69 +576,646 @@ def extract_segment_sqi(s, sqi_list, sqi_names, sqi_arg_list, wave_type):
         Arguments for each SQI.
     wave_type : str
         Type of waveform ('PPG' or 'ECG').
+    fiducials : FiducialIndex, optional
+        Fiducials of the segment sliced from the index of the whole
+        recording. They seed the `FiducialCache`, so that their detector is
+        not run on the segment.
+    batch_scores : dict, optional
+        SQI values of the segment already computed with those of other
+        segments by `extract_batch_sqi`, keyed by SQI name. These SQIs are
+        not computed again.
 
     Returns
     -------
     Series
         Calculated SQI values.
     """
-    sqi_scores = {}
+    plan = SQIPlan.from_functions(sqi_list, sqi_names, sqi_arg_list, wave_type)
+    return plan.execute(s, fiducials, batch_scores)
 
-    for sqi_func, sqi_name in zip(sqi_list, sqi_names):
-        args = sqi_arg_list.get(sqi_name, {}).copy()
-        args["wave_type"] = wave_type
 
-        try:
-            if sqi_func.__name__ == "perfusion_sqi":
-                args = {"y": np.array(s.iloc[:, 1])}
-            sqi_scores.update(get_sqi(sqi_func, sqi_name, s, **args))
-        except Exception as e:
-            warnings.warn(f"{sqi_func.__name__} raised exception: {e}")
+def get_batch_sqi(sqi_func, sqi_name, block, **kwargs):
+    """
+    Compute an SQI on every row of a 2-D block of equal-length segments in
+    one call.
 
-    return pd.Series(sqi_scores)
+    Parameters
+    ----------
+    sqi_func : function
+        Function to calculate SQI.
+    sqi_name : str
+        Name of the SQI.
+    block : np.ndarray
+        Segments of shape (n_segments, n_samples).
+    **kwargs
+        Arguments of the SQI, as given to `get_sqi`. The SQI is computed
+        along the samples of the segments.
+
+    Returns
+    -------
+    dict or None
+        Array of the SQI of each segment, mapped with the SQI name, or None
+        if the SQI is not in `BATCH_SQIS`, is computed per beat or along
+        another axis, or omits NaNs. Such SQIs are computed segment by
+        segment with `get_sqi`.
+    """
+    if (
+        sqi_func.__name__ not in BATCH_SQIS
+        or kwargs.get("per_beat", False)
+        or kwargs.get("axis", 0) not in (0, -1)
+        or kwargs.get("nan_policy", "propagate") != "propagate"
+    ):
+        return None
+    if sqi_func.__name__ == "perfusion_sqi":
+        kwargs = {"y": block}
+    else:
+        kwargs = {
+            key: value for key, value in kwargs.items() if key not in _GET_SQI_ARGS
+        }
+    kwargs["axis"] = -1
+    sqi_scores = np.broadcast_to(sqi_func(block, **kwargs), len(block))
+    return {sqi_name: sqi_scores}
 
 
-def extract_sqi(segments, milestones, sqi_dict_filename, wave_type="PPG"):
+def _get_batch_scores(segment_values, batch_sqis):
     """
-    Extract SQIs for multiple segments based on SQI dictionary.
+    Computes SQIs across the equal-length segments of a batch, returning the
+    scores of each segment keyed by SQI name. Each of `batch_sqis` maps a
+    2-D block of segments to its scores as `get_batch_sqi` does.
+    """
+    batch_scores = [{} for _ in segment_values]
+    groups = {}
+    for i, values in enumerate(segment_values):
+        groups.setdefault(len(values), []).append(i)
+    for indices in groups.values():
+        block = np.stack([segment_values[i] for i in indices])
+        for batch_sqi in batch_sqis:
+            try:
+                sqi_scores = batch_sqi(block)
+            except Exception:
+                # Computed segment by segment, reporting the exception
+                continue
+            if sqi_scores is None:
+                continue
+            for row, i in enumerate(indices):
+                batch_scores[i].update(
+                    {name: scores[row] for name, scores in sqi_scores.items()}
+                )
+    return batch_scores
+
+
+def extract_batch_sqi(
+    segments, sqi_list, sqi_names, sqi_arg_list, wave_type, fiducials=None
+):
+    """
+    Extract SQIs for a batch of segments with the `SQIPlan` of the SQIs.
+
+    Segments of equal length are stacked into a 2-D block, and each SQI of
+    `BATCH_SQIS` is computed across the block in one call with
+    `get_batch_sqi`. The other SQIs are computed segment by segment with
+    `extract_segment_sqi`, whose values are matched by the batched SQIs.
+    An SQI raising on a block is computed segment by segment instead, so
+    that its exception is reported as in `extract_segment_sqi`.
 
     Parameters
     ----------
     segments : list
-        List of segments.
-    milestones : DataFrame
-        Milestone indices for segments.
-    sqi_dict_filename : str
-        Path to SQI configuration file.
-    wave_type : str, optional
+        Segments, in any format accepted by `extract_segment_sqi`.
+    sqi_list : list
+        List of SQI functions.
+    sqi_names : list
+        Names of SQIs.
+    sqi_arg_list : dict
+        Arguments for each SQI.
+    wave_type : str
         Type of waveform ('PPG' or 'ECG').
+    fiducials : list of FiducialIndex, optional
+        Fiducials of each segment, see `extract_segment_sqi`.
 
     Returns
     -------
-    DataFrame
-        Extracted SQIs for each segment.
+    list of Series
+        Calculated SQI values of each segment, in the order of the segments.
+    """
+    plan = SQIPlan.from_functions(sqi_list, sqi_names, sqi_arg_list, wave_type)
+    return plan.execute_batch(segments, fiducials)
+
+
+class _SQIStep:
+    """
+    One SQI of an `SQIPlan`, with the inputs and arguments of its function
+    resolved once.
+
+    The function is given directly, or by its key in `sqi_mapping`. In the
+    latter case it is looked up again when unpickled, as some SQI functions
+    are lambdas.
+    """
+
+    def __init__(self, name, key, args, func=None):
+        self.name = name
+        self.key = key
+        self.func = sqi_mapping[key] if func is None else func
+        self.args = dict(args)
+
+        arg_names = inspect.getfullargspec(self.func)[0]
+        self.input = "nn_intervals" if arg_names[0] == "nn_intervals" else "signal"
+        self.is_perfusion = self.func.__name__ == "perfusion_sqi"
+        kwargs = dict(args)
+        kwargs.pop("wave_type", None)
+        if self.is_perfusion:
+            # The configured arguments of the perfusion are not used
+            kwargs = {}
+        self.per_beat = kwargs.pop("per_beat", False)
+        self.use_mean_beat = kwargs.pop("use_mean_beat", True)
+        self.mean_resample_size = kwargs.pop("mean_resample_size", 100)
+        self.peak_detector = kwargs.pop("peak_detector", 6)
+        self.kwargs = kwargs
+        self.pass_wave_type = "wave_type" in arg_names
+        self.pass_fiducial_cache = "fiducial_cache" in arg_names
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.key is not None:
+            del state["func"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.key is not None:
+            self.func = sqi_mapping[self.key]
+
+    def __call__(self, values, signal_values, fiducial_cache, wave_type):
+        """Computes the SQI of a segment, mapped as by `get_sqi_dict`."""
+        if self.is_perfusion:
+            sqi_scores = self.func(values, y=np.array(signal_values))
+        elif self.per_beat:
+            if wave_type == "PPG":
+                peak_list, trough_list = fiducial_cache.ppg_detector(
+                    values, self.peak_detector
+                )
+            else:
+                peak_list, trough_list = fiducial_cache.ecg_detector(
+                    values, self.peak_detector
+                )
+            sqi_scores = per_beat_sqi(
+                self.func,
+                trough_list,
+                values,
+                self.use_mean_beat,
+                self.mean_resample_size,
+                **self.kwargs,
+            )
+        else:
+            kwargs = self.kwargs
+            if self.pass_wave_type or self.pass_fiducial_cache:
+                kwargs = dict(kwargs)
+                if self.pass_wave_type:
+                    kwargs["wave_type"] = wave_type
+                if self.pass_fiducial_cache:
+                    kwargs["fiducial_cache"] = fiducial_cache
+            sqi_scores = self.func(values, **kwargs)
+        return get_sqi_dict(sqi_scores, self.name)
+
+    def batch(self, block):
+        """Computes the SQI across a 2-D block of segments, see `get_batch_sqi`."""
+        return get_batch_sqi(self.func, self.name, block, **self.args)
+
+
+class SQIPlan:
+    """
+    Compiled execution plan of an SQI dictionary.
+
+    The SQI functions, their input (the signal or its NN intervals), and
+    whether they are computed per beat or on the mean beat are resolved
+    once when the plan is built. Executing the plan on a segment then only
+    calls the SQI functions: the fiducials of the segment are detected at
+    most once per detector and its NN intervals computed at most once, and
+    shared between the SQIs.
+
+    `get_sqi`, `extract_segment_sqi` and `extract_batch_sqi` compute their
+    SQIs with a plan. An exception raised by an SQI is reported with a
+    warning and the SQI is left out.
+
+    A plan is picklable, so that it can be sent to worker processes.
+
+    Parameters
+    ----------
+    sqi_dict : dict
+        SQI configuration, mapping the name of each SQI with its function in
+        `sqi_mapping` ('sqi') and the arguments of the function ('args'), as
+        in sqi_dict.json.
+    wave_type : str, optional
+        Type of waveform ('PPG' or 'ECG'), by default 'PPG'.
+
+    Examples
+    --------
+    >>> plan = SQIPlan.from_file("sqi_dict.json", wave_type="PPG")
+    >>> sqis = plan.execute(segment)
     """
-    with open(sqi_dict_filename, "r") as arg_file:
-        sqi_dict = json.load(arg_file)
 
-    # Extract SQI function mappings, names, and arguments
-    sqi_list = [sqi_mapping[sqi["sqi"]] for sqi in sqi_dict.values()]
-    sqi_names = list(sqi_dict.keys())
-    sqi_arg_list = {name: sqi["args"] for name, sqi in sqi_dict.items()}
+    def __init__(self, sqi_dict, wave_type="PPG"):
+        if wave_type not in ("PPG", "ECG"):
+            raise ValueError("Expected wave_type to be either 'PPG' or 'ECG'.")
+        self.wave_type = wave_type
+        self.steps = [
+            _SQIStep(name, sqi["sqi"], sqi.get("args", {}))
+            for name, sqi in sqi_dict.items()
+        ]
 
-    # Initialize an empty list to collect SQI rows
-    sqi_rows = []
-    for segment_idx, segment in enumerate(tqdm(segments)):
-        # Extract SQIs for the current segment
-        sqi_vals = extract_segment_sqi(
-            segment, sqi_list, sqi_names, sqi_arg_list, wave_type
+    @classmethod
+    def from_functions(cls, sqi_list, sqi_names, sqi_arg_list, wave_type="PPG"):
+        """
+        Builds the plan of SQI functions given directly.
+
+        Parameters
+        ----------
+        sqi_list : list
+            List of SQI functions.
+        sqi_names : list
+            Names of SQIs.
+        sqi_arg_list : dict
+            Arguments for each SQI, keyed by SQI name.
+        wave_type : str, optional
+            Type of waveform ('PPG' or 'ECG'), by default 'PPG'.
+
+        Returns
+        -------
+        SQIPlan
+            The compiled plan.
+        """
+        plan = cls({}, wave_type=wave_type)
+        plan.steps = [
+            _SQIStep(name, None, sqi_arg_list.get(name, {}), func=sqi_func)
+            for sqi_func, name in zip(sqi_list, sqi_names)
+        ]
+        return plan
+
+    @classmethod
+    def from_file(cls, sqi_dict_filename, wave_type="PPG"):
+        """
+        Builds the plan of an SQI configuration file.
+
+        Parameters
+        ----------
+        sqi_dict_filename : str
+            Path to SQI configuration file.
+        wave_type : str, optional
+            Type of waveform ('PPG' or 'ECG'), by default 'PPG'.
+
+        Returns
+        -------
+        SQIPlan
+            The compiled plan.
+        """
+        with open(sqi_dict_filename, "r") as arg_file:
+            return cls(json.load(arg_file), wave_type=wave_type)
+
+    @property
+    def sqi_names(self):
+        """Names of the SQIs, in the order of execution."""
+        return [step.name for step in self.steps]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return f"SQIPlan(wave_type={self.wave_type!r}, sqis={self.sqi_names})"
+
+    def execute(self, s, fiducials=None, batch_scores=None):
+        """
+        Computes the SQIs of a segment.
+
+        Parameters
+        ----------
+        s : DataFrame, Series, SignalChunk or array-like
+            Segment, in any format accepted by `get_segment_values`.
+        fiducials : FiducialIndex, optional
+            Fiducials of the segment sliced from the index of the whole
+            recording, see `extract_segment_sqi`.
+        batch_scores : dict, optional
+            SQI values of the segment already computed by `execute_batch`,
+            keyed by SQI name.
+
+        Returns
+        -------
+        Series
+            Calculated SQI values.
+        """
+        signal_values = get_segment_values(s)
+        fiducial_cache = FiducialCache(fiducials)
+        batch_scores = batch_scores or {}
+        nn_intervals = None
+        sqi_scores = {}
+
+        for step in self.steps:
+            if step.name in batch_scores:
+                sqi_scores[step.name] = batch_scores[step.name]
+                continue
+            try:
+                if step.input == "nn_intervals":
+                    if nn_intervals is None:
+                        nn_intervals = get_nn(
+                            signal_values, fiducial_cache=fiducial_cache
+                        )
+                    values = nn_intervals
+                else:
+                    values = signal_values
+                sqi_scores.update(
+                    step(values, signal_values, fiducial_cache, self.wave_type)
+                )
+            except Exception as e:
+                warnings.warn(f"{step.func.__name__} raised exception: {e}")
+
+        return pd.Series(sqi_scores)
+
+    def execute_batch(self, segments, fiducials=None):
+        """
+        Computes the SQIs of a batch of segments.
+
+        The SQIs of `BATCH_SQIS` are computed across the segments of equal
+        length in one call with `get_batch_sqi`, and the others with
+        `execute` on each segment. An SQI raising on a block is computed
+        segment by segment instead, so that its exception is reported as in
+        `execute`.
+
+        Parameters
+        ----------
+        segments : list
+            Segments, in any format accepted by `get_segment_values`.
+        fiducials : list of FiducialIndex, optional
+            Fiducials of each segment.
+
+        Returns
+        -------
+        list of Series
+            Calculated SQI values of each segment, in the order of the
+            segments.
+        """
+        segment_values = [get_segment_values(s) for s in segments]
+        if fiducials is None:
+            fiducials = [None] * len(segment_values)
+        batch_scores = _get_batch_scores(
+            segment_values, [step.batch for step in self.steps]
         )
-        sqi_rows.append(sqi_vals)
+        return [
+            self.execute(values, segment_fiducials, scores)
+            for values, segment_fiducials, scores in zip(
+                segment_values, fiducials, batch_scores
+            )
+        ]
+
+
+def _execute_plan_worker(item, plan):
+    """
+    Process-pool entry point of `SQIPlan.execute`, called with a
+    (segment, fiducials) pair.
+    """
+    s, fiducials = item
+    return plan.execute(s, fiducials)
+
+
+def _execute_plan_batch_worker(batch, plan):
+    """
+    Process-pool entry point of `SQIPlan.execute_batch`, called with a list
+    of (segment, fiducials) pairs.
+    """
+    segments, fiducials = zip(*batch)
+    return plan.execute_batch(segments, fiducials)
+
+
+def get_n_jobs(n_jobs):
+    """
+    Resolve the number of worker processes to use.
+
+    Parameters
+    ----------
+    n_jobs : int or None
+        Requested number of processes. None or 1 runs serially, negative
+        values count back from the number of CPUs (-1 uses all of them).
+
+    Returns
+    -------
+    int
+        Number of worker processes, at least 1.
+    """
+    if n_jobs is None:
+        return 1
+    if not isinstance(n_jobs, int) or n_jobs == 0:
+        raise ValueError("n_jobs must be a non-zero integer or None.")
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(1, n_jobs)
+
+
+def _map_chunk(fn, chunk):
+    """
+    Applies fn to each item of a chunk, in a worker process.
+    """
+    return [fn(item) for item in chunk]
+
+
+def _bounded_map(executor, fn, iterable, max_pending, chunksize=1):
+    """
+    Ordered executor.map that keeps at most max_pending tasks in flight, so
+    that a generator of segments is never fully materialized. Each task
+    applies fn to a chunk of up to chunksize items, which amortizes the
+    pickling and scheduling of a task over the chunk.
+    """
+    items = iter(iterable)
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(_map_chunk, fn, chunk))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def iter_segment_sqi(
+    segments,
+    sqi_dict_filename,
+    wave_type="PPG",
+    n_jobs=None,
+    fiducials=None,
+    batch_size=None,
+):
+    """
+    Yield the SQIs of each segment as soon as they are computed.
+
+    Segments are pulled from the iterable one at a time, or one batch at a
+    time, so a generator of segments is never materialized. With several
+    workers, segments are sent in tasks of up to `MAX_TASK_SEGMENTS`
+    segments, and at most ``4 * n_jobs`` tasks, or ``2 * n_jobs`` batches,
+    are in flight.
+
+    Parameters
+    ----------
+    segments : iterable
+        Segments, in any format accepted by `extract_segment_sqi`.
+    sqi_dict_filename : str or SQIPlan
+        Path to SQI configuration file, or the plan compiled from it, which
+        is sent to the worker processes.
+    wave_type : str, optional
+        Type of waveform ('PPG' or 'ECG'). Ignored if a plan is given.
+    n_jobs : int, optional
+        Number of worker processes, see `extract_sqi`.
+    fiducials : iterable of FiducialIndex, optional
+        Fiducials of each segment, in the order of the segments, as given
+        by `FiducialIndex.get_segment`. The next fiducials are pulled after
+        the next segment.
+    batch_size : int, optional
+        Number of segments whose SQIs are computed together with
+        `SQIPlan.execute_batch`. None (default) computes each segment alone
+        with `SQIPlan.execute`.
+
+    Yields
+    ------
+    Series
+        The SQIs of each segment, in the order of the segments.
+    """
+    if isinstance(sqi_dict_filename, SQIPlan):
+        plan = sqi_dict_filename
+    else:
+        plan = SQIPlan.from_file(sqi_dict_filename, wave_type)
+
+    if fiducials is None:
+        fiducials = itertools.repeat(None)
+    n_jobs = get_n_jobs(n_jobs)
+    if batch_size is not None:
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("batch_size must be a positive integer or None.")
+        items = zip(segments, fiducials)
+        batches = iter(lambda: list(itertools.islice(items, batch_size)), [])
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                for rows in _bounded_map(
+                    executor,
+                    partial(_execute_plan_batch_worker, plan=plan),
+                    (
+                        [
+                            (get_segment_values(segment), segment_fiducials)
+                            for segment, segment_fiducials in batch
+                        ]
+                        for batch in batches
+                    ),
+                    max_pending=n_jobs * 2,
+                ):
+                    yield from rows
+        else:
+            for batch in batches:
+                batch_segments, batch_fiducials = zip(*batch)
+                yield from plan.execute_batch(batch_segments, batch_fiducials)
+    elif n_jobs > 1:
+        chunksize = MAX_TASK_SEGMENTS
+        if hasattr(segments, "__len__"):
+            chunksize = max(1, min(len(segments) // (n_jobs * 4), chunksize))
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            yield from _bounded_map(
+                executor,
+                partial(_execute_plan_worker, plan=plan),
+                (
+                    (get_segment_values(segment), segment_fiducials)
+                    for segment, segment_fiducials in zip(segments, fiducials)
+                ),
+                max_pending=n_jobs * 4,
+                chunksize=chunksize,
+            )
+    else:
+        for segment, segment_fiducials in zip(segments, fiducials):
+            # Extract SQIs for the current segment
+            yield plan.execute(segment, segment_fiducials)
+
+
+def extract_sqi(
+    segments,
+    milestones,
+    sqi_dict_filename,
+    wave_type="PPG",
+    n_jobs=None,
+    fiducials=None,
+    batch_size=None,
+):
+    """
+    Extract SQIs for multiple segments based on SQI dictionary.
+
+    Parameters
+    ----------
+    segments : list or iterable
+        List of segments, or any iterable of segments such as the chunks
+        yielded by `PPG_stream_reader`. Segments are consumed one at a time.
+    milestones : DataFrame or None
+        Milestone indices for segments. If None, the segments must be
+        SignalChunk objects and their start and end indices are used.
+    sqi_dict_filename : str or SQIPlan
+        Path to SQI configuration file, or the plan compiled from it.
+    wave_type : str, optional
+        Type of waveform ('PPG' or 'ECG'). Ignored if a plan is given.
+    n_jobs : int, optional
+        Number of worker processes used to compute the segments in parallel.
+        None or 1 (default) computes serially, -1 uses all available CPUs.
+        Segments are sent to the workers as numpy arrays and the result is
+        identical to the serial computation.
+    fiducials : FiducialIndex, optional
+        Fiducials of the whole recording, such as `SignalSQI.fiducials`.
+        The fiducials of each segment are sliced from the index with the
+        milestones instead of being detected on the segment.
+    batch_size : int, optional
+        Number of segments pulled at a time to compute the SQIs of
+        `BATCH_SQIS` across the equal-length segments in one call, such as
+        the segments of a time split. None (default) computes each segment
+        alone. The result is identical either way.
+
+    Returns
+    -------
+    DataFrame
+        Extracted SQIs for each segment.
+    """
+    total = len(segments) if hasattr(segments, "__len__") else None
+    chunk_milestones = []
+
+    def iter_segments():
+        for segment in segments:
+            if milestones is None:
+                if not isinstance(segment, SignalChunk):
+                    raise ValueError(
+                        "Milestones are required unless segments are SignalChunk objects."
+                    )
+                chunk_milestones.append((segment.start_idx, segment.end_idx))
+            yield segment
+
+    def iter_fiducials():
+        # Pulled after each segment, so that the milestones of a chunk are
+        # already known
+        for i in itertools.count():
+            if milestones is None:
+                start, end = chunk_milestones[i]
+            else:
+                start, end = milestones.iloc[i, 0], milestones.iloc[i, 1]
+            yield fiducials.get_segment(start, end)
+
+    if total is not None and total <= 1:
+        n_jobs = None
+    sqi_rows = list(
+        tqdm(
+            iter_segment_sqi(
+                iter_segments(),
+                sqi_dict_filename,
+                wave_type,
+                n_jobs,
+                fiducials=None if fiducials is None else iter_fiducials(),
+                batch_size=batch_size,
+            ),
+            total=total,
+        )
+    )
 
     # Convert collected SQI rows into a DataFrame
     df_sqi = pd.DataFrame(sqi_rows)
 
     # Add start and end indices from milestones
+    if milestones is None:
+        milestones = pd.DataFrame(chunk_milestones, columns=["start", "end"])
     df_sqi["start_idx"] = milestones.iloc[:, 0].values
     df_sqi["end_idx"] = milestones.iloc[:, 1].values
 
@@ -1,14 +1,24 @@
 import os
+import numpy as np
 import pandas as pd
 import warnings
-from vital_sqi.preprocess.segment_split import split_segment, save_segment
+from collections import deque
+from tqdm import tqdm
+from vital_sqi.preprocess.segment_split import (
+    split_segment,
+    save_segment,
+    SegmentWriter,
+)
 from vital_sqi.pipeline.pipeline_functions import (
     extract_sqi,
     classify_segments,
+    generate_ruleset,
     get_reject_segments,
     get_decision_segments,
+    iter_segment_sqi,
 )
-from vital_sqi.data.signal_io import PPG_reader, ECG_reader
+from vital_sqi.data.signal_io import PPG_reader, ECG_reader, PPG_stream_reader
+from vital_sqi.data.signal_sqi_class import SignalSQI
 import json
 
 warnings.filterwarnings("ignore")
@@ -28,6 +38,8 @@ def get_ppg_sqis(
     overlapping=None,
     peak_detector=6,
     delete_signal=True,
+    n_jobs=None,
+    recording_fiducials=False,
 ):
     """
     Computes SQIs for PPG segments and returns the segments along with the SQIs.
@@ -60,6 +72,14 @@ def get_ppg_sqis(
         Method for peak detection (default is 7).
     delete_signal : bool, optional
         Whether to delete original signals after segmentation (default is True).
+    n_jobs : int, optional
+        Number of worker processes for SQI extraction (default is None,
+        serial). Use -1 to run on all available CPUs.
+    recording_fiducials : bool, optional
+        If True, peaks and troughs are detected once over the whole
+        recording with `peak_detector` and kept in `signal_obj.fiducials`.
+        The beat-based split and the SQIs of each segment use slices of
+        them instead of detecting them again (default is False).
 
     Returns
     -------
@@ -80,6 +100,10 @@ def get_ppg_sqis(
     if info_idx:
         signal_obj.signals = pd.concat([signal_obj.signals, signal_obj.info], axis=1)
 
+    fiducials = None
+    if recording_fiducials:
+        fiducials = signal_obj.detect_fiducials(detector_type=peak_detector)
+
     segments_lst, milestones_lst = [], []
     signals = signal_obj.signals.iloc[:, [1]]
     segments, milestones = split_segment(
@@ -90,6 +114,7 @@ def get_ppg_sqis(
         overlapping=overlapping,
         peak_detector=peak_detector,
         wave_type="PPG",
+        fiducials=fiducials,
     )
 
     if delete_signal:
@@ -105,7 +130,14 @@ def get_ppg_sqis(
     if delete_signal:
         signal_obj.signals = pd.DataFrame()
     signal_obj.sqis = [
-        extract_sqi(segments, milestones, sqi_dict_filename, wave_type="PPG")
+        extract_sqi(
+            segments,
+            milestones,
+            sqi_dict_filename,
+            wave_type="PPG",
+            n_jobs=n_jobs,
+            fiducials=fiducials,
+        )
         for segments, milestones in zip(segments_lst, milestones_lst)
     ]
     return segments_lst, signal_obj
@@ -131,6 +163,8 @@ def get_qualified_ppg(
     save_image=False,
     output_dir=None,
     delete_signal=False,
+    n_jobs=None,
+    backend="csv",
 ):
     """
     Extracts SQIs for PPG, classifies segments, and saves accepted/rejected segments.
@@ -150,6 +184,12 @@ def get_qualified_ppg(
         Directory to save accepted/rejected segments (default is current directory).
     delete_signal : bool, optional
         Whether to delete original signals after segmentation (default is True).
+    n_jobs : int, optional
+        Number of worker processes for SQI extraction (default is None,
+        serial). Use -1 to run on all available CPUs.
+    backend : str, optional
+        Storage of the saved segments, "csv" (default) for one file per
+        segment or "npy" for a single SegmentStore per decision.
 
     Returns
     -------
@@ -174,6 +214,7 @@ def get_qualified_ppg(
         overlapping,
         peak_detector,
         delete_signal,
+        n_jobs=n_jobs,
     )
 
     # Step 2: Load rule dictionary
@@ -209,14 +250,17 @@ def get_qualified_ppg(
             if predefined_reject
             else ["accept"] * len(signal_obj.sqis[i])
         )
-        a_segments, r_segments = get_decision_segments(
-            segments, signal_obj.sqis[0]["decision"].to_list(), reject_decision
+        a_segments, r_segments, a_idx, r_idx = get_decision_segments(
+            segments,
+            signal_obj.sqis[0]["decision"].to_list(),
+            reject_decision,
+            return_indices=True,
         )
 
         # Step 6: Save accepted and rejected segments
-        for seg_type, segments_to_save in [
-            ("accept", a_segments),
-            ("reject", r_segments),
+        for seg_type, segments_to_save, seg_idx in [
+            ("accept", a_segments, a_idx),
+            ("reject", r_segments, r_idx),
         ]:
             seg_dir = os.path.join(output_dir, seg_type)
             img_dir = os.path.join(seg_dir, "img") if save_image else None
@@ -229,11 +273,210 @@ def get_qualified_ppg(
                 save_file_folder=seg_dir,
                 save_image=save_image,
                 save_img_folder=img_dir,
+                backend=backend,
+                **_segment_metadata(signal_obj.sqis[i], seg_idx, seg_type),
             )
 
     return signal_obj
 
 
+def _segment_metadata(sqi_df, seg_idx, decision):
+    """
+    Milestones, decisions and SQIs of the segments at positions seg_idx, as
+    passed to `save_segment`.
+    """
+    rows = sqi_df.iloc[seg_idx]
+    index_columns = ["start_idx", "end_idx", "decision"]
+    return {
+        "milestones": rows[["start_idx", "end_idx"]],
+        "decisions": [decision] * len(rows),
+        "sqis": rows.drop(columns=index_columns, errors="ignore"),
+    }
+
+
+def _chunk_to_segment(chunk):
+    """
+    Build the segment DataFrame that `split_segment` cuts from the whole
+    recording in `get_ppg_sqis`: the first signal channel with timestamps
+    generated from the sample positions, indexed by position.
+    """
+    segment = pd.DataFrame(
+        chunk.signals[:, :1],
+        columns=list(chunk.columns[:1]),
+        index=pd.RangeIndex(chunk.start_idx, chunk.end_idx),
+    )
+    segment.insert(0, "timestamps", pd.to_datetime(segment.index, unit="s"))
+    return segment
+
+
+def stream_qualified_ppg(
+    file_name,
+    sqi_dict_filename,
+    signal_idx,
+    timestamp_idx,
+    rule_dict_filename,
+    ruleset_order,
+    timestamp_unit="ms",
+    sampling_rate=None,
+    start_datetime=None,
+    duration=30,
+    overlapping=None,
+    segment_name=None,
+    save_image=False,
+    output_dir=None,
+    auto_mode=True,
+    lower_bound=0.05,
+    upper_bound=0.95,
+    block_size=100000,
+    n_jobs=None,
+    backend="csv",
+):
+    """
+    Streaming version of `get_qualified_ppg` for recordings too large for memory.
+
+    The file is read block by block and each segment goes through SQI
+    extraction, classification and saving as soon as it is cut, so only a
+    few segments are held in memory. With auto_mode the thresholds depend
+    on the SQIs of all segments: SQIs are computed in a first pass and the
+    file is read again to save the classified segments. The SQIs, decisions
+    and saved files are the same as those of `get_qualified_ppg`.
+
+    Parameters
+    ----------
+    All parameters are similar to `get_qualified_ppg`, segments are split
+    by duration (split_type 0), with the addition of:
+    auto_mode : bool, optional
+        Derive thresholds from the quantiles of the SQIs (default is True,
+        as in `get_qualified_ppg`).
+    lower_bound, upper_bound : float, optional
+        Quantiles used by auto_mode (default is 0.05 and 0.95).
+    block_size : int, optional
+        Number of rows read from the file at a time (default is 100000).
+    backend : str, optional
+        "csv" (default) or "npy". With "npy" the decision and SQIs of each
+        segment are kept in the index of the SegmentStore.
+
+    Returns
+    -------
+    signal_obj
+        Signal object with the SQIs, decisions and rule set, without signals.
+    """
+    output_dir = output_dir or os.getcwd()
+    assert os.path.exists(output_dir), f"Output directory {output_dir} does not exist."
+    selected_sqi = list(ruleset_order.values())
+
+    def read_segments(milestones):
+        chunks = PPG_stream_reader(
+            file_name,
+            signal_idx=signal_idx,
+            timestamp_idx=timestamp_idx,
+            timestamp_unit=timestamp_unit,
+            sampling_rate=sampling_rate,
+            start_datetime=start_datetime,
+            duration=duration,
+            overlapping=overlapping or 0,
+            block_size=block_size,
+            dtype=None,
+        )
+        for chunk in chunks:
+            signal_info["sampling_rate"] = chunk.sampling_rate
+            milestones.append((chunk.start_idx, chunk.end_idx))
+            yield _chunk_to_segment(chunk)
+
+    def get_writers():
+        writers = {}
+        for seg_type in ["accept", "reject"]:
+            seg_dir = os.path.join(output_dir, seg_type)
+            img_dir = os.path.join(seg_dir, "img") if save_image else None
+            os.makedirs(seg_dir, exist_ok=True)
+            if save_image:
+                os.makedirs(img_dir, exist_ok=True)
+            writers[seg_type] = SegmentWriter(
+                segment_name=segment_name,
+                save_file_folder=seg_dir,
+                save_image=save_image,
+                save_img_folder=img_dir,
+                backend=backend,
+            )
+        return writers
+
+    signal_info = {"sampling_rate": sampling_rate}
+    milestones = []
+    sqi_rows = []
+    decisions = []
+    writers = None
+
+    if auto_mode:
+        # First pass: SQIs of all segments to derive the thresholds
+        for sqi_row in tqdm(
+            iter_segment_sqi(
+                read_segments(milestones), sqi_dict_filename, "PPG", n_jobs
+            )
+        ):
+            sqi_rows.append(sqi_row)
+    else:
+        ruleset = generate_ruleset(rule_dict_filename, ruleset_order, auto_mode=False)
+        writers = get_writers()
+        pending_segments = deque()
+
+        def keep_segments():
+            for segment in read_segments(milestones):
+                pending_segments.append(segment)
+                yield segment
+
+        for sqi_row in tqdm(
+            iter_segment_sqi(keep_segments(), sqi_dict_filename, "PPG", n_jobs)
+        ):
+            segment = pending_segments.popleft()
+            decision = ruleset.execute_batch(sqi_row[selected_sqi].to_frame().T)[0]
+            writers[decision].write(segment, decision=decision, sqis=sqi_row)
+            sqi_rows.append(sqi_row)
+            decisions.append(decision)
+
+    sqi_df = pd.DataFrame(sqi_rows)
+    sqi_df["start_idx"] = [start for start, _ in milestones]
+    sqi_df["end_idx"] = [end for _, end in milestones]
+
+    missing_sqi_keys = [key for key in selected_sqi if key not in sqi_df.columns]
+    if missing_sqi_keys:
+        raise KeyError(
+            f"The following SQIs in `ruleset_order` are missing from the extracted SQIs: {missing_sqi_keys}"
+        )
+
+    if auto_mode:
+        ruleset = generate_ruleset(
+            rule_dict_filename,
+            ruleset_order,
+            sqi_df,
+            auto_mode,
+            lower_bound,
+            upper_bound,
+        )
+        sqi_df["decision"] = ruleset.execute_batch(sqi_df[selected_sqi])
+
+        # Second pass: save the segments with their decisions, the
+        # milestones are already known from the first pass
+        writers = get_writers()
+        for segment, sqi_row, decision in zip(
+            read_segments([]), sqi_rows, sqi_df["decision"]
+        ):
+            writers[decision].write(segment, decision=decision, sqis=sqi_row)
+    else:
+        sqi_df["decision"] = decisions
+
+    for writer in writers.values():
+        writer.close()
+
+    return SignalSQI(
+        wave_type="PPG",
+        signals=pd.DataFrame(),
+        sampling_rate=signal_info["sampling_rate"],
+        start_datetime=start_datetime,
+        sqis=[sqi_df],
+        ruleset=ruleset,
+    )
+
+
 def get_ecg_sqis(
     file_name,
     sqi_dict_filename,
@@ -248,6 +491,7 @@ def get_ecg_sqis(
     duration=30,
     overlapping=None,
     peak_detector=6,
+    n_jobs=None,
 ):
     """
     Computes SQIs for ECG segments and returns the segments along with the SQIs.
@@ -261,6 +505,9 @@ def get_ecg_sqis(
         Number of channels in the ECG signal (default is None).
     channel_name : list, optional
         Names of channels in the ECG signal (default is None).
+    n_jobs : int, optional
+        Number of worker processes for SQI extraction (default is None,
+        serial). Use -1 to run on all available CPUs.
 
     Returns
     -------
@@ -278,7 +525,11 @@ def get_ecg_sqis(
 
     segments_lst, milestones_lst = [], []
     # for i in range(1, len(signal_obj.signals.columns)):
-    signals = signal_obj.signals.iloc[:, [signal_idx]]
+    if isinstance(signal_obj.signals, np.ndarray):
+        # Memory-mapped signals hold no timestamps column
+        signals = signal_obj.signals[:, signal_idx - 1]
+    else:
+        signals = signal_obj.signals.iloc[:, [signal_idx]]
     segments, milestones = split_segment(
         signals,
         split_type=split_type,
@@ -293,7 +544,9 @@ def get_ecg_sqis(
 
     signal_obj.signals = pd.DataFrame()
     signal_obj.sqis = [
-        extract_sqi(segments, milestones, sqi_dict_filename, wave_type="ECG")
+        extract_sqi(
+            segments, milestones, sqi_dict_filename, wave_type="ECG", n_jobs=n_jobs
+        )
         for segments, milestones in zip(segments_lst, milestones_lst)
     ]
     return segments_lst, signal_obj
@@ -322,6 +575,8 @@ def get_qualified_ecg(
     segment_name=None,
     save_image=False,
     output_dir=None,
+    n_jobs=None,
+    backend="csv",
 ):
     """
     Extracts SQIs for ECG, classifies segments, and saves accepted/rejected segments.
@@ -331,6 +586,9 @@ def get_qualified_ecg(
     All parameters are similar to `get_qualified_ppg` with the addition of:
     file_type : str
         Type of the ECG file.
+    n_jobs : int, optional
+        Number of worker processes for SQI extraction (default is None,
+        serial). Use -1 to run on all available CPUs.
 
     Returns
     -------
@@ -354,6 +612,7 @@ def get_qualified_ecg(
         duration,
         overlapping,
         peak_detector,
+        n_jobs=n_jobs,
     )
 
     for i, segments in enumerate(segment_lst):
@@ -373,14 +632,14 @@ def get_qualified_ecg(
         )
 
         # Separate accepted and rejected segments
-        a_segments, r_segments = get_decision_segments(
-            segments, sqis[i]["decision"], reject_decision
+        a_segments, r_segments, a_idx, r_idx = get_decision_segments(
+            segments, sqis[i]["decision"], reject_decision, return_indices=True
         )
 
         # Save segments
-        for seg_type, segments_to_save in [
-            ("accept", a_segments),
-            ("reject", r_segments),
+        for seg_type, segments_to_save, seg_idx in [
+            ("accept", a_segments, a_idx),
+            ("reject", r_segments, r_idx),
         ]:
             seg_dir = os.path.join(output_dir, str(i), seg_type)
             img_dir = os.path.join(seg_dir, "img") if save_image else None
@@ -393,6 +652,8 @@ def get_qualified_ecg(
                 save_file_folder=seg_dir,
                 save_image=save_image,
                 save_img_folder=img_dir,
+                backend=backend,
+                **_segment_metadata(sqis[i], seg_idx, seg_type),
             )
 
     return signal_obj
@@ -14,7 +14,8 @@ def taper_signal(
     Parameters
     ----------
     s : np.ndarray
-        Input signal as a 1D array of floats.
+        Input signal as a 1D array of floats, or a 2D array of signals
+        tapered row by row.
     window : np.ndarray, optional
         Window shape to apply, defaults to Tukey window if None.
     shift_min_to_zero : bool, optional
@@ -25,10 +26,11 @@ def taper_signal(
     np.ndarray
         Tapered and optionally shifted signal.
     """
+    s = np.asarray(s)
     if shift_min_to_zero:
-        s = s - np.min(s)
+        s = s - np.min(s, axis=-1, keepdims=True)
     if window is None:
-        window = signal.windows.tukey(len(s), 0.9)
+        window = signal.windows.tukey(s.shape[-1], 0.9)
     return s * window
 
 
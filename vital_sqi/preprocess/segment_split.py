@@ -11,6 +11,8 @@ import numpy as np
 import os
 from vital_sqi.common.utils import cut_segment, check_signal_format
 from vital_sqi.common.rpeak_detection import PeakDetector
+from vital_sqi.data.signal_io import SignalChunk
+from vital_sqi.data.segment_store import SegmentStore
 import logging
 
 
@@ -20,6 +22,10 @@ def save_segment(
     save_file_folder=None,
     save_image=False,
     save_img_folder=None,
+    backend="csv",
+    milestones=None,
+    decisions=None,
+    sqis=None,
 ):
     """
     Saves segments of waveforms to .csv files and optionally plots them to image files.
@@ -36,6 +42,19 @@ def save_segment(
         If True, saves images of each segment (default is False).
     save_img_folder : str, optional
         Directory to save image files (default is current working directory).
+    backend : str, optional
+        "csv" (default) writes one .csv file per segment. "npy" appends all
+        segments to a single SegmentStore in the directory
+        save_file_folder/segment_name, readable back by segment id.
+    milestones : pd.DataFrame or array_like, optional
+        Start and end indices of each segment in the recording, one row per
+        segment. Kept in the index of the "npy" backend only.
+    decisions : list of str, optional
+        Decision of each segment ('accept' or 'reject'), for the "npy"
+        backend only.
+    sqis : pd.DataFrame or list of dict, optional
+        SQI values of each segment, one row per segment, for the "npy"
+        backend only.
 
     Returns
     -------
@@ -44,35 +63,201 @@ def save_segment(
     assert isinstance(
         segment_list, (list, np.ndarray, pd.Series)
     ), "Expected a list-liked type of signal segments."
+    assert backend in ["csv", "npy"], "Expected backend to be 'csv' or 'npy'."
 
+    segment_name = segment_name or "segment"
     save_file_folder = save_file_folder or os.getcwd()
     save_img_folder = save_img_folder or os.getcwd()
     num_segments = len(segment_list)
     extension_len = len(str(num_segments))
 
+    if backend == "npy":
+        if milestones is not None:
+            milestones = np.asarray(milestones, dtype=np.int64).reshape(-1, 2)
+        if isinstance(sqis, pd.DataFrame):
+            sqis = sqis.to_dict(orient="records")
+        for name, values in [
+            ("milestones", milestones),
+            ("decisions", decisions),
+            ("sqis", sqis),
+        ]:
+            if values is not None and len(values) != num_segments:
+                raise ValueError(f"Expected one row of {name} per segment.")
+        store_path = os.path.join(save_file_folder, segment_name)
+        with SegmentStore(store_path, mode="w") as store:
+            for i, segment in enumerate(tqdm(segment_list, desc="Saving segments")):
+                store.append(
+                    segment,
+                    start=None if milestones is None else milestones[i, 0],
+                    end=None if milestones is None else milestones[i, 1],
+                    decision=None if decisions is None else decisions[i],
+                    sqis=None if sqis is None else sqis[i],
+                )
+        if not save_image:
+            return
+
     for i, segment in enumerate(tqdm(segment_list, desc="Saving segments"), start=1):
         filename_suffix = str(i).zfill(extension_len)
         saved_filename = f"{segment_name}-{filename_suffix}"
+        if backend == "npy":
+            try:
+                _save_segment_image(segment, saved_filename, save_img_folder)
+            except Exception as e:
+                logging.error(f"Failed to save image of segment {i} due to: {e}")
+            continue
+        _save_single_segment(
+            segment, i, saved_filename, save_file_folder, save_image, save_img_folder
+        )
 
-        try:
-            if save_image:
-                fig = go.Figure(
-                    go.Scatter(x=np.arange(len(segment)), y=segment, mode="lines")
-                )
-                fig.update_layout(autosize=True)
-                fig.write_image(os.path.join(save_img_folder, f"{saved_filename}.png"))
 
-            if type(segment) is np.ndarray:
-                np.savetxt(
-                    os.path.join(save_file_folder, f"{saved_filename}.csv"),
-                    segment,
-                    delimiter=",",
-                )
-            else:
-                segment.to_csv(os.path.join(save_file_folder, f"{saved_filename}.csv"))
-        except Exception as e:
-            # print(f"Failed to save segment {i} due to: {e}")
-            logging.error(f"Failed to save segment {i} due to: {e}")
+def _save_segment_image(segment, saved_filename, save_img_folder):
+    """
+    Plots one segment to a .png image.
+    """
+    fig = go.Figure(go.Scatter(x=np.arange(len(segment)), y=segment, mode="lines"))
+    fig.update_layout(autosize=True)
+    fig.write_image(os.path.join(save_img_folder, f"{saved_filename}.png"))
+
+
+def _save_single_segment(
+    segment, i, saved_filename, save_file_folder, save_image, save_img_folder
+):
+    """
+    Saves one segment to a .csv file and optionally to a .png image.
+    """
+    try:
+        if save_image:
+            _save_segment_image(segment, saved_filename, save_img_folder)
+
+        if type(segment) is np.ndarray:
+            np.savetxt(
+                os.path.join(save_file_folder, f"{saved_filename}.csv"),
+                segment,
+                delimiter=",",
+            )
+        else:
+            segment.to_csv(os.path.join(save_file_folder, f"{saved_filename}.csv"))
+    except Exception as e:
+        # print(f"Failed to save segment {i} due to: {e}")
+        logging.error(f"Failed to save segment {i} due to: {e}")
+
+
+class SegmentWriter:
+    """
+    Saves segments one at a time with the same file names as `save_segment`.
+
+    `save_segment` pads the segment numbers to the width of the total
+    count, which is unknown while segments are still being produced.
+    Segments are therefore written with unpadded numbers and renamed when
+    the writer is closed.
+
+    Parameters
+    ----------
+    segment_name : str, optional
+        Base filename for saved files (default is "segment").
+    save_file_folder : str, optional
+        Directory to save .csv files (default is current working directory).
+    save_image : bool, optional
+        If True, saves images of each segment (default is False).
+    save_img_folder : str, optional
+        Directory to save image files (default is current working directory).
+    backend : str, optional
+        "csv" (default) or "npy", as in `save_segment`.
+
+    Examples
+    --------
+    >>> with SegmentWriter("segment", "out") as writer:
+    ...     for segment in segments:
+    ...         writer.write(segment)
+    """
+
+    def __init__(
+        self,
+        segment_name="segment",
+        save_file_folder=None,
+        save_image=False,
+        save_img_folder=None,
+        backend="csv",
+    ):
+        assert backend in ["csv", "npy"], "Expected backend to be 'csv' or 'npy'."
+        segment_name = segment_name or "segment"
+        self.segment_name = segment_name
+        self.save_file_folder = save_file_folder or os.getcwd()
+        self.save_image = save_image
+        self.save_img_folder = save_img_folder or os.getcwd()
+        self.count = 0
+        self.store = None
+        if backend == "npy":
+            self.store = SegmentStore(
+                os.path.join(self.save_file_folder, segment_name), mode="w"
+            )
+
+    def write(self, segment, **kwargs):
+        """
+        Saves the next segment.
+
+        Parameters
+        ----------
+        segment : np.ndarray or pd.DataFrame
+            The segment to save.
+        **kwargs
+            Metadata of the segment passed to `SegmentStore.append`
+            (start, end, decision, sqis). Ignored by the csv backend.
+        """
+        self.count += 1
+        if self.store is not None:
+            self.store.append(segment, **kwargs)
+            if self.save_image:
+                try:
+                    _save_segment_image(
+                        segment,
+                        f"{self.segment_name}-{self.count}",
+                        self.save_img_folder,
+                    )
+                except Exception as e:
+                    logging.error(
+                        f"Failed to save image of segment {self.count} due to: {e}"
+                    )
+            return
+        _save_single_segment(
+            segment,
+            self.count,
+            f"{self.segment_name}-{self.count}",
+            self.save_file_folder,
+            self.save_image,
+            self.save_img_folder,
+        )
+
+    def close(self):
+        """
+        Renames the saved files to their final zero-padded names.
+        """
+        extension_len = len(str(self.count))
+        saved_files = []
+        if self.store is not None:
+            self.store.close()
+        else:
+            saved_files.append((self.save_file_folder, "csv"))
+        if self.save_image:
+            saved_files.append((self.save_img_folder, "png"))
+        for i in range(1, self.count + 1):
+            filename_suffix = str(i).zfill(extension_len)
+            for folder, extension in saved_files:
+                source = os.path.join(folder, f"{self.segment_name}-{i}.{extension}")
+                if filename_suffix != str(i) and os.path.isfile(source):
+                    os.replace(
+                        source,
+                        os.path.join(
+                            folder,
+                            f"{self.segment_name}-{filename_suffix}.{extension}",
+                        ),
+                    )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 def split_segment(
@@ -83,16 +268,22 @@ def split_segment(
     overlapping=0,
     peak_detector=6,
     wave_type="PPG",
+    fiducials=None,
 ):
     """
     Splits a long signal into segments based on time or beat, with optional overlap.
 
     Parameters
     ----------
-    s : pd.DataFrame
+    s : pd.DataFrame, np.ndarray or SignalChunk
         Signal data with timestamps as the first column and signal values as the second.
+        A chunk from `PPG_stream_reader` is split on its own and the
+        milestones are given as positions in the whole recording. An array
+        of shape (n_samples,) or (n_samples, n_channels), such as the
+        signals of a memory-mapped SignalSQI, holds no timestamps and is
+        cut into views without copying.
     sampling_rate : float or int
-        Sampling rate of the signal.
+        Sampling rate of the signal. Taken from the chunk if None.
     split_type : int, optional
         0: split by time; 1: split by beat (default is 0).
     duration : float, optional
@@ -103,11 +294,15 @@ def split_segment(
         Type of peak detector for beat-based segmentation (default is 6 - vitalDSP method).
     wave_type : str, optional
         Type of signal, either 'PPG' or 'ECG' (default is 'PPG').
+    fiducials : FiducialIndex, optional
+        Fiducials of the whole recording, such as `SignalSQI.fiducials`. If
+        given, a beat-based split cuts the beats between consecutive troughs
+        of the index instead of detecting them again.
 
     Returns
     -------
     segments : list
-        List of segmented DataFrames.
+        List of segmented DataFrames, or of array views for array input.
     milestones : pd.DataFrame
         DataFrame containing start and end indices of each segment.
 
@@ -123,7 +318,14 @@ def split_segment(
     if s is None or len(s) == 0:
         raise ValueError("Input signal is empty or None. Cannot perform segmentation.")
 
-    check_signal_format(s)
+    offset = 0
+    if isinstance(s, SignalChunk):
+        offset = s.start_idx
+        sampling_rate = sampling_rate or s.sampling_rate
+        s = s.to_frame()
+
+    if not isinstance(s, np.ndarray):
+        check_signal_format(s)
     sampling_rate = sampling_rate or 100  # Default sampling rate if None
     overlapping = overlapping or 0  # Default to no overlap if None
 
@@ -142,11 +344,16 @@ def split_segment(
         chunk_indices = [
             [i, min(i + chunk_size, len(s))] for i in range(0, len(s), chunk_step)
         ]
+    elif fiducials is not None:
+        chunk_indices = fiducials.get_segment(offset, offset + len(s)).sessions()
     else:
-        numeric_columns = s.select_dtypes(include=["float", "int"]).columns
-        if numeric_columns.empty:
-            raise ValueError("No column with numeric type found in the DataFrame.")
-        sig = np.array(s[numeric_columns[0]])
+        if isinstance(s, np.ndarray):
+            sig = s if s.ndim == 1 else s[:, 0]
+        else:
+            numeric_columns = s.select_dtypes(include=["float", "int"]).columns
+            if numeric_columns.empty:
+                raise ValueError("No column with numeric type found in the DataFrame.")
+            sig = np.array(s[numeric_columns[0]])
         detector = PeakDetector(wave_type=wave_type)
         if wave_type == "PPG":
             _, chunk_indices = detector.ppg_detector(
@@ -161,4 +368,6 @@ def split_segment(
 
     milestones = pd.DataFrame(chunk_indices, columns=["start", "end"])
     segments = cut_segment(s, milestones)
+    if offset:
+        milestones += offset
     return segments, milestones
@@ -32,6 +32,8 @@ class Rule:
         Saves the current rule definition to a specified file path.
     apply_rule(x):
         Applies the rule to an input x, returning the appropriate label.
+    apply_rule_vectorized(values):
+        Applies the rule to an array of inputs, returning an array of labels.
     write_rule():
         Returns a string representation of the rule for display purposes.
     """
@@ -199,6 +201,52 @@ class Rule:
         label_index = bisect.bisect_left(boundaries, x)
         return labels[label_index * 2] if label_index < len(labels) else None
 
+    def apply_rule_vectorized(self, values):
+        """
+        Applies the rule to an array of inputs and returns the corresponding labels.
+
+        This gives the same labels as calling :meth:`apply_rule` on every
+        element, but locates all values in the boundaries with a single
+        ``np.searchsorted`` call.
+
+        Parameters
+        ----------
+        values : array_like
+            The input values to check against the rule. Missing values
+            (None or NaN) fall into the first interval, as in `apply_rule`.
+
+        Returns
+        -------
+        np.ndarray
+            An object array with the label ("accept", "reject" or None)
+            of each input value.
+
+        Examples
+        --------
+        >>> rule = Rule("test_sqi")
+        >>> rule.update_def(op_list=["<=", ">"],
+                        value_list=[5, 5],
+                        label_list=["accept", "reject"])
+        >>> rule.apply_rule_vectorized([1, 5, 7])
+        array(['accept', 'accept', 'reject'], dtype=object)
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        boundaries = np.asarray(self.rule["boundaries"], dtype=float)
+        labels = np.asarray(self.rule["labels"], dtype=object)
+
+        if len(labels) == 0:
+            return np.full(len(values), None, dtype=object)
+
+        label_index = np.searchsorted(boundaries, values, side="left")
+        # bisect places NaN before every boundary, searchsorted after them
+        label_index[np.isnan(values)] = 0
+
+        on_boundary = np.zeros(len(values), dtype=bool)
+        inside = label_index < len(boundaries)
+        on_boundary[inside] = boundaries[label_index[inside]] == values[inside]
+
+        return labels[label_index * 2 + on_boundary]
+
     def write_rule(self):
         """
         Returns a string representation of the rule.
@@ -4,6 +4,7 @@ RuleSet Class for managing a set of SQI rules and building a decision flowchart.
 
 from vital_sqi.rule.rule_class import Rule
 from pyflowchart import StartNode, EndNode, OperationNode, ConditionNode, Flowchart
+import numpy as np
 import pandas as pd
 
 
@@ -23,6 +24,8 @@ class RuleSet:
         Exports the rules as a flowchart.
     execute(value_df):
         Executes the rules on a single-row DataFrame and returns a decision.
+    execute_batch(value_df):
+        Executes the rules on every row of a DataFrame and returns the decisions.
     """
 
     def __init__(self, rules):
@@ -121,6 +124,50 @@ class RuleSet:
                 return "reject"
         return "accept"
 
+    def execute_batch(self, value_df):
+        """
+        Executes the rule set on every row of a DataFrame at once.
+
+        The decision of each row is the same as :meth:`execute` on that row
+        alone: rules are applied in order and a row is rejected by the first
+        rule that rejects it, after which later rules are not evaluated for
+        that row.
+
+        Parameters
+        ----------
+        value_df : pd.DataFrame
+            A DataFrame with one row per segment and one column per rule.
+
+        Returns
+        -------
+        np.ndarray
+            An object array with the decision ("accept" or "reject") of
+            each row.
+
+        Raises
+        ------
+        KeyError
+            If a rule's SQI is not found in the input DataFrame while rows
+            are still waiting for that rule.
+        """
+        if not isinstance(value_df, pd.DataFrame):
+            raise TypeError(f"Expected data frame, found {type(value_df)}")
+
+        decisions = np.full(len(value_df), "accept", dtype=object)
+        pending = np.arange(len(value_df))
+
+        for order, rule in sorted(self.rules.items()):
+            if len(pending) == 0:
+                break
+            if rule.name not in value_df.columns:
+                raise KeyError(f"SQI {rule.name} not found in input data frame")
+
+            values = value_df[rule.name].to_numpy()[pending]
+            rejected = rule.apply_rule_vectorized(values) == "reject"
+            decisions[pending[rejected]] = "reject"
+            pending = pending[~rejected]
+        return decisions
+
 
 # Example usage:
 # r1 = Rule("sqi1")
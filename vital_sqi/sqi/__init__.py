@@ -9,7 +9,7 @@ A subpackage for signal quality index calculation, including:
 
 """
 
-from vital_sqi.sqi.dtw_sqi import dtw_sqi
+from vital_sqi.sqi.dtw_sqi import dtw_sqi, dtw_sqi_batch
 from vital_sqi.sqi.standard_sqi import (
     perfusion_sqi,
     kurtosis_sqi,
@@ -18,6 +18,8 @@ from vital_sqi.sqi.standard_sqi import (
     signal_to_noise_sqi,
     zero_crossings_rate_sqi,
     mean_crossing_rate_sqi,
+    sliding_window_sqi,
+    SLIDING_SQIS,
 )
 from vital_sqi.sqi.rpeaks_sqi import (
     ectopic_sqi,
@@ -43,6 +45,7 @@ from vital_sqi.sqi.hrv_sqi import (
     get_all_features_hrva,
 )
 from vital_sqi.sqi.waveform_sqi import (
+    multi_band_energy_sqi,
     band_energy_sqi,
     lf_energy_sqi,
     qrs_energy_sqi,
@@ -57,6 +60,61 @@ from vital_sqi.sqi.rpeaks_sqi import *
 from vital_sqi.sqi.waveform_sqi import *
 from vital_sqi.sqi.standard_sqi import *
 
+
+def _frequency_metric_sqi(metric):
+    """
+    Frequency SQI of `sqi_mapping` for a metric of `frequency_sqi`, taking
+    the arguments of sqi_dict.json: the band from f_min to f_max (lf_min to
+    lf_max for the normalized power), and the PSD of the NN intervals as
+    freqs and pows, if known. The HF band of the normalized power is not
+    used.
+    """
+
+    def sqi(
+        nn_intervals,
+        freqs=None,
+        pows=None,
+        f_min=0.04,
+        f_max=0.15,
+        lf_min=None,
+        lf_max=None,
+        hf_min=None,
+        hf_max=None,
+        fiducial_cache=None,
+    ):
+        return frequency_sqi(
+            nn_intervals,
+            freq_min=f_min if lf_min is None else lf_min,
+            freq_max=f_max if lf_max is None else lf_max,
+            metric=metric,
+            psd=None if freqs is None or pows is None else (freqs, pows),
+            fiducial_cache=fiducial_cache,
+        )
+
+    sqi.__name__ = f"{metric}_frequency_sqi"
+    return sqi
+
+
+def _lf_hf_ratio_sqi(
+    nn_intervals,
+    freqs=None,
+    pows=None,
+    lf_min=0.04,
+    lf_max=0.15,
+    hf_min=0.15,
+    hf_max=0.4,
+    fiducial_cache=None,
+):
+    """`lf_hf_ratio_sqi` taking the arguments of sqi_dict.json."""
+    return lf_hf_ratio_sqi(
+        nn_intervals,
+        lf_range=(lf_min, lf_max),
+        hf_range=(hf_min, hf_max),
+        psd=None if freqs is None or pows is None else (freqs, pows),
+        fiducial_cache=fiducial_cache,
+    )
+
+
 # Exported mapping for SQI functions
 sqi_mapping = {
     "perfusion_sqi": perfusion_sqi,
@@ -92,17 +150,11 @@ sqi_mapping = {
     "hr_max_sqi": lambda nn_intervals: hr_sqi(nn_intervals, stat="max"),
     "hr_std_sqi": lambda nn_intervals: hr_sqi(nn_intervals, stat="std"),
     "hr_range_sqi": hr_range_sqi,
-    "peak_frequency_sqi": lambda freqs, pows: frequency_sqi(freqs, pows, metric="peak"),
-    "absolute_power_sqi": lambda freqs, pows: frequency_sqi(
-        freqs, pows, metric="absolute"
-    ),
-    "log_power_sqi": lambda freqs, pows: frequency_sqi(freqs, pows, metric="log"),
-    "relative_power_sqi": lambda freqs, pows: frequency_sqi(
-        freqs, pows, metric="relative"
-    ),
-    "normalized_power_sqi": lambda freqs, pows: frequency_sqi(
-        freqs, pows, metric="normalized"
-    ),
-    "lf_hf_ratio_sqi": lf_hf_ratio_sqi,
+    "peak_frequency_sqi": _frequency_metric_sqi("peak"),
+    "absolute_power_sqi": _frequency_metric_sqi("absolute"),
+    "log_power_sqi": _frequency_metric_sqi("log"),
+    "relative_power_sqi": _frequency_metric_sqi("relative"),
+    "normalized_power_sqi": _frequency_metric_sqi("normalized"),
+    "lf_hf_ratio_sqi": _lf_hf_ratio_sqi,
     "poincare_sqi": poincare_features_sqi,
 }
@@ -2,24 +2,107 @@
 """
 
 import numpy as np
-from vital_sqi.common.generate_template import (
-    ppg_absolute_dual_skewness_template,
-    ppg_dual_double_frequency_template,
-    ppg_nonlinear_dynamic_system_template,
-    ecg_dynamic_template,
-)
+from vital_sqi.common.generate_template import get_template
 from vital_sqi.common.utils import check_valid_signal
-from scipy.spatial.distance import euclidean
 from scipy.signal import resample
 
-# from librosa.sequence import dtw
-from sklearn.preprocessing import MinMaxScaler
-from scipy.spatial.distance import cdist
 
+TEMPLATE_TYPES = {
+    0: "ppg_nonlinear_dynamic_system",
+    1: "ppg_dual_double_frequency",
+    2: "ppg_absolute_dual_skewness",
+    3: "ecg_dynamic",
+}
 
-def dtw_distance(seq1, seq2):
+
+def dtw_band(n, m, band=None, window=None, slope=2.0):
     """
-    Compute the Dynamic Time Warping (DTW) distance between two sequences in a vectorized manner.
+    Compute the admissible columns of every row of an n x m DTW grid.
+
+    Parameters
+    ----------
+    n : int
+        Length of the first sequence (rows of the grid).
+    m : int
+        Length of the second sequence (columns of the grid).
+    band : str, optional
+        Global constraint of the warping path: None (unconstrained),
+        "sakoe_chiba" or "itakura" (default is None).
+    window : int, optional
+        Half width in samples of the Sakoe-Chiba band around the diagonal
+        (required when band is "sakoe_chiba").
+    slope : float, optional
+        Maximum slope of the Itakura parallelogram, must be greater
+        than 1 (default is 2.0).
+
+    Returns
+    -------
+    lo, hi : numpy.ndarray
+        1-based inclusive column limits of each row. The limits are widened
+        where needed so that at least one warping path joins (1, 1) and (n, m).
+    """
+    if n <= 0 or m <= 0:
+        raise ValueError("Sequences must not be empty.")
+
+    rows = np.arange(1, n + 1)
+    if band is None:
+        lo = np.ones(n, dtype=int)
+        hi = np.full(n, m, dtype=int)
+    elif band == "sakoe_chiba":
+        if window is None or window < 0:
+            raise ValueError("Sakoe-Chiba band requires a non-negative window.")
+        centre = rows * m / n
+        lo = np.ceil(centre - window - 1e-9).astype(int)
+        hi = np.floor(centre + window + 1e-9).astype(int)
+    elif band == "itakura":
+        if slope <= 1:
+            raise ValueError("Itakura slope must be greater than 1.")
+        x = rows / n
+        y_min = np.maximum(x / slope, 1 - slope * (1 - x))
+        y_max = np.minimum(slope * x, 1 - (1 - x) / slope)
+        lo = np.ceil(y_min * m - 1e-9).astype(int)
+        hi = np.floor(y_max * m + 1e-9).astype(int)
+    else:
+        raise ValueError(f"Unknown band constraint {band}")
+
+    lo = np.clip(lo, 1, m)
+    hi = np.clip(hi, 1, m)
+    lo[0] = 1
+    hi[-1] = m
+    lo = np.minimum.accumulate(lo[::-1])[::-1]
+    hi = np.maximum.accumulate(np.maximum(hi, lo))
+    # Each row must start no further than one column past the previous row
+    hi[:-1] = np.maximum(hi[:-1], lo[1:] - 1)
+    return lo, hi
+
+
+def _envelope(template, lo, hi):
+    """
+    Lower and upper envelope of the template columns admissible in each row.
+    """
+    template = np.append(template, template[-1])
+    bounds = np.column_stack([lo - 1, hi]).reshape(-1)
+    lower = np.minimum.reduceat(template, bounds)[::2]
+    upper = np.maximum.reduceat(template, bounds)[::2]
+    return lower, upper
+
+
+def _lb_keogh(seqs, lower, upper):
+    """
+    LB_Keogh lower bound of each row of seqs against a template envelope.
+    """
+    return np.sum(
+        np.maximum(seqs - upper, 0) + np.maximum(lower - seqs, 0), axis=-1
+    )
+
+
+def lb_keogh(seq1, seq2, band=None, window=None, slope=2.0):
+    """
+    LB_Keogh lower bound of the DTW distance between two sequences.
+
+    Every sample of seq1 is matched to at least one sample of seq2 among the
+    columns allowed by the band, so its distance to the envelope of those
+    columns bounds the DTW distance from below.
 
     Parameters
     ----------
@@ -27,32 +110,204 @@ def dtw_distance(seq1, seq2):
         The first sequence (e.g., the signal)
     seq2 : array_like
         The second sequence (e.g., the template)
+    band, window, slope :
+        Global path constraint, see `dtw_band`.
 
     Returns
     -------
     float
-        The DTW distance between the sequences
+        A lower bound of `dtw_distance` with the same constraint.
+    """
+    seq1 = np.asarray(seq1, dtype=float).reshape(-1)
+    seq2 = np.asarray(seq2, dtype=float).reshape(-1)
+    lo, hi = dtw_band(len(seq1), len(seq2), band, window, slope)
+    lower, upper = _envelope(seq2, lo, hi)
+    return float(_lb_keogh(seq1, lower, upper))
+
+
+def _dtw_rows(seqs, template, lo, hi, max_distance):
+    """
+    Banded DTW of every row of seqs against template keeping two grid rows.
+
+    Within a grid row the recurrence D[i, j] = c[j] + min(D[i-1, j],
+    D[i-1, j-1], D[i, j-1]) is solved in closed form: with a[j] = c[j] +
+    min(D[i-1, j], D[i-1, j-1]) and C the cumulative sum of c,
+    D[i, j] = C[j] + min_{k <= j}(a[k] - C[k]).
+    """
+    n_seqs, n = seqs.shape
+    m = len(template)
+    distances = np.full(n_seqs, np.inf)
+    active = np.arange(n_seqs)
+
+    prev = np.full((n_seqs, m + 1), np.inf)
+    prev[:, 0] = 0
+    cur = np.empty_like(prev)
+    for i in range(n):
+        left, right = lo[i], hi[i]
+        cost = np.abs(seqs[active, i, None] - template[None, left - 1 : right])
+        step = cost + np.minimum(prev[:, left : right + 1], prev[:, left - 1 : right])
+        cum_cost = np.cumsum(cost, axis=1)
+        row = cum_cost + np.minimum.accumulate(step - cum_cost, axis=1)
+
+        cur.fill(np.inf)
+        cur[:, left : right + 1] = row
+        if max_distance is not None:
+            # Costs are non-negative, so the row minimum bounds the final cost
+            keep = row.min(axis=1) <= max_distance
+            if not keep.all():
+                active, cur, prev = active[keep], cur[keep], prev[keep]
+                if len(active) == 0:
+                    return distances
+        prev, cur = cur, prev
+
+    distances[active] = prev[:, m]
+    if max_distance is not None:
+        distances[distances > max_distance] = np.inf
+    return distances
+
+
+def dtw_distance(seq1, seq2, band=None, window=None, slope=2.0, max_distance=None):
+    """
+    Compute the Dynamic Time Warping (DTW) distance between two sequences.
+
+    Only two rows of the accumulated cost matrix are kept in memory and each
+    row is filled without a Python loop over columns.
+
+    Parameters
+    ----------
+    seq1 : array_like
+        The first sequence (e.g., the signal)
+    seq2 : array_like
+        The second sequence (e.g., the template)
+    band : str, optional
+        Global constraint of the warping path: None, "sakoe_chiba" or
+        "itakura" (default is None).
+    window : int, optional
+        Half width in samples of the Sakoe-Chiba band.
+    slope : float, optional
+        Maximum slope of the Itakura parallelogram (default is 2.0).
+    max_distance : float, optional
+        Abandon the computation as soon as the distance is known to exceed
+        this value, using LB_Keogh first and then the running row minimum
+        (default is None, never abandon).
+
+    Returns
+    -------
+    float
+        The DTW distance between the sequences, or np.inf if it exceeds
+        max_distance.
+
+    Examples
+    --------
+    >>> dtw_distance(np.array([0, 1, 2]), np.array([0, 0, 1, 2]))
+    0.0
+    """
+    return float(
+        dtw_distance_batch(
+            np.asarray(seq1, dtype=float).reshape(1, -1),
+            seq2,
+            band=band,
+            window=window,
+            slope=slope,
+            max_distance=max_distance,
+        )[0]
+    )
+
+
+def dtw_distance_batch(
+    seqs, template, band=None, window=None, slope=2.0, max_distance=None
+):
     """
-    n, m = len(seq1), len(seq2)
+    Compute the DTW distance of many sequences against one template.
 
-    # Calculate cost matrix in a vectorized manner
-    cost_matrix = cdist(seq1.reshape(-1, 1), seq2.reshape(-1, 1), metric="euclidean")
+    Sequences of equal length are stacked and processed together, so the
+    per-row work is shared by the whole group.
 
-    # Initialize the DTW matrix with infinity
-    dtw_matrix = np.full((n + 1, m + 1), np.inf)
-    dtw_matrix[0, 0] = 0
+    Parameters
+    ----------
+    seqs : array_like
+        A 2-D array with one sequence per row, or a list of 1-D sequences
+        of possibly different lengths.
+    template : array_like
+        The reference sequence.
+    band, window, slope, max_distance :
+        See `dtw_distance`.
 
-    # Fill the DTW matrix using vectorized operations
-    for i in range(1, n + 1):
-        dtw_matrix[i, 1:] = cost_matrix[i - 1, :] + np.minimum(
-            np.minimum(dtw_matrix[i - 1, 1:], dtw_matrix[i, :-1]),
-            dtw_matrix[i - 1, :-1],
-        )
+    Returns
+    -------
+    numpy.ndarray
+        The DTW distance of each sequence, np.inf where it exceeds
+        max_distance.
+    """
+    template = np.asarray(template, dtype=float).reshape(-1)
+    if isinstance(seqs, np.ndarray) and seqs.ndim == 2:
+        groups = {seqs.shape[1]: np.arange(len(seqs))}
+        seqs = seqs.astype(float, copy=False)
+    else:
+        seqs = [np.asarray(seq, dtype=float).reshape(-1) for seq in seqs]
+        lengths = np.array([len(seq) for seq in seqs], dtype=int)
+        groups = {n: np.flatnonzero(lengths == n) for n in np.unique(lengths)}
+
+    distances = np.full(len(seqs), np.inf)
+    for n, idx in groups.items():
+        if isinstance(seqs, np.ndarray):
+            group = seqs[idx]
+        else:
+            group = np.vstack([seqs[k] for k in idx])
+        lo, hi = dtw_band(n, len(template), band, window, slope)
+
+        if max_distance is not None:
+            lower, upper = _envelope(template, lo, hi)
+            candidates = np.flatnonzero(_lb_keogh(group, lower, upper) <= max_distance)
+            idx, group = idx[candidates], group[candidates]
+            if len(idx) == 0:
+                continue
+        distances[idx] = _dtw_rows(group, template, lo, hi, max_distance)
+    return distances
+
+
+def get_reference_template(template_type, template_size=100):
+    """
+    Generate the min-max scaled reference template used by `dtw_sqi`.
+
+    Parameters
+    ----------
+    template_type : int
+        Template type identifier (0-3 for different template types)
+    template_size : int, optional
+        Size of the template (default is 100)
+
+    Returns
+    -------
+    numpy.ndarray
+        The read-only reference template scaled to [0, 1]. Templates are
+        generated once and then served from the shared template cache.
+    """
+    if not isinstance(template_type, int) or not (0 <= template_type <= 3):
+        raise ValueError("Invalid template type")
 
-    return dtw_matrix[n, m]
+    return get_template(TEMPLATE_TYPES[template_type], template_size)
 
 
-def dtw_sqi(s, template_type, template_size=100, simple_mode=False):
+def _min_max_scale_rows(beats):
+    """
+    Scale each row to [0, 1] as MinMaxScaler does on a single column.
+    """
+    data_min = beats.min(axis=1, keepdims=True)
+    data_range = beats.max(axis=1, keepdims=True) - data_min
+    data_range[data_range == 0] = 1
+    return (beats - data_min) / data_range
+
+
+def dtw_sqi(
+    s,
+    template_type,
+    template_size=100,
+    simple_mode=False,
+    band=None,
+    window=None,
+    max_distance=None,
+):
     """
     Euclidean distance between signal and its template using DTW
 
@@ -70,57 +325,80 @@ def dtw_sqi(s, template_type, template_size=100, simple_mode=False):
     simple_mode : bool, optional
         If True, uses a simpler Euclidean distance instead of DTW
 
+    band : str, optional
+        Global constraint of the warping path: None, "sakoe_chiba" or
+        "itakura" (default is None).
+
+    window : int, optional
+        Half width in samples of the Sakoe-Chiba band.
+
+    max_distance : float, optional
+        Return np.inf as soon as the DTW distance is known to exceed this
+        value (default is None).
+
     Returns
     -------
     float
         Calculated DTW or Euclidean distance between the signal and the template.
     """
-    check_valid_signal(s)
+    return float(
+        dtw_sqi_batch(
+            [s],
+            template_type,
+            template_size=template_size,
+            simple_mode=simple_mode,
+            band=band,
+            window=window,
+            max_distance=max_distance,
+        )[0]
+    )
+
+
+def dtw_sqi_batch(
+    beats,
+    template_type,
+    template_size=100,
+    simple_mode=False,
+    band=None,
+    window=None,
+    max_distance=None,
+):
+    """
+    Compute `dtw_sqi` of many beats against the same template in one call.
+
+    The template is generated once and all resampled beats are scored
+    together by `dtw_distance_batch`. Each beat is validated as in
+    `dtw_sqi`. Also available as `dtw_sqi.batch`.
+
+    Parameters
+    ----------
+    beats : list of array_like
+        The beats to score.
+    template_type, template_size, simple_mode, band, window, max_distance :
+        See `dtw_sqi`.
 
+    Returns
+    -------
+    numpy.ndarray
+        The SQI of each beat.
+    """
     if template_size <= 0:
         raise ValueError("Number of samples must be greater than zero.")
+    if len(beats) == 0:
+        return np.array([])
+    for beat in beats:
+        check_valid_signal(beat)
 
-    s = resample(s, template_size).reshape(-1)
-    if not isinstance(template_type, int) or not (0 <= template_type <= 3):
-        raise ValueError("Invalid template type")
+    beats = np.vstack([resample(beat, template_size).reshape(-1) for beat in beats])
+    reference = get_reference_template(template_type, template_size)
+    beats = _min_max_scale_rows(beats)
 
-    if template_type == 0:
-        reference = ppg_nonlinear_dynamic_system_template(template_size).reshape(-1)
-    elif template_type == 1:
-        reference = ppg_dual_double_frequency_template(template_size)
-    elif template_type == 2:
-        reference = ppg_absolute_dual_skewness_template(template_size)
-    elif template_type == 3:
-        reference = np.array(ecg_dynamic_template(template_size)).reshape(-1)
-    else:
-        raise ValueError("Invalid template type")
+    if simple_mode:
+        return np.mean(np.abs(beats - reference[:template_size]), axis=1)
+    return dtw_distance_batch(
+        beats, reference, band=band, window=window, max_distance=max_distance
+    )
 
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    s = scaler.fit_transform(s.reshape(-1, 1)).reshape(-1)
-    reference = scaler.fit_transform(reference.reshape(-1, 1)).reshape(-1)
 
-    if simple_mode:
-        return np.mean(
-            [euclidean([s[i]], [reference[i]]) for i in range(template_size)]
-        )
-    else:
-        return dtw_distance(s, reference)
-
-    # if simple_mode:
-    #     cost = 0
-    #     for i in range(template_size):
-    #         cost += euclidean([s[i]], [reference[i]])
-    #     dtw_cost = cost / template_size
-    # else:
-    #     beat = resample(s, template_size)
-    #     scaler = MinMaxScaler(feature_range=(0, 1))
-    #     beat = scaler.fit_transform(beat.reshape(-1, 1)).reshape(-1)
-
-    #     reference = resample(reference, template_size)
-    #     scaler = MinMaxScaler(feature_range=(0, 1))
-    #     reference = scaler.fit_transform(reference.reshape(-1, 1)).reshape(-1)
-
-    #     # Use custom DTW function instead of librosa
-    #     dtw_cost = dtw_distance(beat, reference)
-
-    # return dtw_cost
+# Batch counterpart used by the pipeline to score many beats in one call
+dtw_sqi.batch = dtw_sqi_batch
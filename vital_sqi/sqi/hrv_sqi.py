@@ -357,8 +357,35 @@ def hr_range_sqi(nn_intervals, range_min=40, range_max=200):
         return np.nan
 
 
-def frequency_sqi(nn_intervals, freq_min=0.04, freq_max=0.15, metric="peak"):
-    """Calculates frequency domain features in a specified frequency band."""
+def _get_psd(nn_intervals, psd=None, fiducial_cache=None):
+    """
+    Returns the given (freqs, powers) PSD of the NN intervals, or computes it
+    with `calculate_psd`, once per array of NN intervals if a cache is given.
+    """
+    if psd is not None:
+        return psd
+    if fiducial_cache is None:
+        return calculate_psd(nn_intervals)
+    return fiducial_cache.derived(
+        ("psd",), nn_intervals, lambda: calculate_psd(nn_intervals)
+    )
+
+
+def frequency_sqi(
+    nn_intervals,
+    freq_min=0.04,
+    freq_max=0.15,
+    metric="peak",
+    psd=None,
+    fiducial_cache=None,
+):
+    """
+    Calculates frequency domain features in a specified frequency band.
+
+    The PSD of the NN intervals is computed with `calculate_psd`, unless it
+    is given as `psd`, or kept in `fiducial_cache` so that it is computed
+    once for all the frequency SQIs of a segment.
+    """
     # Validate metric first
     valid_metrics = ["peak", "absolute", "log", "normalized", "relative"]
     if metric not in valid_metrics:
@@ -372,7 +399,7 @@ def frequency_sqi(nn_intervals, freq_min=0.04, freq_max=0.15, metric="peak"):
         return np.nan
 
     try:
-        freqs, powers = calculate_psd(nn_intervals)
+        freqs, powers = _get_psd(nn_intervals, psd, fiducial_cache)
         if len(freqs) == 0 or len(powers) == 0:
             raise ValueError("PSD calculation failed; insufficient data points.")
     except Exception as e:
@@ -394,8 +421,18 @@ def frequency_sqi(nn_intervals, freq_min=0.04, freq_max=0.15, metric="peak"):
         return np.sum(band_powers) / total_power if total_power > 0 else np.nan
 
 
-def lf_hf_ratio_sqi(nn_intervals, lf_range=(0.04, 0.15), hf_range=(0.15, 0.4)):
-    """Calculates the LF/HF power ratio in frequency domain."""
+def lf_hf_ratio_sqi(
+    nn_intervals,
+    lf_range=(0.04, 0.15),
+    hf_range=(0.15, 0.4),
+    psd=None,
+    fiducial_cache=None,
+):
+    """
+    Calculates the LF/HF power ratio in frequency domain.
+
+    The PSD of the NN intervals is obtained as in `frequency_sqi`.
+    """
     if not isinstance(nn_intervals, (list, np.ndarray)):
         warnings.warn("Invalid input: nn_intervals must be a list or numpy array.")
         return np.nan
@@ -405,7 +442,7 @@ def lf_hf_ratio_sqi(nn_intervals, lf_range=(0.04, 0.15), hf_range=(0.15, 0.4)):
         return np.nan
 
     try:
-        freqs, powers = calculate_psd(nn_intervals)
+        freqs, powers = _get_psd(nn_intervals, psd, fiducial_cache)
         if len(freqs) == 0 or len(powers) == 0:
             raise ValueError("PSD calculation failed; insufficient data points.")
     except Exception as e:
@@ -472,11 +509,16 @@ def poincare_features_sqi(nn_intervals):
         return {"sd1": np.nan, "sd2": np.nan, "area": np.nan, "ratio": np.nan}
 
 
-def get_all_features_hrva(signal, sample_rate=100, rpeak_method=6, wave_type="ECG"):
+def get_all_features_hrva(
+    signal, sample_rate=100, rpeak_method=6, wave_type="ECG", fiducial_cache=None
+):
     """Extracts HRV features using peak detection and returns a comprehensive set of metrics."""
     if sample_rate <= 0:
         raise ValueError("Sample rate must be a positive number.")
-    detector = PeakDetector(wave_type=wave_type)
+    # A FiducialCache exposes the same detector methods as PeakDetector
+    detector = (
+        PeakDetector(wave_type=wave_type) if fiducial_cache is None else fiducial_cache
+    )
     try:
         peak_list = (
             detector.ppg_detector(signal, detector_type=rpeak_method)
@@ -30,6 +30,7 @@ def ectopic_sqi(
     wave_type="PPG",
     low_rri=300,
     high_rri=2000,
+    fiducial_cache=None,
 ):
     """
     Evaluate the ratio of ectopic (invalid) R-R intervals in a signal based on HRV rules.
@@ -51,6 +52,9 @@ def ectopic_sqi(
         Minimum acceptable R-R interval in ms. Default is 300.
     high_rri : int, optional
         Maximum acceptable R-R interval in ms. Default is 2000.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment's fiducials. If given, the R-R intervals are read
+        from it instead of being detected again. Default is None.
 
     Returns
     -------
@@ -73,10 +77,15 @@ def ectopic_sqi(
 
         # Initialize RRTransformation for the signal
         with HiddenPrints():
-            transformer = RRTransformation(
-                signal=s, fs=sample_rate, signal_type=wave_type
-            )
-            rr_intervals = transformer.compute_rr_intervals()
+            if fiducial_cache is None:
+                transformer = RRTransformation(
+                    signal=s, fs=sample_rate, signal_type=wave_type
+                )
+                rr_intervals = transformer.compute_rr_intervals()
+            else:
+                transformer, rr_intervals = fiducial_cache.rr_intervals(
+                    s, wave_type=wave_type, fs=sample_rate
+                )
 
         if len(rr_intervals) < 2:
             raise ValueError("Insufficient RR intervals for analysis.")
@@ -267,21 +276,30 @@ def interpolation_sqi(s):
     return 0.0
 
 
-def msq_sqi(s, peak_detector_1=7, peak_detector_2=6, wave_type="PPG"):
+def msq_sqi(
+    s, peak_detector_1=7, peak_detector_2=6, wave_type="PPG", fiducial_cache=None
+):
     """
     Computes the Modified Signal Quality (MSQ) SQI based on agreement between two R-peak detectors.
     This SQI is used to evaluate the consistency of peaks detected by different algorithms.
 
+    Only one ECG detector is available, so for ECG both peak sets are the R
+    peaks of that detector and the detector types are ignored: the SQI is
+    1.0 if R peaks are found and 0.0 otherwise.
+
     Parameters
     ----------
     s : array-like
         Input signal.
     peak_detector_1 : int, optional
-        Type of the primary peak detection algorithm. Default is 7 (Billauer).
+        Type of the primary PPG peak detection algorithm. Default is 7 (Billauer).
     peak_detector_2 : int, optional
-        Type of the secondary peak detection algorithm. Default is 6 (Scipy).
+        Type of the secondary PPG peak detection algorithm. Default is 6 (Scipy).
     wave_type : str, optional
         Type of signal, either 'PPG' or 'ECG'. Default is 'PPG'.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment's fiducials. If given, peaks are read from it
+        instead of being detected again. Default is None.
 
     Returns
     -------
@@ -293,16 +311,26 @@ def msq_sqi(s, peak_detector_1=7, peak_detector_2=6, wave_type="PPG"):
         return np.nan
 
     try:
-        detector = PeakDetector(wave_type=wave_type)
-
-        if wave_type == "PPG":
-            peaks_1, _ = detector.ppg_detector(s, detector_type=peak_detector_1)
-            peaks_2, _ = detector.ppg_detector(
-                s, detector_type=peak_detector_2, preprocess=False
-            )
+        if fiducial_cache is not None:
+            if wave_type == "PPG":
+                peaks_1, _ = fiducial_cache.ppg_detector(
+                    s, detector_type=peak_detector_1
+                )
+                peaks_2, _ = fiducial_cache.ppg_detector(
+                    s, detector_type=peak_detector_2
+                )
+            else:
+                peaks_1 = peaks_2 = fiducial_cache.ecg_detector(s)[0]
         else:
-            peaks_1, _ = detector.ecg_detector(s)
-            peaks_2, _ = detector.ecg_detector(s)
+            detector = PeakDetector(wave_type=wave_type)
+
+            if wave_type == "PPG":
+                peaks_1, _ = detector.ppg_detector(s, detector_type=peak_detector_1)
+                peaks_2, _ = detector.ppg_detector(
+                    s, detector_type=peak_detector_2, preprocess=False
+                )
+            else:
+                peaks_1 = peaks_2 = detector.ecg_detector(s)[0]
 
         # Check if either detector found no peaks
         if len(peaks_1) == 0 or len(peaks_2) == 0:
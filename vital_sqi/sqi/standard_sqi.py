@@ -6,10 +6,12 @@ These SQIs are based on the paper by Elgendi, Mohamed:
 """
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
 from scipy.stats import kurtosis, skew, entropy
 
 
-def perfusion_sqi(x, y):
+def perfusion_sqi(x, y, axis=None):
     """
     Calculates the perfusion index, a measure of pulsatile blood flow relative to static blood flow.
 
@@ -19,13 +21,18 @@ def perfusion_sqi(x, y):
         Raw PPG signal.
     y : array_like
         Filtered PPG signal.
+    axis : int, optional
+        Axis along which the perfusion is calculated (default is None, the
+        whole signal).
 
     Returns
     -------
-    float
+    float or ndarray
         Perfusion SQI, calculated as [(max(y) - min(y)) / abs(mean(x))] * 100.
     """
-    return ((np.max(y) - np.min(y)) / np.abs(np.mean(x))) * 100
+    return (
+        (np.max(y, axis=axis) - np.min(y, axis=axis)) / np.abs(np.mean(x, axis=axis))
+    ) * 100
 
 
 def kurtosis_sqi(x, axis=0, fisher=True, bias=True, nan_policy="propagate"):
@@ -48,11 +55,15 @@ def kurtosis_sqi(x, axis=0, fisher=True, bias=True, nan_policy="propagate"):
     Returns
     -------
     float or ndarray
-        Kurtosis value(s) of the signal.
+        Kurtosis value(s) of the signal. Rows of a 2-D signal that are all
+        zero have a kurtosis of 0.
     """
     if np.all(x == 0):
         return 0
-    return kurtosis(x, axis=axis, fisher=fisher, bias=bias, nan_policy=nan_policy)
+    value = kurtosis(x, axis=axis, fisher=fisher, bias=bias, nan_policy=nan_policy)
+    if np.ndim(value):
+        return np.where(np.all(np.asarray(x) == 0, axis=axis), 0, value)
+    return value
 
 
 def skewness_sqi(x, axis=0, bias=True, nan_policy="propagate"):
@@ -73,11 +84,15 @@ def skewness_sqi(x, axis=0, bias=True, nan_policy="propagate"):
     Returns
     -------
     float or ndarray
-        Skewness value(s) of the signal.
+        Skewness value(s) of the signal. Rows of a 2-D signal that are all
+        zero have a skewness of 0.
     """
     if np.all(x == 0):
         return 0
-    return skew(x, axis=axis, bias=bias, nan_policy=nan_policy)
+    value = skew(x, axis=axis, bias=bias, nan_policy=nan_policy)
+    if np.ndim(value):
+        return np.where(np.all(np.asarray(x) == 0, axis=axis), 0, value)
+    return value
 
 
 def entropy_sqi(x, qk=None, base=None, axis=0):
@@ -98,9 +113,16 @@ def entropy_sqi(x, qk=None, base=None, axis=0):
     Returns
     -------
     float or ndarray
-        Entropy value(s) of the signal.
+        Entropy value(s) of the signal. Each row of a 2-D signal is shifted
+        and normalized on its own, and rows of equal values have a NaN
+        entropy instead of raising.
     """
     x = np.array(x)
+    if x.ndim > 1:
+        x_shifted = x - np.min(x, axis=axis, keepdims=True)
+        with np.errstate(invalid="ignore"):
+            prob_dist = x_shifted / np.sum(x_shifted, axis=axis, keepdims=True)
+        return entropy(prob_dist, qk=qk, base=base, axis=axis)
     x_shifted = x - np.min(x)  # Shift x to non-negative
     if np.sum(x_shifted) == 0:
         raise ValueError("The sum of the input signal is zero; cannot compute entropy.")
@@ -151,18 +173,24 @@ def zero_crossings_rate_sqi(y, threshold=1e-10, ref_magnitude=None, axis=-1):
 
     Returns
     -------
-    float
-        Zero-crossing rate of the signal.
+    float or ndarray
+        Zero-crossing rate of the signal, or of each row along `axis` of a
+        2-D signal.
     """
+    if callable(ref_magnitude):
+        if np.ndim(y) > 1:
+            ref_magnitude = np.expand_dims(
+                np.apply_along_axis(ref_magnitude, axis, np.abs(y)), axis
+            )
+        else:
+            ref_magnitude = ref_magnitude(np.abs(y))
     if ref_magnitude is not None:
-        threshold *= (
-            ref_magnitude if not callable(ref_magnitude) else ref_magnitude(np.abs(y))
-        )
+        threshold = threshold * ref_magnitude
     y_clipped = np.where(
         np.abs(y) <= threshold, 0, y
     )  # Clip values within threshold to zero
     zero_crossings = np.diff(np.sign(y_clipped), axis=axis) != 0
-    return np.mean(zero_crossings)
+    return np.mean(zero_crossings, axis=axis if np.ndim(y) > 1 else None)
 
 
 def mean_crossing_rate_sqi(y, threshold=1e-10, ref_magnitude=None, pad=True, axis=-1):
@@ -184,8 +212,9 @@ def mean_crossing_rate_sqi(y, threshold=1e-10, ref_magnitude=None, pad=True, axi
 
     Returns
     -------
-    float
-        Mean-crossing rate of the signal.
+    float or ndarray
+        Mean-crossing rate of the signal, or of each row along `axis` of a
+        2-D signal.
     """
     if not isinstance(y, (list, np.ndarray)):
         raise TypeError("Input must be a list or numpy array.")
@@ -194,3 +223,260 @@ def mean_crossing_rate_sqi(y, threshold=1e-10, ref_magnitude=None, pad=True, axi
     return zero_crossings_rate_sqi(
         mean_shifted_y, threshold=threshold, ref_magnitude=ref_magnitude, axis=axis
     )
+
+
+SLIDING_SQIS = (
+    "perfusion_sqi",
+    "kurtosis_sqi",
+    "skewness_sqi",
+    "signal_to_noise_sqi",
+    "zero_crossings_rate_sqi",
+    "mean_crossing_rate_sqi",
+)
+
+
+def _central_moments(n, s1, s2, s3, s4):
+    """
+    Mean and central moment sums (M2, M3, M4) from the sums of the first
+    four powers of n samples.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = np.where(n > 0, s1 / n, 0)
+    m2 = s2 - n * mu**2
+    m3 = s3 - 3 * mu * s2 + 2 * n * mu**3
+    m4 = s4 - 4 * mu * s3 + 6 * mu**2 * s2 - 3 * n * mu**4
+    return mu, m2, m3, m4
+
+
+def _merge_moments(a, b):
+    """
+    Merges the (n, mean, M2, M3, M4) of two sets of samples with the
+    pairwise formulas of Pebay. Either set may be empty.
+    """
+    n_a, mean_a, m2_a, m3_a, m4_a = a
+    n_b, mean_b, m2_b, m3_b, m4_b = b
+    n = n_a + n_b
+    d = np.where((n_a > 0) & (n_b > 0), mean_b - mean_a, 0)
+    mean = np.where(n_a > 0, mean_a, mean_b) + d * n_b / n
+    m2 = m2_a + m2_b + d**2 * n_a * n_b / n
+    m3 = (
+        m3_a
+        + m3_b
+        + d**3 * n_a * n_b * (n_a - n_b) / n**2
+        + 3 * d * (n_a * m2_b - n_b * m2_a) / n
+    )
+    m4 = (
+        m4_a
+        + m4_b
+        + d**4 * n_a * n_b * (n_a**2 - n_a * n_b + n_b**2) / n**3
+        + 6 * d**2 * (n_a**2 * m2_b + n_b**2 * m2_a) / n**2
+        + 4 * d * (n_a * m3_b - n_b * m3_a) / n
+    )
+    return n, mean, m2, m3, m4
+
+
+def _window_moments(x, starts, ends, max_elements=2**22):
+    """
+    Mean and central moment sums of every window from its own samples.
+    Windows of equal length are stacked and computed in batches of at most
+    max_elements samples.
+    """
+    n = (ends - starts).astype(np.float64)
+    mean, m2, m3, m4 = (np.empty(len(starts)) for _ in range(4))
+    lengths = ends - starts
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        windows = sliding_window_view(x, length)
+        batch = max(1, max_elements // length)
+        for i in range(0, len(rows), batch):
+            block_rows = rows[i : i + batch]
+            block = windows[starts[block_rows]]
+            mean[block_rows] = block.mean(axis=1)
+            d = block - mean[block_rows, None]
+            d2 = d * d
+            m2[block_rows] = d2.sum(axis=1)
+            m3[block_rows] = (d2 * d).sum(axis=1)
+            m4[block_rows] = (d2 * d2).sum(axis=1)
+    return n, mean, m2, m3, m4
+
+
+def _sliding_moments(x, starts, ends, max_cancellation=100):
+    """
+    Mean and central moment sums of every window from prefix sums of powers.
+
+    The signal is cut into chunks as long as the longest window and the
+    prefix sums restart in every chunk, about the chunk mean, so that they
+    stay small. A window spans at most two chunks, whose moments are merged.
+
+    The conversion to central moments cancels when the part of a window in
+    a chunk lies far from the chunk mean relative to its spread, as next to
+    a level step or a dropout of the signal. Windows whose sum of squares
+    about the chunk mean exceeds max_cancellation times their central one
+    are computed from their own samples instead.
+    """
+    length = int(np.max(ends - starts))
+    n_chunks = -(-len(x) // length)
+    chunks = np.pad(x, (0, n_chunks * length - len(x)), mode="edge")
+    chunks = chunks.reshape(n_chunks, length)
+    centers = chunks.mean(axis=1, keepdims=True)
+    d = chunks - centers
+    powers = [d, d * d]
+    powers += [powers[1] * d, powers[1] * powers[1]]
+    prefix = [np.pad(np.cumsum(p, axis=1), ((0, 0), (1, 0))) for p in powers]
+
+    # Part of the window in the chunk of its start, then in the next one
+    first = starts // length
+    lo = starts - first * length
+    hi = np.minimum(ends - first * length, length)
+    n_a = hi - lo
+    sums_a = [p[first, hi] - p[first, lo] for p in prefix]
+    second = np.minimum(first + 1, n_chunks - 1)
+    n_b = np.maximum(ends - (first + 1) * length, 0)
+    sums_b = [p[second, n_b] for p in prefix]
+
+    mu_a, *central_a = _central_moments(n_a, *sums_a)
+    mu_b, *central_b = _central_moments(n_b, *sums_b)
+    moments = _merge_moments(
+        (n_a, centers[first, 0] + mu_a, *central_a),
+        (n_b, centers[second, 0] + mu_b, *central_b),
+    )
+
+    inaccurate = np.flatnonzero(
+        (sums_a[1] > max_cancellation * central_a[0])
+        | (sums_b[1] > max_cancellation * central_b[0])
+    )
+    if len(inaccurate):
+        exact = _window_moments(x, starts[inaccurate], ends[inaccurate])
+        moments = tuple(np.asarray(m, dtype=np.float64).copy() for m in moments)
+        for merged, value in zip(moments, exact):
+            merged[inaccurate] = value
+    return moments
+
+
+def _sliding_extrema(y, starts, ends):
+    """
+    Maximum and minimum of every window, with one sliding filter per window
+    length.
+    """
+    maxima = np.empty(len(starts))
+    minima = np.empty(len(starts))
+    lengths = ends - starts
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        # A filter of size L centered on s + L // 2 spans [s, s + L)
+        centers = starts[rows] + length // 2
+        maxima[rows] = maximum_filter1d(y, length)[centers]
+        minima[rows] = minimum_filter1d(y, length)[centers]
+    return maxima, minima
+
+
+def _mean_crossing_counts(x, starts, ends, threshold, max_elements=2**22):
+    """
+    Number of mean crossings of every window. Windows of equal length are
+    stacked and counted in batches of at most max_elements samples.
+    """
+    counts = np.empty(len(starts))
+    lengths = ends - starts
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        windows = sliding_window_view(x, length)
+        batch = max(1, max_elements // length)
+        for i in range(0, len(rows), batch):
+            block = windows[starts[rows[i : i + batch]]]
+            block = block - block.mean(axis=1, keepdims=True)
+            signs = np.sign(np.where(np.abs(block) <= threshold, 0, block))
+            counts[rows[i : i + batch]] = np.sum(np.diff(signs, axis=1) != 0, axis=1)
+    return counts
+
+
+def sliding_window_sqi(x, milestones, sqi_names=None, y=None, threshold=1e-10):
+    """
+    Computes standard SQIs of many windows of a signal in one pass.
+
+    Overlapping windows, such as the segments of `split_segment` with
+    `overlapping`, share their samples. Instead of computing every window
+    from scratch, the moments of all windows are taken from prefix sums of
+    the first four powers of the signal, the crossing counts from prefix
+    sums of crossing indicators and the extrema from sliding filters.
+
+    The values match the SQI functions with their default arguments on
+    each window. Windows whose power sums would cancel, such as those next
+    to a level step or a dropout, are computed from their own samples. The
+    mean crossing rate depends on the mean of each window
+    and is still counted on every sample of every window, in batches of
+    stacked windows.
+
+    Parameters
+    ----------
+    x : array_like
+        The whole signal.
+    milestones : pd.DataFrame or array_like
+        Start and end of each window in the signal, one row per window, as
+        returned by `split_segment`.
+    sqi_names : list of str, optional
+        SQIs to compute, among `SLIDING_SQIS` (default is all of them).
+    y : array_like, optional
+        Filtered signal of `perfusion_sqi` (default is x).
+    threshold : float, optional
+        Threshold for clipping values close to zero in the crossing rates
+        (default is 1e-10).
+
+    Returns
+    -------
+    dict
+        An array of the values of the windows for each SQI name.
+
+    Examples
+    --------
+    >>> segments, milestones = split_segment(df, 100, duration=30, overlapping=29)
+    >>> sqis = sliding_window_sqi(df["signal"], milestones, ["skewness_sqi"])
+    >>> sqis["skewness_sqi"].shape
+    (len(milestones),)
+    """
+    sqi_names = list(SLIDING_SQIS if sqi_names is None else sqi_names)
+    unknown = set(sqi_names) - set(SLIDING_SQIS)
+    if unknown:
+        raise ValueError(f"SQIs without a sliding-window mode: {sorted(unknown)}")
+    x = np.asarray(x, dtype=np.float64).ravel()
+    milestones = np.asarray(milestones, dtype=np.int64).reshape(-1, 2)
+    starts, ends = milestones[:, 0], milestones[:, 1]
+    if len(starts) == 0:
+        return {name: np.array([]) for name in sqi_names}
+    if np.any(starts < 0) or np.any(ends > len(x)) or np.any(ends <= starts):
+        raise ValueError("Expected windows within the signal.")
+
+    n, mean, m2, m3, m4 = _sliding_moments(x, starts, ends)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m2, m3, m4 = m2 / n, m3 / n, m4 / n
+        pairs = np.where(n > 1, n - 1, np.nan)
+
+        # A window is constant when all of its consecutive samples are equal
+        equal = np.concatenate(([0, 0], np.cumsum(x[1:] == x[:-1])))
+        constant = equal[ends] - equal[starts + 1] == n - 1
+        zero = constant & (x[starts] == 0)
+        mean = np.where(constant, x[starts], mean)
+
+        sqis = {}
+        for name in sqi_names:
+            if name == "kurtosis_sqi":
+                value = np.where(constant, np.nan, m4 / m2**2 - 3)
+            elif name == "skewness_sqi":
+                value = np.where(constant, np.nan, m3 / m2**1.5)
+            elif name == "signal_to_noise_sqi":
+                value = np.where(constant, 0, np.abs(mean) / np.sqrt(m2))
+            elif name == "zero_crossings_rate_sqi":
+                signs = np.sign(np.where(np.abs(x) <= threshold, 0, x))
+                crossings = np.concatenate(
+                    ([0, 0], np.cumsum(signs[1:] != signs[:-1]))
+                )
+                value = (crossings[ends] - crossings[starts + 1]) / pairs
+            elif name == "mean_crossing_rate_sqi":
+                value = _mean_crossing_counts(x, starts, ends, threshold) / pairs
+            else:
+                y_values = x if y is None else np.asarray(y, dtype=np.float64)
+                maxima, minima = _sliding_extrema(y_values.ravel(), starts, ends)
+                value = (maxima - minima) / np.abs(mean) * 100
+            if name in ("kurtosis_sqi", "skewness_sqi"):
+                value = np.where(zero, 0, value)
+            sqis[name] = value
+    return sqis
@@ -6,10 +6,136 @@ Implementation of waveform-based SQIs (Signal Quality Indices):
 
 import scipy.signal as sn
 import numpy as np
+from functools import lru_cache
 from vitalDSP.physiological_features.waveform import WaveformMorphology
 
 
-def band_energy_sqi(signal, sampling_rate=100, band=None, nperseg=2048):
+def _stft(signal, sampling_rate, nperseg, fiducial_cache=None):
+    """
+    Short-Time Fourier Transform of the waveform energy SQIs, computed once
+    per segment and parameters if a `FiducialCache` is given.
+    """
+
+    def compute():
+        return sn.stft(
+            signal,
+            fs=sampling_rate,
+            window="hann",
+            nperseg=nperseg,
+            noverlap=(nperseg // 2),
+            detrend=False,
+            return_onesided=True,
+            boundary="zeros",
+            padded=True,
+        )
+
+    if fiducial_cache is None:
+        return compute()
+    return fiducial_cache.derived(("stft", sampling_rate, nperseg), signal, compute)
+
+
+@lru_cache(maxsize=256)
+def _band_indices(sampling_rate, nperseg, band):
+    """
+    Indices of the STFT frequencies in (band[0], band[1]], computed once per
+    window parameters and band.
+    """
+    freqs = np.fft.rfftfreq(nperseg, d=1 / sampling_rate)
+    indices = np.flatnonzero((freqs > band[0]) & (freqs <= band[1]))
+    indices.flags.writeable = False
+    return indices
+
+
+def _time_marginals(signal, sampling_rate, bands, nperseg, fiducial_cache=None):
+    """
+    Time marginal of the STFT magnitude in each band, all from one STFT.
+    """
+    if len(signal) < nperseg:
+        nperseg = len(signal)
+    f, t, spec = _stft(signal, sampling_rate, nperseg, fiducial_cache)
+    if fiducial_cache is None:
+        magnitude = np.abs(spec)
+    else:
+        magnitude = fiducial_cache.derived(("abs",), spec, lambda: np.abs(spec))
+    return [
+        np.sum(
+            (
+                magnitude
+                if band is None
+                else magnitude[_band_indices(sampling_rate, nperseg, tuple(band))]
+            ),
+            axis=0,
+        )
+        for band in bands
+    ]
+
+
+def multi_band_energy_sqi(
+    signal, sampling_rate=100, bands=None, nperseg=2048, fiducial_cache=None
+):
+    """
+    Compute the energy and the normalized power of several frequency bands
+    from a single Short-Time Fourier Transform.
+
+    The energy of a band is the `band_energy_sqi` of the band, and its
+    normalized power the `vhf_norm_power_sqi` of the band. The frequency
+    indices of each band are kept for later calls with the same sampling
+    rate and window length.
+
+    Parameters
+    ----------
+    signal : array-like
+        The input signal.
+    sampling_rate : int, optional
+        Sampling rate of the signal. Default is 100 Hz.
+    bands : list, optional
+        Frequency bands [low, high]. A band of None is the entire spectrum.
+        Default is the bands of `lf_energy_sqi`, `qrs_energy_sqi`,
+        `hf_energy_sqi` and `vhf_norm_power_sqi`.
+    nperseg : int, optional
+        Length of each segment for the Short-Time Fourier Transform. Default is 2048.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, see `band_energy_sqi`.
+
+    Returns
+    -------
+    energies : np.ndarray
+        Maximum time marginal power in each band.
+    normalized_powers : np.ndarray
+        Median over maximum time marginal power in each band, NaN for bands
+        holding no frequency of the STFT.
+
+    Raises
+    ------
+    ValueError
+        If a band is not a [low, high] pair with low <= high.
+
+    Example
+    -------
+    >>> signal = np.random.randn(3000)
+    >>> energies, normalized_powers = multi_band_energy_sqi(
+    ...     signal, sampling_rate=100, bands=[[0, 0.5], [5, 25]]
+    ... )
+    """
+    assert np.isreal(sampling_rate), "Expected a numeric sampling rate value."
+    if bands is None:
+        bands = [[0, 0.5], [5, 25], [100, np.inf], [150, np.inf]]
+    for band in bands:
+        if band is not None and (len(band) != 2 or band[0] > band[1]):
+            raise ValueError(f"Invalid band values: {band}.")
+
+    marginals = _time_marginals(signal, sampling_rate, bands, nperseg, fiducial_cache)
+    energies = np.array([max(marginal).real for marginal in marginals])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized_powers = np.array(
+            [(np.median(marginal) / max(marginal)).real for marginal in marginals]
+        )
+    return energies, normalized_powers
+
+
+def band_energy_sqi(
+    signal, sampling_rate=100, band=None, nperseg=2048, fiducial_cache=None
+):
     """
     Compute the peak value of the time marginal of the energy distribution in a frequency band.
 
@@ -23,6 +149,9 @@ def band_energy_sqi(signal, sampling_rate=100, band=None, nperseg=2048):
         Frequency band [low, high]. If None, the entire spectrum is used. Default is None.
     nperseg : int, optional
         Length of each segment for the Short-Time Fourier Transform. Default is 2048.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, in which the STFT is kept so that it is
+        shared with the other energy SQIs of the segment.
 
     Returns
     -------
@@ -43,32 +172,16 @@ def band_energy_sqi(signal, sampling_rate=100, band=None, nperseg=2048):
     0.3141592653589793
     """
     assert np.isreal(sampling_rate), "Expected a numeric sampling rate value."
-    if len(signal) < nperseg:
-        nperseg = len(signal)
-
-    f, t, spec = sn.stft(
-        signal,
-        fs=sampling_rate,
-        window="hann",
-        nperseg=nperseg,
-        noverlap=(nperseg // 2),
-        detrend=False,
-        return_onesided=True,
-        boundary="zeros",
-        padded=True,
-    )
-
-    if band is None:
-        max_time_marginal = max(np.sum(np.abs(spec), axis=0)).real
-    else:
+    if band is not None:
         assert isinstance(band, list) and band[0] <= band[1], "Invalid band values."
-        idx = np.where((f > band[0]) & (f <= band[1]))[0]
-        max_time_marginal = max(np.sum(np.abs(spec[idx]), axis=0)).real
 
-    return max_time_marginal
+    (time_marginal,) = _time_marginals(
+        signal, sampling_rate, [band], nperseg, fiducial_cache
+    )
+    return max(time_marginal).real
 
 
-def lf_energy_sqi(signal, sampling_rate, band=[0, 0.5]):
+def lf_energy_sqi(signal, sampling_rate, band=[0, 0.5], fiducial_cache=None):
     """
     Low-Frequency Energy SQI.
 
@@ -80,16 +193,18 @@ def lf_energy_sqi(signal, sampling_rate, band=[0, 0.5]):
         Sampling rate of the signal.
     band : list, optional
         Frequency band. Default is [0, 0.5].
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, see `band_energy_sqi`.
 
     Returns
     -------
     float
         Low-frequency energy SQI.
     """
-    return band_energy_sqi(signal, sampling_rate, band)
+    return band_energy_sqi(signal, sampling_rate, band, fiducial_cache=fiducial_cache)
 
 
-def qrs_energy_sqi(signal, sampling_rate, band=[5, 25]):
+def qrs_energy_sqi(signal, sampling_rate, band=[5, 25], fiducial_cache=None):
     """
     QRS Energy SQI.
 
@@ -101,16 +216,18 @@ def qrs_energy_sqi(signal, sampling_rate, band=[5, 25]):
         Sampling rate of the signal.
     band : list, optional
         Frequency band. Default is [5, 25].
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, see `band_energy_sqi`.
 
     Returns
     -------
     float
         QRS energy SQI.
     """
-    return band_energy_sqi(signal, sampling_rate, band)
+    return band_energy_sqi(signal, sampling_rate, band, fiducial_cache=fiducial_cache)
 
 
-def hf_energy_sqi(signal, sampling_rate, band=[100, np.inf]):
+def hf_energy_sqi(signal, sampling_rate, band=[100, np.inf], fiducial_cache=None):
     """
     High-Frequency Energy SQI.
 
@@ -122,16 +239,20 @@ def hf_energy_sqi(signal, sampling_rate, band=[100, np.inf]):
         Sampling rate of the signal.
     band : list, optional
         Frequency band. Default is [100, np.inf].
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, see `band_energy_sqi`.
 
     Returns
     -------
     float
         High-frequency energy SQI.
     """
-    return band_energy_sqi(signal, sampling_rate, band)
+    return band_energy_sqi(signal, sampling_rate, band, fiducial_cache=fiducial_cache)
 
 
-def vhf_norm_power_sqi(signal, sampling_rate, band=[150, np.inf], nperseg=2048):
+def vhf_norm_power_sqi(
+    signal, sampling_rate, band=[150, np.inf], nperseg=2048, fiducial_cache=None
+):
     """
     Very High-Frequency Normalized Power SQI.
 
@@ -145,6 +266,8 @@ def vhf_norm_power_sqi(signal, sampling_rate, band=[150, np.inf], nperseg=2048):
         Frequency band. Default is [150, np.inf].
     nperseg : int, optional
         Length of each segment for the Short-Time Fourier Transform. Default is 2048.
+    fiducial_cache : FiducialCache, optional
+        Cache of the segment, see `band_energy_sqi`.
 
     Returns
     -------
@@ -157,23 +280,9 @@ def vhf_norm_power_sqi(signal, sampling_rate, band=[150, np.inf], nperseg=2048):
     >>> vhf_norm_power_sqi(signal, sampling_rate=100)
     0.02
     """
-    if len(signal) < nperseg:
-        nperseg = len(signal)
-
-    f, t, spec = sn.stft(
-        signal,
-        fs=sampling_rate,
-        window="hann",
-        nperseg=nperseg,
-        noverlap=(nperseg // 2),
-        detrend=False,
-        return_onesided=True,
-        boundary="zeros",
-        padded=True,
+    (freq_marginal,) = _time_marginals(
+        signal, sampling_rate, [band], nperseg, fiducial_cache
     )
-
-    idx = np.where((f > band[0]) & (f <= band[1]))[0]
-    freq_marginal = np.sum(np.abs(spec[idx]), axis=0)
     np_vhf = (np.median(freq_marginal) / max(freq_marginal)).real
 
     return np_vhf